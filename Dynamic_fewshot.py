@@ -1,39 +1,12 @@
 import json
-import google.generativeai as genai
 import os
-from utils import *
+from utils import evaluate_dynamic_fewshot, preprocessing, run_options
+from prompts import DYNAMIC_FEWSHOT_PROMPT
 
 
 def main():
 
-    good_prompt = """You are an expert data scientist and SQL engineer.
-        You are given a database schema and a natural language question.
-        Your task is to carefully analyze the schema, reason about table relationships,
-        and generate a correct and efficient SQL query that fully answers the question.
-        Also be careful to only output valid SQL, no English text.
-
-        Database Engine:
-        SQLite
-
-        Few-shot examples:
-        {top_k}
-
-        Now do the same for:
-
-        Database Schema:
-        {db_schema}
-
-        Question:
-        {user_question}
-
-        -- Reasoning
-        (2–6 lines)
-
-        -- SQL Query
-        Write only the SQL query (starting with SELECT and ending with ;
-
-        Return output in the required format and nothing else.
-    """
+    good_prompt = DYNAMIC_FEWSHOT_PROMPT
 
     sub_path = (
         os.path.join("spider", "dev_spider_filtered.json")
@@ -44,10 +17,15 @@ def main():
     with open(sub_path, "r") as f:
         dev_data = json.load(f)
 
-    evaluate_dynamic_fewshot(dev_data, good_prompt, top_k, data_set, version_name, provider)
+    evaluate_dynamic_fewshot(dev_data, good_prompt, top_k, data_set, version_name, provider,
+                             knowledge_path=options.knowledge_path, same_db=options.same_db,
+                             mmr_lambda=options.mmr_lambda, resume=options.resume)
 
 if __name__ == "__main__":
     provider, data_set = preprocessing()
-    version_name = f"{provider}_{data_set}_dynamic_fewshot_top1"
-    top_k = 1
+    options = run_options()
+    top_k = options.top_k
+    # Retrieval variants get their own run name so they don't resume into the precomputed top_5 run
+    retrieval_tag = ("_samedb" if options.same_db else "") + (f"_mmr{options.mmr_lambda:g}" if options.mmr_lambda else "")
+    version_name = f"{provider}_{data_set}_dynamic_fewshot{retrieval_tag}_top{top_k}"
     main()
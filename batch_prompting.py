@@ -0,0 +1,55 @@
+from collections import OrderedDict
+
+import prompt_templates
+
+
+BATCH_INSTRUCTIONS = """
+The questions above are numbered. Answer every one of them, in order, using exactly this layout for each:
+
+-- Question <number>
+-- Reasoning
+(Concise 2–6 line logical explanation)
+-- SQL Query
+SELECT ... ;
+
+Do not skip any question and do not merge answers.
+"""
+
+
+def group_by_db(items, indices, batch_size):
+    """Splits `indices` into batches of at most batch_size questions sharing one db_id."""
+    groups = OrderedDict()
+    for i in indices:
+        groups.setdefault(items[i]["db_id"], []).append(i)
+    batches = []
+    for members in groups.values():
+        for start in range(0, len(members), batch_size):
+            batches.append(members[start:start + batch_size])
+    return batches
+
+
+def batch_template(prompt):
+    """
+    The single-question template cut after its {user_question} slot: what
+    follows is the one-answer "-- Reasoning / -- SQL Query" footer, which
+    would contradict BATCH_INSTRUCTIONS.
+    """
+    end = prompt.find("{user_question}")
+    return prompt if end < 0 else prompt[:end + len("{user_question}")]
+
+
+def render(prompt, schema, questions, raw=False):
+    """
+    One prompt carrying the schema and few-shot preamble once, with N
+    numbered questions and the batch answer layout instead of the
+    single-answer footer. Rendered from the compiled template like single
+    prompts; raw=True (PROMPT_RAW) skips the whitespace canonicalization.
+    """
+    prompt = batch_template(prompt)
+    numbered = "\n".join(f"{n}. {q}" for n, q in enumerate(questions, start=1))
+    if raw:
+        return prompt.format(db_schema=schema, user_question=numbered) + BATCH_INSTRUCTIONS
+    template = prompt_templates.compile_template(prompt)
+    return template.render(db_schema=schema, user_question=numbered) + "\n\n" + prompt_templates.canonicalize(
+        BATCH_INSTRUCTIONS
+    )
@@ -0,0 +1,29 @@
+import hashlib
+import os
+import re
+import threading
+
+
+_fingerprints = {}
+_fingerprints_lock = threading.Lock()
+
+
+def file_fingerprint(path):
+    """Content hash (sha1) of a file, memoized per (path, mtime, size)."""
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_mtime, st.st_size)
+    with _fingerprints_lock:
+        if key in _fingerprints:
+            return _fingerprints[key]
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    with _fingerprints_lock:
+        _fingerprints[key] = h.hexdigest()
+    return _fingerprints[key]
+
+
+def quote_identifier(name):
+    # Keep plain identifiers bare, backtick the BIRD-style "Free Meal Count (K-12)" ones
+    return name if re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", name) else f"`{name}`"
@@ -0,0 +1,228 @@
+import argparse
+import hashlib
+import json
+import os
+import random
+import threading
+
+
+DATASET_CACHE_DIR = os.path.join(".cache", "datasets")
+STRATA = ("db_id", "difficulty")
+
+
+def _disk_prefix(path):
+    digest = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(DATASET_CACHE_DIR, digest)
+
+
+def convert(path, prefix):
+    """
+    Rewrites a Spider/BIRD JSON array as JSONL (one example per line) plus an
+    index of line offsets and the db_id / difficulty of every row. Examples
+    without a question_id (Spider) get their position in the source file.
+    """
+    with open(path, "r") as f:
+        items = json.load(f)
+    index = {"source": os.path.abspath(path), "mtime": os.path.getmtime(path), "size": os.path.getsize(path),
+             "offsets": [], "question_ids": [], "db_id": [], "difficulty": []}
+    os.makedirs(os.path.dirname(prefix), exist_ok=True)
+    # Written to temp files and moved into place, the index last, so a crash never leaves a half-written pair
+    tag = f"{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(f"{prefix}.jsonl.{tag}", "wb") as f:
+        for position, item in enumerate(items):
+            item.setdefault("question_id", position)
+            index["offsets"].append(f.tell())
+            index["question_ids"].append(item["question_id"])
+            index["db_id"].append(item["db_id"])
+            index["difficulty"].append(item.get("difficulty"))
+            f.write(json.dumps(item).encode("utf-8") + b"\n")
+    with open(f"{prefix}.index.json.{tag}", "w") as f:
+        json.dump(index, f)
+    os.replace(f"{prefix}.jsonl.{tag}", prefix + ".jsonl")
+    os.replace(f"{prefix}.index.json.{tag}", prefix + ".index.json")
+    return index
+
+
+def _matches(value, wanted):
+    if wanted is None:
+        return True
+    if isinstance(wanted, str):
+        return value == wanted
+    return value in wanted
+
+
+class Dataset:
+    """
+    Random access to one converted eval/knowledge file: records are read by
+    seeking to their offset, so loading a subset costs O(selected) reads
+    instead of parsing the whole file.
+    """
+
+    def __init__(self, path, index, prefix):
+        self.path = path
+        self.jsonl = prefix + ".jsonl"
+        self.offsets = index["offsets"]
+        self.question_ids = index["question_ids"]
+        self.db_ids = index["db_id"]
+        self.difficulties = index["difficulty"]
+        self.rows = {qid: row for row, qid in enumerate(self.question_ids)}
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def _read(self, rows):
+        records = {}
+        with open(self.jsonl, "rb") as f:
+            for row in sorted(rows):
+                f.seek(self.offsets[row])
+                records[row] = json.loads(f.readline())
+        return [records[row] for row in rows]
+
+    def get(self, question_id):
+        return self._read([self.rows[question_id]])[0]
+
+    def take(self, question_ids):
+        """Records for the given question_ids, in that order."""
+        return self._read([self.rows[qid] for qid in question_ids])
+
+    def select(self, db_id=None, difficulty=None, limit=None):
+        """question_ids (in file order) filtered by db_id / difficulty, each a value or a collection; index only."""
+        selected = [
+            qid for qid, db, level in zip(self.question_ids, self.db_ids, self.difficulties)
+            if _matches(db, db_id) and _matches(level, difficulty)
+        ]
+        return selected[:limit] if limit is not None else selected
+
+    def iter(self, db_id=None, difficulty=None):
+        """Streams matching records one line at a time."""
+        with open(self.jsonl, "rb") as f:
+            for offset, db, level in zip(self.offsets, self.db_ids, self.difficulties):
+                if _matches(db, db_id) and _matches(level, difficulty):
+                    f.seek(offset)
+                    yield json.loads(f.readline())
+
+    def strata(self, by=STRATA):
+        """{(value, ...): [question_id, ...]} for the fields in `by` (missing difficulty is None)."""
+        columns = {"db_id": self.db_ids, "difficulty": self.difficulties}
+        groups = {}
+        for row, qid in enumerate(self.question_ids):
+            groups.setdefault(tuple(columns[field][row] for field in by), []).append(qid)
+        return groups
+
+
+_memo = {}
+_memo_lock = threading.Lock()
+
+
+def open_dataset(path):
+    """
+    Returns the Dataset for the JSON file at `path`, converting it at most
+    once per file version. Memoized in process and on disk, keyed by mtime and size.
+    """
+    key = os.path.abspath(path)
+    version = (os.path.getmtime(path), os.path.getsize(path))
+    with _memo_lock:
+        memo = _memo.get(key)
+        if memo is not None and memo[0] == version:
+            return memo[1]
+
+        prefix = _disk_prefix(path)
+        index = None
+        if os.path.exists(prefix + ".index.json") and os.path.exists(prefix + ".jsonl"):
+            try:
+                with open(prefix + ".index.json", "r") as f:
+                    index = json.load(f)
+            except ValueError:
+                index = None
+            if index is not None and (index.get("mtime"), index.get("size")) != version:
+                index = None
+        if index is None:
+            index = convert(path, prefix)
+
+        dataset = Dataset(path, index, prefix)
+        _memo[key] = (version, dataset)
+        return dataset
+
+
+def load(path, db_id=None, difficulty=None, limit=None):
+    """Examples of an eval file, optionally only some db_ids / difficulties (in file order)."""
+    dataset = open_dataset(path)
+    if db_id is None and difficulty is None and limit is None:
+        return list(dataset.iter())
+    return dataset.take(dataset.select(db_id, difficulty, limit))
+
+
+def allocate(sizes, total):
+    """
+    Splits `total` over strata proportionally to their sizes (largest
+    remainder; ties go to the larger stratum, then the smaller key).
+    """
+    n = sum(sizes.values())
+    total = min(total, n)
+    exact = {key: total * size / n for key, size in sizes.items()}
+    quotas = {key: int(share) for key, share in exact.items()}
+    order = sorted(sizes, key=lambda key: (-(exact[key] - quotas[key]), -sizes[key], repr(key)))
+    for key in order[:total - sum(quotas.values())]:
+        quotas[key] += 1
+    return quotas
+
+
+def stratified_split(dataset, eval_size, seed=0, by=STRATA):
+    """
+    Seeded split of question_ids into (eval, knowledge), stratified by `by`:
+    every db_id / difficulty combination keeps its share of the eval set.
+    The same file, size and seed always give the same split.
+    """
+    groups = dataset.strata(by)
+    quotas = allocate({key: len(ids) for key, ids in groups.items()}, eval_size)
+    rng = random.Random(seed)
+    chosen = set()
+    for key in sorted(groups, key=repr):
+        chosen.update(rng.sample(sorted(groups[key], key=repr), quotas[key]))
+    eval_ids = [qid for qid in dataset.question_ids if qid in chosen]
+    knowledge_ids = [qid for qid in dataset.question_ids if qid not in chosen]
+    return eval_ids, knowledge_ids
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Indexed Spider/BIRD example files and reproducible splits.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("build", help="convert JSON example files to indexed JSONL")
+    p.add_argument("paths", nargs="+")
+
+    p = sub.add_parser("show", help="stream examples of one db_id / difficulty")
+    p.add_argument("path")
+    p.add_argument("--db_id", nargs="+")
+    p.add_argument("--difficulty", nargs="+")
+    p.add_argument("--limit", type=int, default=10)
+
+    p = sub.add_parser("split", help="seeded eval/knowledge split, stratified by db_id and difficulty")
+    p.add_argument("path", help="e.g. bird_dev_all.json")
+    p.add_argument("--eval_size", type=int, default=200)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--by", nargs="+", default=list(STRATA), choices=STRATA)
+    p.add_argument("--eval_out", help="e.g. sts_generation/bird_200.json")
+    p.add_argument("--knowledge_out", help="e.g. sts_generation/bird_rest.json")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        for path in args.paths:
+            dataset = open_dataset(path)
+            strata = dataset.strata()
+            print(f"{path}: {len(dataset)} examples, {len({db for db, _ in strata})} databases, "
+                  f"{len(strata)} db_id/difficulty strata")
+    elif args.command == "show":
+        dataset = open_dataset(args.path)
+        for qid in dataset.select(args.db_id, args.difficulty, args.limit):
+            item = dataset.get(qid)
+            print(f"[{qid}] {item['db_id']} ({item.get('difficulty', '-')}): {item['question']}")
+    elif args.command == "split":
+        dataset = open_dataset(args.path)
+        eval_ids, knowledge_ids = stratified_split(dataset, args.eval_size, args.seed, tuple(args.by))
+        print(f"{len(eval_ids)} eval / {len(knowledge_ids)} knowledge examples (seed {args.seed})")
+        for out, ids in ((args.eval_out, eval_ids), (args.knowledge_out, knowledge_ids)):
+            if out:
+                with open(out, "w") as f:
+                    json.dump(dataset.take(ids), f, indent=2)
+                print(f"Written to {out}")
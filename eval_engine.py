@@ -0,0 +1,65 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+
+import tracing
+from rate_limiter import RateLimitError, get_limiter, estimate_tokens
+
+
+print_lock = threading.Lock()
+
+
+class GenerationFailed(Exception):
+    """The model gave no answer: 429 retries ran out or the provider raised."""
+
+
+def call_with_limits(fn, provider, prompt_text, max_retries=5, backoff=2.0):
+    """
+    Runs fn() once the provider's rate limiter allows it. On a 429 the
+    bucket is drained and the call is retried with exponential backoff;
+    GenerationFailed is raised once the retries run out.
+    """
+    limiter = get_limiter(provider)
+    n_tokens = estimate_tokens(prompt_text)
+    for attempt in range(max_retries + 1):
+        with tracing.span("rate_limit_wait"):
+            limiter.acquire(n_tokens)
+        try:
+            with tracing.span("api_call"):
+                return fn()
+        except RateLimitError as e:
+            if attempt == max_retries:
+                tracing.count("rate_limit_giveups")
+                with print_lock:
+                    print(f"  - Rate limited, giving up after {attempt + 1} attempts: {e}")
+                raise GenerationFailed(f"rate limited after {attempt + 1} attempts: {e}") from e
+            tracing.count("rate_limit_retries")
+            limiter.penalize()
+            with tracing.span("backoff"):
+                time.sleep(backoff * (2 ** attempt))
+
+
+def run_concurrent(items, worker, max_workers=4):
+    """
+    Calls worker(i, item) for every item on a thread pool and returns the
+    results in input order. max_workers=1 keeps the old serial behaviour.
+    Only a few jobs per worker are in flight at once, so long runs don't
+    queue every example up front.
+    """
+    results = [None] * len(items)
+    if max_workers <= 1:
+        for i, item in enumerate(items):
+            results[i] = worker(i, item)
+        return results
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = {}
+        for i, item in enumerate(items):
+            if len(pending) >= max_workers * 2:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[pending.pop(future)] = future.result()
+            pending[pool.submit(worker, i, item)] = i
+        for future in as_completed(pending):
+            results[pending[future]] = future.result()
+    return results
@@ -0,0 +1,67 @@
+import random
+import threading
+import time
+
+from rate_limiter import RateLimitError
+
+
+class FakeProvider:
+    """
+    Local stand-in for Gemini/Groq. Returns canned SQL in the same
+    "-- Reasoning / -- SQL Query" format, with simulated latency and 429s.
+    """
+
+    def __init__(self, canned=None, latency=0.05, jitter=0.02, error_rate=0.0, seed=0):
+        self.canned = canned or {}
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+
+    def generate(self, final_prompt, _sleep=True):
+        with self.lock:
+            self.calls += 1
+            delay = max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+            fail = self.rng.random() < self.error_rate
+            if fail:
+                self.errors += 1
+        if _sleep:
+            time.sleep(delay)
+        if fail:
+            raise RateLimitError("429 Resource has been exhausted (fake provider)")
+
+        sql = "SELECT 1;"
+        for question, query in self.canned.items():
+            if question in final_prompt:
+                sql = query if query.rstrip().endswith(";") else query + ";"
+                break
+        return f"-- Reasoning\nCanned answer from the fake provider.\n\n-- SQL Query\n{sql}"
+
+    def stream(self, final_prompt, chunk_chars=8):
+        """generate, delivered in chunk_chars pieces with the latency spread across them."""
+        text = self.generate(final_prompt, _sleep=False)
+        chunks = [text[i:i + chunk_chars] for i in range(0, len(text), chunk_chars)]
+        for chunk in chunks:
+            time.sleep(self.latency / len(chunks))
+            yield chunk
+
+
+_default = FakeProvider()
+
+
+def get_fake_provider():
+    return _default
+
+
+def set_fake_provider(provider):
+    global _default
+    _default = provider
+
+
+def from_dataset(data, data_set, **kwargs):
+    """Fake provider that answers every question with its gold SQL."""
+    key = "query" if data_set == "spider" else "SQL"
+    return FakeProvider({item["question"]: item[key] for item in data}, **kwargs)
@@ -0,0 +1,169 @@
+import argparse
+import json
+import os
+import pickle
+import re
+import sqlite3
+import statistics
+import threading
+
+import query_timing
+import result_compare
+import sql_executor
+from common import file_fingerprint
+from schema_catalog import db_path_for
+
+
+GOLD_DIR = os.path.join(".cache", "gold")
+MAX_STORED_ROWS = result_compare.VERIFY_MAX_ROWS   # bigger gold results are kept as digest only
+
+def normalize_sql(sql):
+    return re.sub(r"\s+", " ", sql).strip().rstrip(";").strip()
+
+
+class GoldStore:
+    """
+    Precomputed gold-query results for one dataset, keyed by
+    (database fingerprint, normalized gold SQL).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS gold (
+                db_hash TEXT,
+                sql TEXT,
+                status TEXT,
+                row_count INTEGER,
+                multiset_hash TEXT,
+                ordered_hash TEXT,
+                rows BLOB,
+                times TEXT,
+                median_time REAL,
+                PRIMARY KEY (db_hash, sql)
+            )"""
+        )
+        self.conn.commit()
+
+    def get(self, db_path, sql):
+        """Returns a dict with status, digest, rows (None if too large), times, median_time."""
+        key = (file_fingerprint(db_path), normalize_sql(sql))
+        with self.lock:
+            row = self.conn.execute(
+                """SELECT status, row_count, multiset_hash, ordered_hash, rows, times, median_time
+                FROM gold WHERE db_hash = ? AND sql = ?""",
+                key,
+            ).fetchone()
+        if row is None:
+            return None
+        status, row_count, multiset, ordered, rows, times, median_time = row
+        digest = None
+        if row_count is not None:
+            digest = result_compare.ResultDigest.from_dict(
+                {"row_count": row_count, "multiset": multiset, "ordered": ordered}
+            )
+        return {
+            "status": status,
+            "digest": digest,
+            "rows": pickle.loads(rows) if rows is not None else None,
+            "times": json.loads(times),
+            "median_time": median_time,
+        }
+
+    def put(self, db_path, sql, status, digest, rows, times):
+        d = digest.to_dict() if digest is not None else {"row_count": None, "multiset": None, "ordered": None}
+        median_time = statistics.median(times) if times else None
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO gold VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    file_fingerprint(db_path),
+                    normalize_sql(sql),
+                    status,
+                    d["row_count"],
+                    d["multiset"],
+                    d["ordered"],
+                    pickle.dumps(rows) if rows is not None else None,
+                    json.dumps(times),
+                    median_time,
+                ),
+            )
+            self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+def store_path(data_set):
+    return os.path.join(GOLD_DIR, f"gold_{data_set}.sqlite")
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_gold_store(data_set):
+    """The dataset's gold store if it has been built, else None."""
+    with _stores_lock:
+        if data_set not in _stores:
+            path = store_path(data_set)
+            _stores[data_set] = GoldStore(path) if os.path.exists(path) else None
+        return _stores[data_set]
+
+
+def build(data, data_set, repetitions=5, warmup=1):
+    """Executes every gold query once per dataset and stores results and timings."""
+    store = GoldStore(store_path(data_set))
+    key = "query" if data_set == "spider" else "SQL"
+    seen = set()
+    for i, item in enumerate(data):
+        path = db_path_for(item["db_id"], data_set)
+        sql = item[key]
+        if (path, normalize_sql(sql)) in seen:
+            continue
+        seen.add((path, normalize_sql(sql)))
+
+        # Stream the rows into the digest, keeping them only while the result stays small
+        digest = result_compare.ResultDigest()
+        kept = []
+
+        def consume(batch):
+            digest.update(batch)
+            if digest.row_count <= MAX_STORED_ROWS:
+                kept.extend(batch)
+            elif kept:
+                kept.clear()
+
+        outcome = sql_executor.run_query(path, sql, timeout=sql_executor.GOLD_TIMEOUT,
+                                         max_rows=sql_executor.GOLD_MAX_ROWS, on_batch=consume)
+        times = []
+        if outcome.ok:
+            times = query_timing.measure(path, [sql], warmup, repetitions, timeout=sql_executor.GOLD_TIMEOUT)[0].samples
+            rows = kept if digest.row_count <= MAX_STORED_ROWS else None
+            store.put(path, sql, outcome.status, digest, rows, times)
+        else:
+            store.put(path, sql, outcome.status, None, None, times)
+        print(f"[{i + 1}/{len(data)}] {item['db_id']}: {outcome.status}, "
+              f"{digest.row_count} rows, median {statistics.median(times) if times else 0:.6f}s")
+    store.close()
+    with _stores_lock:
+        _stores.pop(data_set, None)
+    print(f"Gold store written to {store_path(data_set)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Execute every gold query once and store results and timings.")
+    parser.add_argument("data_set", choices=["spider", "bird"])
+    parser.add_argument("--data", nargs="+", required=True, help="dataset json files, e.g. data/bird/dev_subset.json")
+    parser.add_argument("--repetitions", type=int, default=5)
+    args = parser.parse_args()
+
+    items = []
+    for p in args.data:
+        with open(p, "r") as f:
+            items.extend(json.load(f))
+    build(items, args.data_set, args.repetitions)
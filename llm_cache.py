@@ -0,0 +1,146 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+
+DEFAULT_CACHE_PATH = os.path.join(".cache", "llm_responses.sqlite")
+
+# off       - always call the provider
+# readwrite - serve hits from disk, store new responses
+# replay    - serve hits from disk, never call the provider (misses return "")
+CACHE_MODES = ("off", "readwrite", "replay")
+
+
+def cache_key(provider, model, final_prompt):
+    h = hashlib.sha256()
+    for part in (provider, model, final_prompt):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class ResponseCache:
+    """
+    Content-addressed store of LLM responses, keyed on a hash of
+    (provider, model, final_prompt). Backed by a single SQLite file.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, mode="readwrite", max_entries=None, max_age_days=None):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Invalid cache mode '{mode}'. Choose one of {CACHE_MODES}.")
+        self.path = path
+        self.mode = mode
+        self.max_entries = max_entries
+        self.max_age = max_age_days * 86400 if max_age_days else None
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                provider TEXT,
+                model TEXT,
+                response TEXT,
+                created REAL,
+                last_used REAL
+            )"""
+        )
+        self.conn.commit()
+
+    @property
+    def replay(self):
+        return self.mode == "replay"
+
+    def get(self, provider, model, final_prompt):
+        key = cache_key(provider, model, final_prompt)
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT response, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (self.max_age and time.time() - row[1] > self.max_age):
+                self.misses += 1
+                return None
+            self.hits += 1
+            if not self.replay:
+                self.conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+                self.conn.commit()
+            return row[0]
+
+    def put(self, provider, model, final_prompt, response):
+        if self.replay or not response:
+            return
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (cache_key(provider, model, final_prompt), provider, model, response, now, now),
+            )
+            self.conn.commit()
+
+    def evict(self):
+        """Drops entries older than max_age and, past max_entries, the least recently used."""
+        if self.replay:
+            return 0
+        removed = 0
+        with self.lock:
+            if self.max_age:
+                cur = self.conn.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.max_age,))
+                removed += cur.rowcount
+            if self.max_entries:
+                cur = self.conn.execute(
+                    """DELETE FROM responses WHERE key NOT IN (
+                        SELECT key FROM responses ORDER BY last_used DESC LIMIT ?)""",
+                    (self.max_entries,),
+                )
+                removed += cur.rowcount
+            self.conn.commit()
+        return removed
+
+    def stats(self):
+        with self.lock:
+            size = self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {"entries": size, "hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        self.evict()
+        self.conn.close()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """
+    Returns the process-wide cache, configured from LLM_CACHE_MODE
+    (off/readwrite/replay), LLM_CACHE_PATH, LLM_CACHE_MAX_ENTRIES and
+    LLM_CACHE_MAX_AGE_DAYS. Returns None when caching is off.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is not None:
+            return _cache
+        mode = os.getenv("LLM_CACHE_MODE", "readwrite").lower()
+        if mode == "off":
+            return None
+        max_entries = os.getenv("LLM_CACHE_MAX_ENTRIES")
+        max_age = os.getenv("LLM_CACHE_MAX_AGE_DAYS")
+        _cache = ResponseCache(
+            os.getenv("LLM_CACHE_PATH", DEFAULT_CACHE_PATH),
+            mode=mode,
+            max_entries=int(max_entries) if max_entries else None,
+            max_age_days=float(max_age) if max_age else None,
+        )
+        return _cache
+
+
+def set_cache(cache):
+    global _cache
+    _cache = cache
@@ -0,0 +1,151 @@
+import argparse
+import functools
+import re
+import string
+import threading
+
+from rate_limiter import estimate_tokens
+
+
+def canonicalize(text):
+    """
+    Strips the source indentation the triple-quoted templates carry (none of
+    it is meaningful to the model), trailing spaces and runs of blank lines.
+    """
+    lines = [line.strip() for line in text.strip().splitlines()]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines))
+
+
+class PromptTemplate:
+    """A template compiled once: canonical text plus the fields it expects."""
+
+    def __init__(self, source):
+        self.source = source
+        self.text = canonicalize(source)
+        self.fields = {name for _, name, _, _ in string.Formatter().parse(self.text) if name}
+
+    def render(self, **values):
+        return self.text.format(**{k: v for k, v in values.items() if k in self.fields})
+
+
+@functools.lru_cache(maxsize=None)
+def compile_template(source):
+    return PromptTemplate(source)
+
+
+def render_examples(examples):
+    """
+    Few-shot examples ({"question", "query"} dicts) in the same
+    "-- Question / -- SQL Query" layout the answers use, instead of the
+    Python repr of the list.
+    """
+    blocks = []
+    for n, example in enumerate(examples, start=1):
+        query = re.sub(r"\s*\n\s*", " ", example["query"].strip()).rstrip(";") + ";"
+        blocks.append(f"Example {n}:\n-- Question\n{example['question']}\n-- SQL Query\n{query}")
+    return "\n\n".join(blocks)
+
+
+_token_counts = {}
+_token_counts_lock = threading.Lock()
+
+
+def count_tokens(provider, text):
+    """Tokens of `text` under the provider's own tokenizer, memoized (Gemini counts over the API)."""
+    import providers
+
+    key = (provider, text)
+    with _token_counts_lock:
+        if key in _token_counts:
+            return _token_counts[key]
+    n = providers.get_provider(provider).count_tokens(text)
+    with _token_counts_lock:
+        _token_counts[key] = n
+    return n
+
+
+class TokenUsage:
+    """
+    Prompt/completion tokens spent on one example, across all its LLM calls.
+    Numbers come from the API response metadata; calls whose backend reports
+    none are estimated and counted in `estimated`.
+    """
+
+    def __init__(self):
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.requests = 0
+        self.cached = 0
+        self.estimated = 0
+        self.lock = threading.Lock()
+
+    def add_response(self, prompt, responses, reported=None):
+        if isinstance(responses, str):
+            responses = [responses]
+        with self.lock:
+            self.requests += 1
+            if reported:
+                self.prompt_tokens += reported["prompt_tokens"]
+                self.completion_tokens += reported["completion_tokens"]
+            else:
+                self.estimated += 1
+                self.prompt_tokens += estimate_tokens(prompt)
+                self.completion_tokens += sum(estimate_tokens(r) for r in responses)
+
+    def add_cached(self, n=1):
+        with self.lock:
+            self.cached += n
+
+    def split(self, n):
+        """
+        n TokenUsage objects that add up to this one, e.g. one per question
+        of a batched request (remainders go to the first ones).
+        """
+        parts = [TokenUsage() for _ in range(n)]
+        for name in ("prompt_tokens", "completion_tokens", "requests", "cached", "estimated"):
+            share, extra = divmod(getattr(self, name), n)
+            for j, part in enumerate(parts):
+                setattr(part, name, share + (j < extra))
+        return parts
+
+    def to_dict(self):
+        return {
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "api_requests": self.requests,
+            "cached_responses": self.cached,
+            "estimated_usage": self.estimated,
+        }
+
+
+def token_totals(records):
+    """(prompt, completion) tokens summed over run-log records."""
+    prompt = completion = 0
+    for record in records:
+        prompt += record.get("prompt_tokens", 0)
+        completion += record.get("completion_tokens", 0)
+    return prompt, completion
+
+
+if __name__ == "__main__":
+    import dataset_store
+    import prompts
+    import utils
+
+    parser = argparse.ArgumentParser(description="Prompt tokens per strategy, source vs compiled templates.")
+    parser.add_argument("--provider", default="mock")
+    parser.add_argument("--data_set", default="bird", choices=["spider", "bird"])
+    args = parser.parse_args()
+
+    utils.init_provider(args.provider)
+    print(f"{'Strategy':<18} {'source':>8} {'compiled':>9} {'1st example, source':>20} {'compiled':>9}")
+    for strategy, source in prompts.STRATEGIES.items():
+        dataset = dataset_store.open_dataset(prompts.data_path(strategy, args.data_set))
+        item = dataset.get(dataset.question_ids[0])
+        schema = utils.get_schema(utils.db_path_for(item["db_id"], args.data_set))
+        top_k = item.get("top_5", [])[:3] if strategy == "dynamic_fewshot" else None
+        raw = source.format(db_schema=schema, user_question=item["question"], top_k=top_k)
+        compiled = utils.format_prompt(schema, source, item["question"], top_k)
+        print(f"{strategy:<18} {count_tokens(args.provider, source):>8} "
+              f"{count_tokens(args.provider, compile_template(source).text):>9} "
+              f"{count_tokens(args.provider, raw):>20} {count_tokens(args.provider, compiled):>9}")
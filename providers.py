@@ -0,0 +1,394 @@
+import argparse
+import json
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import fake_provider
+from query_timing import percentile
+from rate_limiter import PROVIDER_LIMITS, RateLimitError, estimate_tokens, get_limiter
+
+
+def _is_rate_limit(e):
+    text = str(e).lower()
+    return "429" in text or "rate limit" in text or "resource has been exhausted" in text
+
+
+def _clean(text):
+    return (text or "").strip().replace("```sql", "").replace("```", "")
+
+
+class Provider:
+    """
+    Backend interface. Subclasses implement _generate(prompt) -> text;
+    the rest (async, batch, token counting) has workable defaults.
+    """
+
+    name = None
+    default_model = None
+    supports_n = False      # True when one request can return several sampled candidates
+    supports_stream = False  # True when _stream yields the completion incrementally
+
+    def __init__(self, model_name=None, rpm=None, tpm=None):
+        self.model_name = model_name or self.default_model
+        limits = PROVIDER_LIMITS.get(self.name, {"rpm": 60, "tpm": 10**6})
+        self.rpm = rpm or limits["rpm"]
+        self.tpm = tpm or limits["tpm"]
+        self._usage = threading.local()
+        self._errors = threading.local()
+
+    def _generate(self, prompt):
+        raise NotImplementedError
+
+    def _sample(self, prompt, temperature, n):
+        # Backends without a temperature knob can only repeat themselves
+        return [self._generate(prompt) for _ in range(n)]
+
+    def _stream(self, prompt):
+        # Non-streaming backends deliver everything as one chunk
+        yield self._generate(prompt)
+
+    def _record_usage(self, prompt_tokens, completion_tokens):
+        self._usage.value = {"prompt_tokens": int(prompt_tokens or 0), "completion_tokens": int(completion_tokens or 0)}
+
+    def last_usage(self):
+        """Token usage the API reported for this thread's last call, None if it reported none."""
+        return getattr(self._usage, "value", None)
+
+    def last_error(self):
+        """The exception behind this thread's last default ("" / []) answer, None if the call succeeded."""
+        return getattr(self._errors, "value", None)
+
+    def _guarded(self, fn, default):
+        self._usage.value = None
+        self._errors.value = None
+        try:
+            return fn()
+        except RateLimitError:
+            raise
+        except Exception as e:
+            if _is_rate_limit(e):
+                raise RateLimitError(str(e))
+            print(f"{self.name} Error:", e)
+            self._errors.value = e
+            return default
+
+    def generate(self, prompt):
+        """Returns the cleaned completion text, "" on a non-retryable error."""
+        return self._guarded(lambda: _clean(self._generate(prompt)), "")
+
+    def sample(self, prompt, temperature, n=1):
+        """
+        n cleaned completions sampled at `temperature`. n > 1 is a single
+        request only when supports_n; "" stands in for failed candidates.
+        """
+        texts = self._guarded(lambda: [_clean(t) for t in self._sample(prompt, temperature, n)], [])
+        return (texts + [""] * n)[:n]
+
+    def generate_until(self, prompt, on_chunk):
+        """
+        Streams the completion, passing each chunk to on_chunk(chunk); the
+        stream is cancelled as soon as it returns True. Returns (cleaned text
+        received so far, cancelled).
+        """
+        def consume():
+            text, cancelled = "", False
+            chunks = self._stream(prompt)
+            try:
+                for chunk in chunks:
+                    text += chunk
+                    if on_chunk(chunk):
+                        cancelled = True
+                        break
+            finally:
+                # Runs the backend's cleanup, which closes the HTTP stream / stops local decoding
+                chunks.close()
+            return _clean(text), cancelled
+
+        return self._guarded(consume, ("", False))
+
+    async def agenerate(self, prompt):
+        import asyncio
+
+        return await asyncio.to_thread(self.generate, prompt)
+
+    def generate_batch(self, prompts, max_workers=4):
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            return list(pool.map(self.generate, prompts))
+
+    def count_tokens(self, text):
+        return estimate_tokens(text)
+
+    def rate_limits(self):
+        return {"rpm": self.rpm, "tpm": self.tpm}
+
+
+class GeminiProvider(Provider):
+    name = "gemini"
+    default_model = "gemini-2.5-flash"
+    supports_n = True
+    supports_stream = True
+
+    def __init__(self, model_name=None, **kwargs):
+        super().__init__(model_name or os.getenv("GEMINI_MODEL"), **kwargs)
+        import google.generativeai as genai
+
+        genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+        self.model = genai.GenerativeModel(self.model_name)
+
+    def _record_response_usage(self, response):
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            self._record_usage(usage.prompt_token_count, usage.candidates_token_count)
+
+    def _generate(self, prompt):
+        response = self.model.generate_content(prompt)
+        self._record_response_usage(response)
+        return response.text
+
+    def _sample(self, prompt, temperature, n):
+        response = self.model.generate_content(
+            prompt, generation_config={"temperature": temperature, "candidate_count": n}
+        )
+        self._record_response_usage(response)
+        return ["".join(part.text for part in c.content.parts) for c in response.candidates]
+
+    def _stream(self, prompt):
+        # The SDK has no explicit cancel; the connection is dropped once the iterator is abandoned
+        for chunk in self.model.generate_content(prompt, stream=True):
+            try:
+                yield chunk.text
+            except ValueError:
+                # Chunk without text parts (e.g. only safety ratings)
+                continue
+
+    def count_tokens(self, text):
+        try:
+            return self.model.count_tokens(text).total_tokens
+        except Exception:
+            return estimate_tokens(text)
+
+
+class GroqProvider(Provider):
+    name = "groq"
+    default_model = "llama-3.1-8b-instant"
+    supports_stream = True
+
+    def __init__(self, model_name=None, **kwargs):
+        super().__init__(model_name or os.getenv("GROQ_MODEL"), **kwargs)
+        from groq import Groq
+
+        self.client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+
+    def _generate(self, prompt, temperature=None):
+        response = self.client.chat.completions.create(
+            model=self.model_name,
+            messages=[{"role": "user", "content": prompt}],
+            **({"temperature": temperature} if temperature is not None else {}),
+        )
+        if response.usage is not None:
+            self._record_usage(response.usage.prompt_tokens, response.usage.completion_tokens)
+        return response.choices[0].message.content
+
+    def _sample(self, prompt, temperature, n):
+        # Groq only accepts n=1
+        return [self._generate(prompt, temperature) for _ in range(n)]
+
+    def _stream(self, prompt):
+        stream = self.client.chat.completions.create(
+            model=self.model_name,
+            messages=[{"role": "user", "content": prompt}],
+            stream=True,
+        )
+        try:
+            for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    yield delta
+        finally:
+            stream.close()
+
+
+class LocalProvider(Provider):
+    """
+    Offline CPU backend. LOCAL_MODEL_PATH pointing at a .gguf file uses
+    llama.cpp (llama-cpp-python); anything else is treated as a Hugging Face
+    model id for transformers.
+    """
+
+    name = "local"
+    default_model = "Qwen/Qwen2.5-Coder-0.5B-Instruct"
+
+    def __init__(self, model_name=None, max_new_tokens=384, **kwargs):
+        super().__init__(model_name or os.getenv("LOCAL_MODEL_PATH"), **kwargs)
+        self.max_new_tokens = max_new_tokens
+        # Local inference isn't thread-safe and is CPU bound anyway
+        self.lock = threading.Lock()
+        if self.model_name.endswith(".gguf"):
+            from llama_cpp import Llama
+
+            self.backend = "llama.cpp"
+            self.supports_stream = True
+            self.llm = Llama(model_path=self.model_name, n_ctx=8192, verbose=False)
+        else:
+            from transformers import AutoModelForCausalLM, AutoTokenizer
+
+            self.backend = "transformers"
+            self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+            self.llm = AutoModelForCausalLM.from_pretrained(self.model_name)
+
+    def _generate(self, prompt, temperature=0):
+        with self.lock:
+            if self.backend == "llama.cpp":
+                out = self.llm.create_chat_completion(
+                    messages=[{"role": "user", "content": prompt}], max_tokens=self.max_new_tokens,
+                    temperature=temperature,
+                )
+                usage = out.get("usage") or {}
+                self._record_usage(usage.get("prompt_tokens"), usage.get("completion_tokens"))
+                return out["choices"][0]["message"]["content"]
+            messages = [{"role": "user", "content": prompt}]
+            inputs = self.tokenizer.apply_chat_template(messages, add_generation_prompt=True, return_tensors="pt")
+            sampling = {"do_sample": True, "temperature": temperature} if temperature > 0 else {"do_sample": False}
+            output = self.llm.generate(inputs, max_new_tokens=self.max_new_tokens, **sampling)
+            self._record_usage(inputs.shape[-1], output.shape[-1] - inputs.shape[-1])
+            return self.tokenizer.decode(output[0][inputs.shape[-1]:], skip_special_tokens=True)
+
+    def _sample(self, prompt, temperature, n):
+        return [self._generate(prompt, temperature) for _ in range(n)]
+
+    def _stream(self, prompt):
+        if self.backend != "llama.cpp":
+            yield self._generate(prompt)
+            return
+        # llama.cpp decodes lazily, so stopping the iteration stops generation
+        with self.lock:
+            for chunk in self.llm.create_chat_completion(
+                messages=[{"role": "user", "content": prompt}], max_tokens=self.max_new_tokens, temperature=0,
+                stream=True,
+            ):
+                delta = chunk["choices"][0]["delta"].get("content")
+                if delta:
+                    yield delta
+
+    def count_tokens(self, text):
+        if self.backend == "llama.cpp":
+            return len(self.llm.tokenize(text.encode("utf-8")))
+        return len(self.tokenizer.encode(text))
+
+
+class FakeBackend(Provider):
+    """Wraps the fake provider (canned SQL, simulated latency and 429s)."""
+
+    name = "fake"
+    default_model = "fake"
+    supports_stream = True
+
+    def generate(self, prompt):
+        return fake_provider.get_fake_provider().generate(prompt)
+
+    def sample(self, prompt, temperature, n=1):
+        return [self.generate(prompt) for _ in range(n)]
+
+    def _stream(self, prompt):
+        return fake_provider.get_fake_provider().stream(prompt)
+
+
+class MockProvider(Provider):
+    """Deterministic, instant, never fails: always answers SELECT 1."""
+
+    name = "mock"
+    default_model = "mock"
+
+    def _generate(self, prompt):
+        return "-- Reasoning\nMock backend.\n\n-- SQL Query\nSELECT 1;"
+
+
+PROVIDERS = {
+    "gemini": GeminiProvider,
+    "groq": GroqProvider,
+    "local": LocalProvider,
+    "fake": FakeBackend,
+    "mock": MockProvider,
+}
+
+_instances = {}
+_instances_lock = threading.Lock()
+
+
+def register_provider(name, cls):
+    PROVIDERS[name] = cls
+
+
+def get_provider(name, **config):
+    """
+    Returns the configured backend `name`, creating it on first use (or
+    again when config is passed). Also sizes its rate limiter.
+    """
+    with _instances_lock:
+        if name not in _instances or config:
+            if name not in PROVIDERS:
+                raise ValueError(f"Invalid provider '{name}'. Choose one of {sorted(PROVIDERS)}.")
+            from dotenv import load_dotenv
+
+            load_dotenv()
+            provider = PROVIDERS[name](**config)
+            get_limiter(name, provider.rpm, provider.tpm)
+            _instances[name] = provider
+        return _instances[name]
+
+
+def benchmark(provider_names, prompts, max_workers=1):
+    """Latency percentiles and throughput of each backend over the same prompts."""
+    report = {}
+    for name in provider_names:
+        provider = get_provider(name)
+        latencies, errors = [], []
+
+        def timed(prompt):
+            start = time.perf_counter()
+            try:
+                provider.generate(prompt)
+            except RateLimitError as e:
+                errors.append(e)
+            latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            list(pool.map(timed, prompts))
+        wall = time.perf_counter() - start
+        latencies.sort()
+        report[name] = {
+            "model": provider.model_name,
+            "requests": len(prompts),
+            "p50_s": statistics.median(latencies) if latencies else 0,
+            "p95_s": percentile(latencies, 0.95) if latencies else 0,
+            "throughput_rps": len(prompts) / wall if wall > 0 else 0,
+            "rate_limited": len(errors),
+        }
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark provider backends on the same eval set.")
+    parser.add_argument("--providers", nargs="+", default=["mock"], choices=sorted(PROVIDERS))
+    parser.add_argument("--data", required=True, help="dataset json, e.g. data/bird/dev_subset.json")
+    parser.add_argument("--data_set", default="bird", choices=["spider", "bird"])
+    parser.add_argument("--n", type=int, default=20, help="number of questions")
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    from schema_catalog import db_path_for, get_catalog, serialize
+
+    with open(args.data, "r") as f:
+        items = json.load(f)[:args.n]
+    prompts = [
+        f"Database Schema:\n{serialize(get_catalog(db_path_for(item['db_id'], args.data_set)))}\n\n"
+        f"Question:\n{item['question']}\n\n-- SQL Query\n"
+        for item in items
+    ]
+    for name, stats in benchmark(args.providers, prompts, args.workers).items():
+        print(f"{name:<8} {stats['model']:<40} p50 {stats['p50_s']:.3f}s  p95 {stats['p95_s']:.3f}s  "
+              f"{stats['throughput_rps']:.2f} req/s  429s {stats['rate_limited']}")
@@ -0,0 +1,185 @@
+import math
+import multiprocessing
+import os
+import random
+import sqlite3
+import statistics
+import time
+from dataclasses import dataclass, field
+
+import sql_executor
+
+
+DEFAULT_WARMUP = 1
+DEFAULT_REPETITIONS = 10
+DEFAULT_TRIM = 0.1          # fraction dropped from each tail before averaging
+DEFAULT_BUDGET = 2.0        # seconds of repetitions per query; slow queries get fewer
+DEFAULT_TIMEOUT = sql_executor.DEFAULT_TIMEOUT
+BOOTSTRAP_SAMPLES = 1000
+
+
+@dataclass
+class TimingStats:
+    samples: list = field(repr=False)
+    median: float
+    trimmed_mean: float
+    ci_low: float
+    ci_high: float
+
+    @property
+    def n(self):
+        return len(self.samples)
+
+
+def percentile(ordered, q):
+    """Nearest-rank percentile (0 <= q <= 1) of an already sorted, non-empty list."""
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+
+def trimmed(samples, trim=DEFAULT_TRIM):
+    """Sorted samples with the `trim` fraction cut from both tails."""
+    ordered = sorted(samples)
+    cut = int(len(ordered) * trim)
+    return ordered[cut:len(ordered) - cut] or ordered
+
+
+def bootstrap_ci(values, statistic, confidence=0.95, n_boot=BOOTSTRAP_SAMPLES, seed=0):
+    """Percentile bootstrap CI. Seeded so the same samples always give the same interval."""
+    if len(values) < 2:
+        v = statistic(values) if values else 0.0
+        return v, v
+    rng = random.Random(seed)
+    stats = sorted(statistic([rng.choice(values) for _ in values]) for _ in range(n_boot))
+    return percentile(stats, (1 - confidence) / 2), percentile(stats, (1 + confidence) / 2)
+
+
+def summarize(samples, trim=DEFAULT_TRIM):
+    kept = trimmed(samples, trim)
+    lo, hi = bootstrap_ci(samples, statistics.median)
+    return TimingStats(samples, statistics.median(samples), statistics.fmean(kept), lo, hi)
+
+
+def _time_once(conn, sql, timeout):
+    """Seconds to execute + fetch on an open, warm connection; None when `timeout` ran out first."""
+    deadline = time.perf_counter() + timeout if timeout else None
+    conn.set_progress_handler(
+        lambda: 1 if deadline is not None and time.perf_counter() > deadline else 0, sql_executor.PROGRESS_INTERVAL
+    )
+    cursor = conn.cursor()
+    try:
+        start = time.perf_counter_ns()
+        cursor.execute(sql)
+        cursor.fetchall()
+        return (time.perf_counter_ns() - start) / 1e9
+    except sqlite3.OperationalError:
+        if deadline is not None and time.perf_counter() > deadline:
+            return None
+        raise
+    finally:
+        cursor.close()
+        conn.set_progress_handler(None, 0)
+
+
+def measure_samples(db_path, queries, warmup=DEFAULT_WARMUP, repetitions=DEFAULT_REPETITIONS,
+                    timeout=DEFAULT_TIMEOUT, budget=DEFAULT_BUDGET):
+    """
+    Raw timings per query. The warm-up run also sizes the repetitions: a
+    query only gets as many as fit in `budget` seconds (at least one). A run
+    that exceeds `timeout` is recorded as `timeout` and ends that query's
+    repetitions. Queries are interleaved so slow drift on the machine hits
+    all of them equally.
+    """
+    pool = sql_executor.get_pool(db_path)
+    conn = pool.acquire()
+    try:
+        samples = [[] for _ in queries]
+        reps = [repetitions] * len(queries)
+        for j, sql in enumerate(queries):
+            for _ in range(warmup):
+                elapsed = _time_once(conn, sql, timeout)
+                if elapsed is None:
+                    samples[j], reps[j] = [timeout], 0
+                    break
+                reps[j] = max(1, min(repetitions, int(budget / elapsed) if elapsed > 0 else repetitions))
+        for r in range(max(reps, default=0)):
+            for j, sql in enumerate(queries):
+                if r >= reps[j]:
+                    continue
+                elapsed = _time_once(conn, sql, timeout)
+                if elapsed is None:
+                    samples[j].append(timeout)
+                    reps[j] = r
+                else:
+                    samples[j].append(elapsed)
+        return samples
+    finally:
+        pool.release(conn)
+
+
+def _isolated_worker(args):
+    db_path, queries, kwargs, cpu = args
+    sql_executor.reset_after_fork()
+    if cpu is not None and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {cpu})
+    return measure_samples(db_path, queries, **kwargs)
+
+
+def _isolated(cpu):
+    def run(db_path, queries, **kwargs):
+        # forkserver: forking the multithreaded evaluator itself could deadlock on a lock held by another thread
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        with multiprocessing.get_context(method).Pool(1) as pool:
+            return pool.apply(_isolated_worker, ((db_path, list(queries), kwargs, cpu),))
+    return run
+
+
+def measure(db_path, queries, warmup=DEFAULT_WARMUP, repetitions=DEFAULT_REPETITIONS, isolated=False, cpu=None,
+            timeout=DEFAULT_TIMEOUT, budget=DEFAULT_BUDGET, runner=None):
+    """
+    Times each query up to `repetitions` times after `warmup` runs and
+    returns a TimingStats per query. isolated=True runs the measurement in a
+    fresh process (optionally pinned to `cpu`) away from the evaluator's
+    threads; `runner` (same signature as measure_samples, e.g. a sandbox
+    worker) runs it elsewhere. In-process measurements share the machine
+    with the other evaluator threads; warm-up, repetitions and the bootstrap
+    CI absorb that noise rather than a global lock.
+    """
+    if runner is None:
+        runner = _isolated(cpu) if isolated else measure_samples
+    samples = runner(db_path, list(queries), warmup=warmup, repetitions=repetitions, timeout=timeout, budget=budget)
+    return [summarize(s) for s in samples]
+
+
+def time_ratio(db_path, gold_sql, pred_sql, gold_samples=None, **kwargs):
+    """
+    Gold/predicted execution-time ratio from medians, with a bootstrap CI.
+    Stored gold timings (gold_samples, e.g. from the gold store) are reused,
+    so only the predicted query is executed. Returns (ratio, (ci_low,
+    ci_high), gold_stats, pred_stats).
+    """
+    if gold_samples:
+        gold, pred = summarize(list(gold_samples)), measure(db_path, [pred_sql], **kwargs)[0]
+    else:
+        gold, pred = measure(db_path, [gold_sql, pred_sql], **kwargs)
+    rng = random.Random(0)
+    ratios = []
+    for _ in range(BOOTSTRAP_SAMPLES):
+        g = statistics.median([rng.choice(gold.samples) for _ in gold.samples])
+        p = statistics.median([rng.choice(pred.samples) for _ in pred.samples])
+        ratios.append(g / p if p > 0 else 0.0)
+    ratios.sort()
+    ci = (percentile(ratios, 0.025), percentile(ratios, 0.975))
+    ratio = gold.median / pred.median if pred.median > 0 else 0.0
+    return ratio, ci, gold, pred
+
+
+def ves_score(ratios):
+    """BIRD VES over per-example time ratios (0 for incorrect examples)."""
+    if not ratios:
+        return 0
+    return sum(math.sqrt(r) * 100 if r > 0 else 0 for r in ratios) / len(ratios)
+
+
+def ves_confidence_interval(ratios, confidence=0.95):
+    """Bootstrap CI of VES over examples."""
+    return bootstrap_ci(list(ratios), ves_score, confidence)
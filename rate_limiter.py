@@ -0,0 +1,83 @@
+import threading
+import time
+
+
+# Free-tier quotas for the models we use (requests / tokens per minute).
+PROVIDER_LIMITS = {
+    "gemini": {"rpm": 10, "tpm": 250000},
+    "groq": {"rpm": 30, "tpm": 6000},
+    "fake": {"rpm": 6000, "tpm": 10**9},
+    "mock": {"rpm": 10**6, "tpm": 10**12},
+    "local": {"rpm": 10**6, "tpm": 10**12},
+}
+
+
+class RateLimitError(Exception):
+    """Raised when a provider answers with a 429 / quota exhausted error."""
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at `rate_per_min`."""
+
+    def __init__(self, rate_per_min, capacity=None):
+        self.rate = rate_per_min / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_min
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount=1):
+        # Never ask for more than the bucket can ever hold
+        amount = min(amount, self.capacity)
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def drain(self):
+        """Empty the bucket, e.g. after the provider told us we are over quota."""
+        with self.lock:
+            self._refill()
+            self.tokens = 0
+
+
+class ProviderLimiter:
+    """Requests-per-minute and tokens-per-minute buckets for one provider."""
+
+    def __init__(self, rpm, tpm):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+
+    def acquire(self, n_tokens):
+        self.requests.acquire(1)
+        self.tokens.acquire(n_tokens)
+
+    def penalize(self):
+        self.requests.drain()
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(provider, rpm=None, tpm=None):
+    """Returns the shared limiter for `provider`, creating it on first use."""
+    with _limiters_lock:
+        if provider not in _limiters or rpm is not None or tpm is not None:
+            limits = PROVIDER_LIMITS.get(provider, {"rpm": 60, "tpm": 10**6})
+            _limiters[provider] = ProviderLimiter(rpm or limits["rpm"], tpm or limits["tpm"])
+        return _limiters[provider]
+
+
+def estimate_tokens(text):
+    # ~4 characters per token is close enough for budgeting
+    return max(1, len(text or "") // 4)
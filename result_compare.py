@@ -0,0 +1,143 @@
+import hashlib
+import re
+from collections import Counter
+
+import sql_executor
+
+
+HASH_MOD = 1 << 128
+ORDER_BASE = 0x0000000001000000000000000000013B   # FNV-128 prime, multiplier of the ordered rolling hash
+FLOAT_DIGITS = 6
+VERIFY_MAX_ROWS = 100_000   # on a hash match, results up to this size are also compared row by row
+
+
+def normalize_value(value):
+    # 3 and 3.0 compare equal, and floats are rounded so 0.1 + 0.2 matches 0.3
+    if isinstance(value, float):
+        value = round(value, FLOAT_DIGITS)
+        if value.is_integer():
+            return int(value)
+    return value
+
+
+def normalize_row(row):
+    return tuple(normalize_value(v) for v in row)
+
+
+def sort_key(row):
+    # Orders mixed-type / NULL rows without a TypeError: NULL < numbers < text < blobs
+    key = []
+    for v in normalize_row(row):
+        if v is None:
+            key.append((0, 0))
+        elif isinstance(v, (int, float)):
+            key.append((1, v))
+        elif isinstance(v, str):
+            key.append((2, v))
+        else:
+            key.append((3, bytes(v)))
+    return tuple(key)
+
+
+def _row_digest(row):
+    data = repr(normalize_row(row)).encode("utf-8", "surrogatepass")
+    return int.from_bytes(hashlib.blake2b(data, digest_size=16).digest(), "big")
+
+
+class ResultDigest:
+    """
+    Streaming fingerprint of a result set: an order-insensitive multiset
+    hash (sum of row hashes) and an ordered rolling hash, plus row count.
+    """
+
+    def __init__(self, row_count=0, multiset=0, ordered=0):
+        self.row_count = row_count
+        self.multiset = multiset
+        self.ordered = ordered
+
+    def update(self, rows):
+        for row in rows:
+            d = _row_digest(row)
+            self.row_count += 1
+            self.multiset = (self.multiset + d) % HASH_MOD
+            self.ordered = (self.ordered * ORDER_BASE + d) % HASH_MOD
+
+    def matches(self, other, ordered=False):
+        if other is None or self.row_count != other.row_count:
+            return False
+        if ordered:
+            return self.ordered == other.ordered
+        return self.multiset == other.multiset
+
+    def to_dict(self):
+        # Hex strings, since the hashes don't fit in a SQLite INTEGER
+        return {"row_count": self.row_count, "multiset": f"{self.multiset:032x}", "ordered": f"{self.ordered:032x}"}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d["row_count"], int(d["multiset"], 16), int(d["ordered"], 16))
+
+
+def has_order_by(sql):
+    """True when the outermost query has an ORDER BY (subquery ORDER BYs don't count)."""
+    if not sql:
+        return False
+    text = re.sub(r"'(?:[^']|'')*'", "''", sql)
+    previous = None
+    while previous != text:
+        previous = text
+        text = re.sub(r"\([^()]*\)", "()", text)
+    return re.search(r"\bORDER\s+BY\b", text, re.IGNORECASE) is not None
+
+
+def digest_query(db_path, sql, **kwargs):
+    """Executes `sql` streaming rows into a ResultDigest. Returns (ExecutionResult, digest or None)."""
+    digest = ResultDigest()
+    outcome = sql_executor.run_query(db_path, sql, on_batch=digest.update, **kwargs)
+    return outcome, digest if outcome.ok else None
+
+
+def digest_gold(db_path, sql):
+    """digest_query under the gold limits (sql_executor.GOLD_TIMEOUT, GOLD_MAX_ROWS)."""
+    return digest_query(db_path, sql, timeout=sql_executor.GOLD_TIMEOUT, max_rows=sql_executor.GOLD_MAX_ROWS)
+
+
+def rows_equal(gold_rows, pred_rows, ordered=False):
+    gold = [normalize_row(r) for r in gold_rows]
+    pred = [normalize_row(r) for r in pred_rows]
+    if ordered:
+        return gold == pred
+    return Counter(gold) == Counter(pred)
+
+
+def digest_verdict(gold_digest, pred_digest, ordered=False):
+    """False on a digest mismatch, True on a match too large to verify, None when the rows must be checked."""
+    if pred_digest is None or not pred_digest.matches(gold_digest, ordered):
+        return False
+    if pred_digest.row_count > VERIFY_MAX_ROWS:
+        return True
+    return None
+
+
+def compare(db_path, gold_sql, pred_sql, gold_digest, pred_digest, ordered=False, gold_rows=None):
+    """
+    Decides execution match from digests. Only when they match (and the
+    result is small enough) are both sides materialized and compared row
+    by row, to rule out a hash collision.
+    """
+    verdict = digest_verdict(gold_digest, pred_digest, ordered)
+    if verdict is not None:
+        return verdict
+    return verify(db_path, gold_sql, pred_sql, ordered, gold_rows)
+
+
+def verify(db_path, gold_sql, pred_sql, ordered=False, gold_rows=None):
+    """Row-by-row check behind a digest match; the gold SQL is only executed when gold_rows is None."""
+    pred = sql_executor.run_query(db_path, pred_sql)
+    if gold_rows is None:
+        gold = sql_executor.run_query(db_path, gold_sql, timeout=sql_executor.GOLD_TIMEOUT,
+                                      max_rows=sql_executor.GOLD_MAX_ROWS)
+        if not gold.ok:
+            return False
+        gold_rows = gold.rows
+    return pred.ok and rows_equal(gold_rows, pred.rows, ordered)
@@ -0,0 +1,279 @@
+import argparse
+import glob
+import hashlib
+import json
+import math
+import os
+import re
+import sqlite3
+import time
+
+import run_log
+from query_timing import percentile
+
+
+STORE_PATH = os.path.join(".cache", "results.sqlite")
+DEFAULT_SOURCES = [
+    "json_outputs/**/results_*.json",
+    "spider/results_*.jsonl",
+    "gemini_results/**/*.txt",
+    "groq_results/**/*.txt",
+]
+# Eval files that carry BIRD's per-question difficulty
+DIFFICULTY_FILES = [
+    os.path.join("sts_generation", "bird_200.json"),
+    os.path.join("sts_generation", "dev_bird_filtered_200.json"),
+    os.path.join("data", "bird", "dev_subset.json"),
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (path TEXT PRIMARY KEY, mtime REAL, size INTEGER);
+CREATE TABLE IF NOT EXISTS runs (
+    run TEXT PRIMARY KEY, provider TEXT, data_set TEXT, strategy TEXT, top_k INTEGER,
+    reported_accuracy REAL, reported_ves REAL
+);
+CREATE TABLE IF NOT EXISTS results (
+    run TEXT NOT NULL, qkey TEXT NOT NULL, db_id TEXT, question TEXT, difficulty TEXT,
+    correct INTEGER, time_ratio REAL, pred_time REAL, orig_time REAL,
+    generation_time REAL, time_to_sql REAL, prompt_tokens INTEGER, completion_tokens INTEGER,
+    pred_status TEXT, pred_query TEXT,
+    PRIMARY KEY (run, qkey)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS results_qkey ON results (qkey);
+CREATE INDEX IF NOT EXISTS results_db ON results (db_id, run);
+"""
+
+GROUPINGS = {
+    "run": "r.run",
+    "strategy": "runs.strategy",
+    "provider": "runs.provider",
+    "data_set": "runs.data_set",
+    "difficulty": "r.difficulty",
+    "db": "r.db_id",
+}
+
+
+def question_key(db_id, question):
+    return hashlib.sha1(f"{db_id}\x00{question}".encode("utf-8")).hexdigest()[:16]
+
+
+def parse_run_name(run):
+    """gemini_bird_dynamic_fewshot_top3 -> (provider, data_set, strategy, top_k)."""
+    match = re.match(r"(?P<provider>[a-z]+)_(?P<data_set>spider|bird)_(?P<strategy>.+?)(?:_top(?P<k>\d+))?$", run)
+    if not match:
+        return None, None, run, None
+    provider = {"gorq": "groq"}.get(match["provider"], match["provider"])
+    return provider, match["data_set"], match["strategy"], int(match["k"]) if match["k"] else None
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _correct(value):
+    return 1 if value in (True, 1, "True", "true", "1") else 0
+
+
+def connect(path=STORE_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    conn.create_function("sqrt", 1, lambda x: math.sqrt(x) if x is not None and x > 0 else 0.0, deterministic=True)
+    return conn
+
+
+def load_difficulties(paths=DIFFICULTY_FILES):
+    difficulties = {}
+    for path in paths:
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                for item in json.load(f):
+                    if "difficulty" in item:
+                        difficulties[question_key(item["db_id"], item["question"])] = item["difficulty"]
+    return difficulties
+
+
+def _records(path):
+    if path.endswith(".jsonl"):
+        return run_log.iter_records(path)
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def _upsert_run(conn, run, **reported):
+    provider, data_set, strategy, top_k = parse_run_name(run)
+    conn.execute(
+        "INSERT INTO runs (run, provider, data_set, strategy, top_k) VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT (run) DO NOTHING",
+        (run, provider, data_set, strategy, top_k),
+    )
+    for column, value in reported.items():
+        conn.execute(f"UPDATE runs SET {column} = ? WHERE run = ?", (value, run))
+
+
+def ingest_file(conn, path, difficulties):
+    """Loads one per-example results file (.json array or .jsonl run log) or one summary .txt."""
+    name = os.path.splitext(os.path.basename(path))[0]
+    if path.endswith(".txt"):
+        with open(path, "r") as f:
+            text = f.read()
+        accuracy = re.search(r"Execution Accuracy:\s*([\d.]+)", text)
+        ves = re.search(r"Valid Efficiency Score \(VES\):\s*([\d.]+)", text)
+        _upsert_run(conn, name, reported_accuracy=_float(accuracy and accuracy.group(1)),
+                    reported_ves=_float(ves and ves.group(1)))
+        return 0
+
+    run = name[len("results_"):] if name.startswith("results_") else name
+    _upsert_run(conn, run)
+    rows = []
+    for r in _records(path):
+        db_id = r.get("id") or r.get("db_id")
+        key = question_key(db_id, r["question"])
+        rows.append((
+            run, key, db_id, r["question"], difficulties.get(key), _correct(r.get("check")),
+            _float(r.get("time_ratio")), _float(r.get("pred_time")), _float(r.get("orig_time")),
+            _float(r.get("generation_time")), _float(r.get("time_to_sql")),
+            r.get("prompt_tokens"), r.get("completion_tokens"), r.get("pred_status"), r.get("pred_query"),
+        ))
+    # The file is the whole run: rows of questions it no longer has must go too
+    conn.execute("DELETE FROM results WHERE run = ?", (run,))
+    conn.executemany(f"INSERT OR REPLACE INTO results VALUES ({', '.join('?' * 15)})", rows)
+    return len(rows)
+
+
+def ingest(patterns=DEFAULT_SOURCES, path=STORE_PATH, force=False):
+    """Ingests every matching file that is new or changed since the last ingest. Returns (files, rows)."""
+    conn = connect(path)
+    difficulties = load_difficulties()
+    files = rows = 0
+    with conn:
+        for pattern in patterns:
+            for source in sorted(glob.glob(pattern, recursive=True)):
+                stat = os.stat(source)
+                seen = conn.execute("SELECT mtime, size FROM sources WHERE path = ?", (source,)).fetchone()
+                if not force and seen == (stat.st_mtime, stat.st_size):
+                    continue
+                rows += ingest_file(conn, source, difficulties)
+                files += 1
+                conn.execute("INSERT OR REPLACE INTO sources VALUES (?, ?, ?)", (source, stat.st_mtime, stat.st_size))
+    conn.close()
+    return files, rows
+
+
+def summary(conn, by="strategy", where=None, params=()):
+    """Accuracy / VES / example count grouped by one of GROUPINGS (plus data_set for cross-dataset groups)."""
+    group = GROUPINGS[by]
+    keys = group if by in ("run", "data_set") else f"runs.data_set, {group}"
+    sql = f"""
+        SELECT {keys}, COUNT(*), 100.0 * AVG(r.correct), 100.0 * AVG(CASE WHEN r.correct THEN sqrt(r.time_ratio) ELSE 0 END)
+        FROM results r JOIN runs USING (run)
+        {"WHERE " + where if where else ""}
+        GROUP BY {keys} ORDER BY {keys}
+    """
+    return conn.execute(sql, params).fetchall()
+
+
+def diff(conn, run_a, run_b, limit=20):
+    """Per-question wins (a right, b wrong), losses and ties between two runs over their shared questions."""
+    rows = conn.execute(
+        """
+        SELECT a.db_id, a.question, a.correct, b.correct
+        FROM results a JOIN results b ON a.qkey = b.qkey
+        WHERE a.run = ? AND b.run = ?
+        """,
+        (run_a, run_b),
+    ).fetchall()
+    wins = [(db, q) for db, q, ca, cb in rows if ca and not cb]
+    losses = [(db, q) for db, q, ca, cb in rows if cb and not ca]
+    return {
+        "shared": len(rows),
+        "wins": len(wins),
+        "losses": len(losses),
+        "both_correct": sum(1 for _, _, ca, cb in rows if ca and cb),
+        "both_wrong": sum(1 for _, _, ca, cb in rows if not ca and not cb),
+        "win_examples": wins[:limit],
+        "loss_examples": losses[:limit],
+    }
+
+
+def latency(conn, column="pred_time", where=None, params=()):
+    """p50 / p90 / p99 / max of a timing column per run."""
+    if column not in ("pred_time", "orig_time", "generation_time", "time_to_sql"):
+        raise ValueError(f"not a timing column: {column}")
+    rows = conn.execute(
+        f"SELECT r.run, r.{column} FROM results r JOIN runs USING (run) "
+        f"WHERE r.{column} IS NOT NULL {'AND ' + where if where else ''} ORDER BY r.run, r.{column}",
+        params,
+    ).fetchall()
+    report = {}
+    for run, value in rows:
+        report.setdefault(run, []).append(value)
+    return {run: {"n": len(v), "p50": percentile(v, 0.5), "p90": percentile(v, 0.9), "p99": percentile(v, 0.99),
+                  "max": v[-1]}
+            for run, v in report.items()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest and compare evaluation runs.")
+    parser.add_argument("--store", default=STORE_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("ingest", help="load json_outputs, run logs and summary txt files")
+    p.add_argument("patterns", nargs="*", default=DEFAULT_SOURCES)
+    p.add_argument("--force", action="store_true", help="re-ingest unchanged files too")
+
+    p = sub.add_parser("summary", help="accuracy and VES grouped by a dimension")
+    p.add_argument("--by", default="strategy", choices=sorted(GROUPINGS))
+    p.add_argument("--data_set", choices=["spider", "bird"])
+    p.add_argument("--provider")
+    p.add_argument("--run", help="SQL LIKE pattern on the run name, e.g. 'gemini_bird_%%'")
+
+    p = sub.add_parser("diff", help="win/loss between two runs")
+    p.add_argument("run_a")
+    p.add_argument("run_b")
+    p.add_argument("--show", type=int, default=10)
+
+    p = sub.add_parser("latency", help="timing percentiles per run")
+    p.add_argument("--column", default="pred_time")
+    p.add_argument("--run", help="SQL LIKE pattern on the run name")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.command == "ingest":
+        files, rows = ingest(args.patterns, args.store, args.force)
+        print(f"Ingested {rows} results from {files} new or changed files into {args.store}")
+    else:
+        conn = connect(args.store)
+        filters, params = [], []
+        for column, value in (("runs.data_set", getattr(args, "data_set", None)),
+                              ("runs.provider", getattr(args, "provider", None))):
+            if value:
+                filters.append(f"{column} = ?")
+                params.append(value)
+        if getattr(args, "run", None):
+            filters.append("r.run LIKE ?")
+            params.append(args.run)
+        where = " AND ".join(filters) or None
+
+        if args.command == "summary":
+            for row in summary(conn, args.by, where, params):
+                *keys, n, accuracy, ves = row
+                print(f"{' / '.join(str(k) for k in keys):<50} {n:>6} {accuracy:>7.2f}% {ves:>8.2f}")
+        elif args.command == "diff":
+            report = diff(conn, args.run_a, args.run_b, args.show)
+            print(f"{report['shared']} shared questions: {args.run_a} wins {report['wins']}, "
+                  f"loses {report['losses']}, both right {report['both_correct']}, both wrong {report['both_wrong']}")
+            for label, examples in (("Wins", report["win_examples"]), ("Losses", report["loss_examples"])):
+                if examples:
+                    print(f"\n{label}:")
+                    for db_id, question in examples:
+                        print(f"  [{db_id}] {question}")
+        elif args.command == "latency":
+            for run, stats in latency(conn, args.column, where, params).items():
+                print(f"{run:<45} n={stats['n']:<5} p50 {stats['p50']:.4f}s  p90 {stats['p90']:.4f}s  "
+                      f"p99 {stats['p99']:.4f}s  max {stats['max']:.4f}s")
+        conn.close()
+    print(f"({time.perf_counter() - start:.3f}s)")
@@ -0,0 +1,220 @@
+import argparse
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from common import file_fingerprint
+
+
+MODEL_ID = "all-MiniLM-L6-v2"
+INDEX_DIR = os.path.join(".cache", "retrieval")
+
+# Knowledge pools are disjoint from the eval questions, so retrieval can't leak the gold SQL
+DEFAULT_KNOWLEDGE = {
+    "bird": os.path.join("sts_generation", "bird_rest.json"),
+    "spider": os.path.join("sts_generation", "dev_spider_knowledge_2.json"),
+}
+
+_models = {}
+
+
+def get_model(model_id=MODEL_ID):
+    """Loads the sentence-transformers model once per process."""
+    if model_id not in _models:
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+        _models[model_id] = SentenceTransformer(model_id).to(device=device)
+    return _models[model_id]
+
+
+def embed(texts, model_id=MODEL_ID, batch_size=256):
+    """Batched, L2-normalised float32 embeddings, so a dot product is cosine similarity."""
+    vectors = get_model(model_id).encode(
+        list(texts), batch_size=batch_size, normalize_embeddings=True, convert_to_numpy=True
+    )
+    return np.ascontiguousarray(vectors, dtype=np.float32)
+
+
+def load_knowledge(path):
+    """Knowledge pool as [{"question", "query", "db_id"}] for both BIRD ("SQL") and Spider ("query") files."""
+    with open(path, "r") as f:
+        items = json.load(f)
+    return [
+        {"question": item["question"], "query": item["SQL"] if "SQL" in item else item["query"], "db_id": item.get("db_id")}
+        for item in items
+    ]
+
+
+class KnowledgeIndex:
+    """Knowledge-pool embeddings as one (N, d) float32 matrix plus the matching records."""
+
+    def __init__(self, records, matrix, model_id=MODEL_ID):
+        self.records = records
+        self.matrix = matrix
+        self.model_id = model_id
+
+    @classmethod
+    def build(cls, knowledge_path, model_id=MODEL_ID, index_dir=INDEX_DIR):
+        """Loads the persisted index for `knowledge_path`, embedding the pool only if it changed."""
+        # Hugging Face ids contain "/" ("sentence-transformers/all-MiniLM-L6-v2"), which must not become a subdirectory
+        model_tag = re.sub(r"[^A-Za-z0-9._-]+", "_", model_id)
+        prefix = os.path.join(index_dir, f"{os.path.splitext(os.path.basename(knowledge_path))[0]}_{model_tag}")
+        digest = file_fingerprint(knowledge_path)
+        meta_path, matrix_path = prefix + ".json", prefix + ".npy"
+
+        if os.path.exists(meta_path) and os.path.exists(matrix_path):
+            with open(meta_path, "r") as f:
+                meta = json.load(f)
+            if meta["source_hash"] == digest:
+                return cls(meta["records"], np.load(matrix_path, mmap_mode="r"), model_id)
+
+        records = load_knowledge(knowledge_path)
+        matrix = embed([r["question"] for r in records], model_id)
+        os.makedirs(index_dir, exist_ok=True)
+        np.save(matrix_path, matrix)
+        with open(meta_path, "w") as f:
+            json.dump({"source_hash": digest, "model_id": model_id, "records": records}, f)
+        return cls(records, np.load(matrix_path, mmap_mode="r"), model_id)
+
+    def scores(self, query_vectors):
+        return np.asarray(query_vectors, dtype=np.float32) @ self.matrix.T
+
+    def top_k(self, query_vectors, k=5):
+        """Returns (indices, scores), each (Q, k), best match first."""
+        sims = self.scores(query_vectors)
+        k = min(k, sims.shape[1])
+        part = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        part_scores = np.take_along_axis(sims, part, axis=1)
+        order = np.argsort(-part_scores, axis=1)
+        return np.take_along_axis(part, order, axis=1), np.take_along_axis(part_scores, order, axis=1)
+
+    def examples(self, indices):
+        return [{"query": self.records[j]["query"], "question": self.records[j]["question"]} for j in indices]
+
+
+def attach_top_k(eval_items, index, k=5, field="top_5"):
+    """Adds `field` (k nearest knowledge examples) to every eval item, in one matrix product."""
+    query_vectors = embed([item["question"] for item in eval_items], index.model_id)
+    indices, _ = index.top_k(query_vectors, k)
+    for item, row in zip(eval_items, indices):
+        item[field] = index.examples(row)
+    return eval_items
+
+
+class Retriever:
+    """
+    Long-lived few-shot retriever: the knowledge index is loaded once and
+    query embeddings are kept in an LRU cache, so repeated questions and
+    repeated runs over the same eval set don't re-encode anything.
+    """
+
+    def __init__(self, index, cache_size=4096):
+        self.index = index
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.db_ids = np.array([r.get("db_id") for r in index.records], dtype=object)
+
+    def embed_queries(self, questions):
+        """Embeds all cache misses in a single batch and returns a (Q, d) matrix."""
+        with self.lock:
+            missing = []
+            for q in dict.fromkeys(questions):
+                if q in self.cache:
+                    # Touch hits first so inserting this batch's misses doesn't evict them
+                    self.cache.move_to_end(q)
+                else:
+                    missing.append(q)
+        if missing:
+            vectors = embed(missing, self.index.model_id)
+            with self.lock:
+                for q, v in zip(missing, vectors):
+                    self.cache[q] = v
+                    self.cache.move_to_end(q)
+                while len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+        with self.lock:
+            rows = []
+            for q in questions:
+                # Evicted in between only if the batch is bigger than the cache itself
+                v = self.cache.get(q)
+                if v is None:
+                    v = embed([q], self.index.model_id)[0]
+                else:
+                    self.cache.move_to_end(q)
+                rows.append(v)
+        return np.stack(rows)
+
+    def _mmr(self, candidates, sims, k, mmr_lambda):
+        """Maximal marginal relevance: trade similarity to the query against redundancy."""
+        vectors = np.asarray(self.index.matrix[candidates])
+        pairwise = vectors @ vectors.T
+        selected = [0]
+        while len(selected) < min(k, len(candidates)):
+            redundancy = pairwise[:, selected].max(axis=1)
+            score = mmr_lambda * sims - (1 - mmr_lambda) * redundancy
+            score[selected] = -np.inf
+            selected.append(int(np.argmax(score)))
+        return [candidates[i] for i in selected]
+
+    def retrieve(self, questions, k=5, db_ids=None, mmr_lambda=None, fetch_factor=4):
+        """
+        Returns, per question, its k nearest knowledge examples as
+        [{"query", "question"}]. db_ids restricts each question to examples of
+        the same database (falling back to the whole pool if there are fewer
+        than k); mmr_lambda in (0, 1] enables MMR re-ranking.
+        """
+        query_vectors = self.embed_queries(questions)
+        sims_all = self.index.scores(query_vectors)
+        results = []
+        for row, sims in enumerate(sims_all):
+            if db_ids is not None:
+                mask = self.db_ids == db_ids[row]
+                if mask.sum() >= k:
+                    sims = np.where(mask, sims, -np.inf)
+            n = min(len(sims), k * fetch_factor if mmr_lambda else k)
+            part = np.argpartition(-sims, n - 1)[:n]
+            part = part[np.argsort(-sims[part])]
+            if mmr_lambda:
+                part = self._mmr(part, sims[part], k, mmr_lambda)
+            results.append(self.index.examples(part[:k]))
+        return results
+
+
+_retrievers = {}
+_retrievers_lock = threading.Lock()
+
+
+def get_retriever(knowledge_path, model_id=MODEL_ID):
+    """Process-wide Retriever per knowledge file, built on first use."""
+    key = (os.path.abspath(knowledge_path), model_id)
+    with _retrievers_lock:
+        if key not in _retrievers:
+            _retrievers[key] = Retriever(KnowledgeIndex.build(knowledge_path, model_id))
+        return _retrievers[key]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Regenerate dev_*_filtered files with top-k few-shot examples.")
+    parser.add_argument("eval_path", help="e.g. sts_generation/bird_200.json")
+    parser.add_argument("knowledge_path", help="e.g. sts_generation/bird_rest.json")
+    parser.add_argument("output_path", help="e.g. data/bird/dev_bird_filtered_200.json")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--model", default=MODEL_ID)
+    args = parser.parse_args()
+
+    with open(args.eval_path, "r") as f:
+        eval_items = json.load(f)
+
+    index = KnowledgeIndex.build(args.knowledge_path, args.model)
+    attach_top_k(eval_items, index, args.k)
+
+    with open(args.output_path, "w") as f:
+        json.dump(eval_items, f, indent=2)
+    print(f"Wrote top_{args.k} for {len(eval_items)} questions to {args.output_path}")
@@ -0,0 +1,165 @@
+import argparse
+import csv
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import dataset_store
+import prompts
+import self_consistency
+import utils
+
+
+DEFAULTS = {
+    "strategies": ["simple", "structured", "fewshot", "dynamic_fewshot"],
+    "providers": ["gemini", "groq"],
+    "datasets": ["spider", "bird"],
+    "top_k": [1, 2, 3, 4, 5],
+    "max_workers": 4,       # examples in flight per job
+    "parallel_jobs": 4,     # jobs in flight; providers still share one rate limiter each
+    "batch_size": 0,        # > 0 switches static strategies to batched prompting
+    "samples": 1,           # > 1 votes among sampled candidates (self-consistency)
+    "db_ids": [],           # non-empty: only examples of these databases
+    "difficulties": [],     # non-empty: only these BIRD difficulties
+    "resume": False,
+    "leaderboard": "leaderboard",
+}
+
+
+def load_spec(path):
+    """Reads a TOML (or, with PyYAML installed, YAML) experiment spec, filling in defaults."""
+    if path.endswith((".yaml", ".yml")):
+        import yaml
+
+        with open(path, "r") as f:
+            spec = yaml.safe_load(f) or {}
+    else:
+        import tomllib
+
+        with open(path, "rb") as f:
+            spec = tomllib.load(f)
+    spec = {**DEFAULTS, **spec.get("experiment", spec)}
+    for key in ("strategies", "providers", "datasets", "top_k"):
+        if not isinstance(spec[key], list):
+            spec[key] = [spec[key]]
+    unknown = set(spec["strategies"]) - set(prompts.STRATEGIES)
+    if unknown:
+        raise ValueError(f"Unknown strategies {sorted(unknown)}. Choose from {sorted(prompts.STRATEGIES)}.")
+    return spec
+
+
+def expand(spec):
+    """
+    strategy x provider x dataset (x top_k for dynamic few-shot) -> list of job dicts.
+    Voting runs carry N and the temperature in their version_name.
+    """
+    jobs = []
+    for strategy, provider, data_set in itertools.product(spec["strategies"], spec["providers"], spec["datasets"]):
+        # Batched prompting doesn't vote
+        votes = strategy == "dynamic_fewshot" or spec["batch_size"] <= 0
+        sc = self_consistency.version_suffix(spec["samples"]) if votes else ""
+        if strategy == "dynamic_fewshot":
+            for k in spec["top_k"]:
+                jobs.append({"strategy": strategy, "provider": provider, "data_set": data_set, "top_k": k,
+                             "version_name": f"{provider}_{data_set}_{strategy}{sc}_top{k}"})
+        else:
+            jobs.append({"strategy": strategy, "provider": provider, "data_set": data_set, "top_k": None,
+                         "version_name": f"{provider}_{data_set}_{strategy}{sc}"})
+    return jobs
+
+
+def run_job(job, spec, datasets, examples):
+    template = prompts.STRATEGIES[job["strategy"]]
+    data = datasets[(job["strategy"], job["data_set"])]
+    start = time.perf_counter()
+    if job["strategy"] == "dynamic_fewshot":
+        accuracy, ves = utils.evaluate_dynamic_fewshot(
+            data, template, job["top_k"], job["data_set"], job["version_name"], job["provider"],
+            spec["max_workers"], examples=examples[job["data_set"]], resume=spec["resume"], samples=spec["samples"],
+        )
+    elif spec["batch_size"] > 0:
+        accuracy, ves = utils.evaluate_batched(
+            data, template, job["data_set"], job["version_name"], job["provider"],
+            spec["batch_size"], spec["max_workers"], spec["resume"],
+        )
+    else:
+        accuracy, ves = utils.evaluate(
+            data, template, job["data_set"], job["version_name"], job["provider"],
+            spec["max_workers"], spec["resume"], spec["samples"],
+        )
+    return {**job, "accuracy": accuracy, "ves": ves, "examples": len(data), "wall_s": time.perf_counter() - start}
+
+
+def write_leaderboard(rows, prefix):
+    rows = sorted(rows, key=lambda r: (-r["accuracy"], -r["ves"]))
+    fields = ["version_name", "strategy", "provider", "data_set", "top_k", "examples", "accuracy", "ves", "wall_s"]
+    with open(f"{prefix}.csv", "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+    with open(f"{prefix}.md", "w") as f:
+        f.write("| Run | Examples | Execution Accuracy | VES | Wall time (s) |\n|---|---|---|---|---|\n")
+        for r in rows:
+            f.write(f"| {r['version_name']} | {r['examples']} | {r['accuracy']:.2f}% | {r['ves']:.2f} | {r['wall_s']:.1f} |\n")
+    return rows
+
+
+def run(spec):
+    jobs = expand(spec)
+    print(f"--- {len(jobs)} jobs ---")
+    for job in jobs:
+        print(f"  {job['version_name']}")
+
+    for provider in spec["providers"]:
+        utils.init_provider(provider)
+
+    # Each eval file is loaded once, reading only the selected examples through its offset index;
+    # dynamic few-shot retrieves once per dataset at the largest top_k
+    datasets = {}
+    for job in jobs:
+        key = (job["strategy"], job["data_set"])
+        if key not in datasets:
+            datasets[key] = dataset_store.load(
+                prompts.data_path(*key), db_id=spec["db_ids"] or None, difficulty=spec["difficulties"] or None,
+            )
+    examples = {}
+    for data_set in spec["datasets"]:
+        if ("dynamic_fewshot", data_set) in datasets:
+            examples[data_set] = utils.fewshot_examples(
+                datasets[("dynamic_fewshot", data_set)], max(spec["top_k"]), data_set,
+                spec.get("knowledge_path"), spec.get("same_db", False), spec.get("mmr_lambda"),
+            )
+
+    with ThreadPoolExecutor(max_workers=spec["parallel_jobs"]) as pool:
+        rows = list(pool.map(lambda job: run_job(job, spec, datasets, examples), jobs))
+
+    rows = write_leaderboard(rows, spec["leaderboard"])
+    print("\n--- Leaderboard ---")
+    for r in rows:
+        print(f"{r['version_name']:<45} {r['accuracy']:>7.2f}% {r['ves']:>8.2f}")
+    print(f"Written to {spec['leaderboard']}.csv and {spec['leaderboard']}.md")
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run an experiment matrix (strategy x provider x dataset x top_k).")
+    parser.add_argument("--spec", help="TOML/YAML experiment spec, e.g. experiments.toml")
+    parser.add_argument("--strategies", nargs="+")
+    parser.add_argument("--providers", nargs="+")
+    parser.add_argument("--datasets", nargs="+")
+    parser.add_argument("--top_k", nargs="+", type=int)
+    parser.add_argument("--max_workers", type=int)
+    parser.add_argument("--parallel_jobs", type=int)
+    parser.add_argument("--batch_size", type=int)
+    parser.add_argument("--samples", type=int)
+    parser.add_argument("--db_ids", nargs="+")
+    parser.add_argument("--difficulties", nargs="+", choices=["simple", "moderate", "challenging"])
+    parser.add_argument("--resume", action="store_true", default=None)
+    args = parser.parse_args()
+
+    spec = load_spec(args.spec) if args.spec else dict(DEFAULTS)
+    # Command-line flags override the spec
+    for key, value in vars(args).items():
+        if key != "spec" and value is not None:
+            spec[key] = value
+    run(spec)
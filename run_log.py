@@ -0,0 +1,133 @@
+import json
+import os
+import threading
+
+
+FAILED = "generation_failed"    # pred_status of an example the model never answered; not finished
+
+def results_path(version_name):
+    return os.path.join("spider", f"results_{version_name}.jsonl")
+
+
+def record_key(db_id, question, version_name):
+    return (db_id, question, version_name)
+
+
+def iter_records(path):
+    """Streams records from a JSONL run log, skipping a torn last line from a crash."""
+    if not os.path.exists(path):
+        return
+    with open(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def completed_keys(path, version_name):
+    return {
+        record_key(r["id"], r["question"], r.get("version_name", version_name))
+        for r in iter_records(path)
+        if r.get("pred_status") != FAILED
+    }
+
+
+def compact(path):
+    """
+    Rewrites the log without generation failures and without a torn last
+    line, so a resumed run redoes those examples and appends after the last
+    complete record. The file is only replaced when something was dropped.
+    Returns the number of dropped lines.
+    """
+    if not os.path.exists(path):
+        return 0
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    dropped, unterminated = 0, False
+    with open(path, "r") as f, open(tmp_path, "w") as out:
+        for line in f:
+            try:
+                record = json.loads(line) if line.strip() else None
+            except json.JSONDecodeError:
+                record = None
+            if record is None or record.get("pred_status") == FAILED:
+                dropped += 1
+                continue
+            if not line.endswith("\n"):
+                # Complete record whose newline didn't make it to disk
+                line, unterminated = line + "\n", True
+            out.write(line)
+        out.flush()
+        os.fsync(out.fileno())
+    if dropped or unterminated:
+        os.replace(tmp_path, path)
+    else:
+        os.remove(tmp_path)
+    return dropped
+
+
+class RunWriter:
+    """
+    Appends one JSON record per finished example. Records are flushed and
+    fsync'ed every `fsync_every` writes, so a crash loses at most that many.
+    Appending to an existing log compacts it first (see compact).
+    """
+
+    def __init__(self, path, fsync_every=1, truncate=False):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.fsync_every = fsync_every
+        self.pending = 0
+        self.lock = threading.Lock()
+        if not truncate:
+            compact(path)
+        self.f = open(path, "w" if truncate else "a")
+
+    def write(self, record):
+        line = json.dumps(record) + "\n"
+        with self.lock:
+            self.f.write(line)
+            self.pending += 1
+            if self.pending >= self.fsync_every:
+                self._sync()
+
+    def _sync(self):
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        self.pending = 0
+
+    def close(self):
+        with self.lock:
+            self._sync()
+            self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def summarize(path):
+    """Accuracy and the per-example time ratios, read by streaming the run log."""
+    total, correct, ratios = 0, 0, []
+    for r in iter_records(path):
+        total += 1
+        correct += bool(r.get("check"))
+        ratios.append(r.get("time_ratio", 0))
+    accuracy = (correct / total) * 100 if total > 0 else 0
+    return total, accuracy, ratios
+
+
+def export_json(path, out_path):
+    """Writes the run log as the pretty-printed JSON array earlier runs produced, one record at a time."""
+    with open(out_path, "w") as out:
+        out.write("[")
+        for n, r in enumerate(iter_records(path)):
+            out.write(",\n" if n else "\n")
+            out.write("    " + json.dumps(r, indent=4).replace("\n", "\n    "))
+        out.write("\n]")
@@ -0,0 +1,160 @@
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+
+from common import quote_identifier
+from rate_limiter import estimate_tokens
+
+
+SCHEMA_CACHE_DIR = os.path.join(".cache", "schema")
+SCHEMA_FORMATS = ("ddl", "compact")
+
+_memo = {}
+_memo_lock = threading.Lock()
+
+
+def introspect(path):
+    """Reads tables, columns, types, primary and foreign keys of one database."""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    cursor = conn.cursor()
+    cursor.execute("SELECT name, sql FROM sqlite_master WHERE type='table';")
+    tables = []
+    for name, sql in cursor.fetchall():
+        columns = [
+            {"name": row[1], "type": row[2] or "", "pk": bool(row[5])}
+            for row in conn.execute(f"PRAGMA table_info(`{name}`)")
+        ]
+        fks = [
+            {"column": row[3], "ref_table": row[2], "ref_column": row[4]}
+            for row in conn.execute(f"PRAGMA foreign_key_list(`{name}`)")
+        ]
+        tables.append({"name": name, "sql": sql, "columns": columns, "fks": fks})
+    conn.close()
+    return {"path": os.path.abspath(path), "mtime": os.path.getmtime(path), "tables": tables}
+
+
+def _disk_path(path):
+    digest = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(SCHEMA_CACHE_DIR, f"{digest}.json")
+
+
+def get_catalog(path):
+    """
+    Returns the catalog for `path`, introspecting the database at most once
+    per file version. Memoized in process and on disk, keyed by file mtime.
+    """
+    mtime = os.path.getmtime(path)
+    key = os.path.abspath(path)
+    with _memo_lock:
+        catalog = _memo.get(key)
+        if catalog is not None and catalog["mtime"] == mtime:
+            return catalog
+
+        disk_path = _disk_path(path)
+        catalog = None
+        if os.path.exists(disk_path):
+            try:
+                with open(disk_path, "r") as f:
+                    catalog = json.load(f)
+            except ValueError:  # truncated by a crash in an older version; rebuilt below
+                catalog = None
+            if catalog is not None and catalog.get("mtime") != mtime:
+                catalog = None
+        if catalog is None:
+            catalog = introspect(path)
+            os.makedirs(SCHEMA_CACHE_DIR, exist_ok=True)
+            # Written next to the final path and renamed over it, so readers never see a partial file
+            tmp_path = f"{disk_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(catalog, f)
+            os.replace(tmp_path, disk_path)
+
+        _memo[key] = catalog
+        return catalog
+
+
+def serialize(catalog, fmt="ddl", tables=None, columns=None):
+    """
+    Renders a catalog as prompt text.
+      ddl     - the original CREATE TABLE statements
+      compact - table(col:type, ...) lines, PK columns marked with *, FKs as arrows
+    `tables` optionally restricts the output to a subset of table names and
+    `columns` ({table: set of column names}, compact only) to a subset of columns.
+    """
+    if fmt not in SCHEMA_FORMATS:
+        raise ValueError(f"Invalid schema format '{fmt}'. Choose one of {SCHEMA_FORMATS}.")
+    selected = [t for t in catalog["tables"] if tables is None or t["name"] in tables]
+
+    if fmt == "ddl":
+        return "\n".join(t["sql"] for t in selected if t["sql"])
+
+    # Internal tables like sqlite_sequence are noise for the model
+    selected = [t for t in selected if not t["name"].startswith("sqlite_")]
+    lines = []
+    for t in selected:
+        keep = columns.get(t["name"]) if columns else None
+        cols = ", ".join(
+            f"{quote_identifier(c['name'])}{'*' if c['pk'] else ''}:{c['type'].lower()}" if c["type"]
+            else f"{quote_identifier(c['name'])}{'*' if c['pk'] else ''}"
+            for c in t["columns"]
+            if keep is None or c["name"] in keep
+        )
+        lines.append(f"{quote_identifier(t['name'])}({cols})")
+    for t in selected:
+        for fk in t["fks"]:
+            if tables is not None and fk["ref_table"] not in tables:
+                continue
+            ref_column = fk["ref_column"] or "rowid"
+            lines.append(
+                f"{quote_identifier(t['name'])}.{quote_identifier(fk['column'])} -> "
+                f"{quote_identifier(fk['ref_table'])}.{quote_identifier(ref_column)}"
+            )
+    return "\n".join(lines)
+
+
+def token_report(paths):
+    """Per-database token counts for each serialization format."""
+    report = {}
+    for path in paths:
+        catalog = get_catalog(path)
+        db_id = os.path.splitext(os.path.basename(path))[0]
+        report[db_id] = {fmt: estimate_tokens(serialize(catalog, fmt)) for fmt in SCHEMA_FORMATS}
+    return report
+
+
+def database_root(data_set):
+    if data_set == "spider":
+        return os.path.join("spider", "database")
+    return os.path.join("data", "bird", "dev_databases")
+
+
+def db_path_for(db_id, data_set):
+    # This is the correct path to the DATABASE file
+    return os.path.join(database_root(data_set), db_id, f"{db_id}.sqlite")
+
+
+def _database_paths(data_set):
+    root = database_root(data_set)
+    return sorted(
+        os.path.join(root, db_id, f"{db_id}.sqlite")
+        for db_id in os.listdir(root)
+        if os.path.exists(os.path.join(root, db_id, f"{db_id}.sqlite"))
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the schema catalog and report prompt token counts.")
+    parser.add_argument("data_set", choices=["spider", "bird"])
+    args = parser.parse_args()
+
+    report = token_report(_database_paths(args.data_set))
+    print(f"{'db_id':<35}{'ddl':>10}{'compact':>10}{'saved':>8}")
+    for db_id, counts in report.items():
+        saved = 100 * (1 - counts["compact"] / counts["ddl"]) if counts["ddl"] else 0
+        print(f"{db_id:<35}{counts['ddl']:>10}{counts['compact']:>10}{saved:>7.1f}%")
+    total_ddl = sum(c["ddl"] for c in report.values())
+    total_compact = sum(c["compact"] for c in report.values())
+    print(f"{'TOTAL':<35}{total_ddl:>10}{total_compact:>10}")
@@ -0,0 +1,218 @@
+import argparse
+import json
+import os
+import re
+
+import schema_catalog
+from rate_limiter import estimate_tokens
+
+
+STOPWORDS = {
+    "the", "a", "an", "of", "in", "on", "for", "to", "and", "or", "is", "are", "was", "were",
+    "what", "which", "who", "whom", "how", "many", "much", "list", "show", "give", "find",
+    "name", "names", "all", "with", "by", "from", "that", "this", "there", "their", "its",
+    "refers", "refer", "be", "as", "at", "it", "do", "does", "did", "please", "among",
+}
+
+
+def _words(text):
+    # Split camelCase and snake_case identifiers as well as plain text
+    text = re.sub(r"([a-z])([A-Z])", r"\1 \2", text or "")
+    words = re.findall(r"[a-z0-9]+", text.lower())
+    return {w.rstrip("s") if len(w) > 3 else w for w in words if w not in STOPWORDS}
+
+
+def _overlap(query_words, identifier):
+    ident = _words(identifier)
+    if not ident:
+        return 0.0
+    return len(query_words & ident) / len(ident)
+
+
+_embedder = None
+
+
+def _embed(texts):
+    global _embedder
+    if _embedder is None:
+        from sentence_transformers import SentenceTransformer
+        _embedder = SentenceTransformer("all-MiniLM-L6-v2")
+    return _embedder.encode(texts, normalize_embeddings=True)
+
+
+def score_schema(catalog, question, evidence="", use_embeddings=False):
+    """
+    Scores every table and column against the question (+ BIRD evidence).
+    Returns ({table: score}, {table: {column: score}}).
+    """
+    text = f"{question} {evidence or ''}"
+    query_words = _words(text)
+    # Exact identifier mentions (evidence often spells out column names)
+    lowered = text.lower()
+
+    table_scores, column_scores = {}, {}
+    for t in catalog["tables"]:
+        if t["name"].startswith("sqlite_"):
+            continue
+        cols = {}
+        for c in t["columns"]:
+            score = _overlap(query_words, c["name"])
+            if len(c["name"]) > 2 and c["name"].lower() in lowered:
+                score += 1.0
+            cols[c["name"]] = score
+        column_scores[t["name"]] = cols
+        name_score = _overlap(query_words, t["name"]) * 2
+        if t["name"].lower() in lowered:
+            name_score += 1.0
+        top_cols = sorted(cols.values(), reverse=True)[:3]
+        table_scores[t["name"]] = name_score + sum(top_cols)
+
+    if use_embeddings and table_scores:
+        names = list(table_scores)
+        by_name = {t["name"]: t for t in catalog["tables"]}
+        docs = [f"{n}: " + ", ".join(c["name"] for c in by_name[n]["columns"]) for n in names]
+        vectors = _embed([text] + docs)
+        sims = vectors[1:] @ vectors[0]
+        for name, sim in zip(names, sims):
+            table_scores[name] += float(sim)
+    return table_scores, column_scores
+
+
+def _fk_edges(catalog):
+    edges = {}
+    for t in catalog["tables"]:
+        for fk in t["fks"]:
+            edges.setdefault(t["name"], set()).add(fk["ref_table"])
+            edges.setdefault(fk["ref_table"], set()).add(t["name"])
+    return edges
+
+
+def select_schema(catalog, question, evidence="", token_budget=1500, fmt="ddl",
+                  use_embeddings=False, prune_columns=False):
+    """
+    Picks the tables most relevant to the question, plus FK neighbours that
+    connect them, within `token_budget` tokens. Returns (tables, columns);
+    tables is None when the full schema should be kept (it already fits or
+    nothing matches).
+    """
+    if estimate_tokens(schema_catalog.serialize(catalog, fmt)) <= token_budget:
+        return None, None
+
+    table_scores, column_scores = score_schema(catalog, question, evidence, use_embeddings)
+    ranked = [t for t, s in sorted(table_scores.items(), key=lambda x: -x[1]) if s > 0]
+    if not ranked:
+        return None, None
+
+    columns = None
+    if prune_columns and fmt == "compact":
+        columns = {}
+        for t in catalog["tables"]:
+            fk_cols = {fk["column"] for fk in t["fks"]}
+            columns[t["name"]] = {
+                c["name"] for c in t["columns"]
+                if c["pk"] or c["name"] in fk_cols or column_scores.get(t["name"], {}).get(c["name"], 0) > 0
+            }
+        # Referenced columns must survive too, otherwise the FK arrows dangle
+        for t in catalog["tables"]:
+            for fk in t["fks"]:
+                if fk["ref_column"] and fk["ref_table"] in columns:
+                    columns[fk["ref_table"]].add(fk["ref_column"])
+
+    def fits(tables):
+        return estimate_tokens(schema_catalog.serialize(catalog, fmt, tables=tables, columns=columns)) <= token_budget
+
+    selected = []
+    for t in ranked:
+        if not selected or fits(selected + [t]):
+            selected.append(t)
+
+    # Keep FK neighbours: bridges between two selected tables first, then the rest by score
+    edges = _fk_edges(catalog)
+    neighbours = {n for t in selected for n in edges.get(t, ()) if n not in selected and n in table_scores}
+    for n in sorted(neighbours, key=lambda n: (-len(edges.get(n, set()) & set(selected)), -table_scores[n])):
+        if fits(selected + [n]):
+            selected.append(n)
+
+    return set(selected), columns
+
+
+def prune_schema(catalog, question, evidence="", token_budget=1500, fmt="ddl",
+                 use_embeddings=False, prune_columns=False):
+    """Schema text trimmed to the tables chosen by select_schema."""
+    tables, columns = select_schema(catalog, question, evidence, token_budget, fmt, use_embeddings, prune_columns)
+    return schema_catalog.serialize(catalog, fmt, tables=tables, columns=columns)
+
+
+def gold_tables(catalog, sql):
+    names = {t["name"].lower(): t["name"] for t in catalog["tables"]}
+    found = re.findall(r"(?:FROM|JOIN)\s+(?:`([^`]+)`|\"([^\"]+)\"|\[([^\]]+)\]|(\w+))", sql, re.IGNORECASE)
+    found = ["".join(groups) for groups in found]
+    return {names[f.lower()] for f in found if f.lower() in names}
+
+
+def benchmark(data, data_set, token_budget, fmt, use_embeddings=False, prune_columns=False, provider=None, prompt=None):
+    """
+    Reports the prompt-token reduction of pruning and how many gold-SQL tables
+    survive. With a provider, also runs both variants and reports EX accuracy.
+    """
+    full_tokens, pruned_tokens, recall_hits, recall_total = 0, 0, 0, 0
+    full_schemas, pruned_schemas = [], []
+    for item in data:
+        path = schema_catalog.db_path_for(item["db_id"], data_set)
+        catalog = schema_catalog.get_catalog(path)
+        tables, columns = select_schema(catalog, item["question"], item.get("evidence", ""), token_budget, fmt,
+                                        use_embeddings, prune_columns)
+        full = schema_catalog.serialize(catalog, fmt)
+        pruned = schema_catalog.serialize(catalog, fmt, tables=tables, columns=columns)
+        full_schemas.append(full)
+        pruned_schemas.append(pruned)
+        full_tokens += estimate_tokens(full)
+        pruned_tokens += estimate_tokens(pruned)
+        gold = gold_tables(catalog, item["query"] if data_set == "spider" else item["SQL"])
+        recall_total += len(gold)
+        recall_hits += len(gold) if tables is None else len(gold & tables)
+
+    report = {
+        "examples": len(data),
+        "full_schema_tokens": full_tokens,
+        "pruned_schema_tokens": pruned_tokens,
+        "token_reduction_pct": 100 * (1 - pruned_tokens / full_tokens) if full_tokens else 0,
+        "gold_table_recall_pct": 100 * recall_hits / recall_total if recall_total else 100,
+    }
+
+    if provider:
+        import utils
+        for label, schemas in (("full", full_schemas), ("pruned", pruned_schemas)):
+            correct = 0
+            for i, item in enumerate(data):
+                d = utils.evaluate_example(i, item, prompt, data_set, provider, schema=schemas[i])
+                correct += d["check"]
+            report[f"accuracy_{label}"] = 100 * correct / len(data) if data else 0
+        report["accuracy_delta"] = report["accuracy_pruned"] - report["accuracy_full"]
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark query-relevant schema pruning.")
+    parser.add_argument("--data_set", default="bird", choices=["spider", "bird"])
+    parser.add_argument("--data", default=os.path.join("data", "bird", "dev_bird_filtered_200.json"))
+    parser.add_argument("--budget", type=int, default=1500)
+    parser.add_argument("--format", default="ddl", choices=schema_catalog.SCHEMA_FORMATS)
+    parser.add_argument("--embeddings", action="store_true", help="add sentence-embedding similarity")
+    parser.add_argument("--prune_columns", action="store_true", help="also drop unmatched columns (compact only)")
+    parser.add_argument("--provider", default=None, help="also measure execution accuracy with this provider")
+    args = parser.parse_args()
+
+    with open(args.data, "r") as f:
+        data = json.load(f)
+
+    prompt = None
+    if args.provider:
+        import utils
+        utils.init_provider(args.provider)
+        prompt = "### db_info:\n{db_schema}\n\n### Input:\n{user_question}\n\n### Response:\n-- SQL Query\n"
+
+    report = benchmark(data, args.data_set, args.budget, args.format, args.embeddings,
+                       args.prune_columns, args.provider, prompt)
+    for k, v in report.items():
+        print(f"{k:<25} {v:.2f}" if isinstance(v, float) else f"{k:<25} {v}")
@@ -0,0 +1,126 @@
+import argparse
+import json
+import os
+import statistics
+
+import run_log
+import sql_sandbox
+from query_timing import percentile
+
+
+DEFAULT_TEMPERATURE = 0.7
+
+
+def sampling_temperature():
+    """Sampling temperature of the voted candidates (SC_TEMPERATURE)."""
+    return float(os.getenv("SC_TEMPERATURE", DEFAULT_TEMPERATURE))
+
+
+def version_suffix(samples, temperature=None):
+    """
+    Run-name suffix for the voting settings, e.g. "_sc5_t0.7", so runs with
+    different N or temperature get their own run log. "" for samples <= 1.
+    """
+    if samples <= 1:
+        return ""
+    if temperature is None:
+        temperature = sampling_temperature()
+    return f"_sc{samples}_t{temperature:g}"
+
+
+def _cluster_key(digest):
+    # Same rows regardless of order -> same answer
+    return digest.row_count, digest.multiset
+
+
+def vote(sample, db_path, n, execute=sql_sandbox.digest_query):
+    """
+    Self-consistency: draws up to n candidates and returns the one whose
+    execution result is most common. sample(start, count) -> [(llm_output, sql)].
+
+    Candidates are drawn in waves just large enough for the current leader to
+    reach a majority, and drawing stops as soon as no other cluster can catch
+    up, so easy questions cost about n/2 + 1 samples instead of n.
+    """
+    candidates, clusters, executed = [], {}, {}
+    waves = 0
+    majority = n // 2 + 1
+    while len(candidates) < n:
+        sizes = sorted((len(members) for members in clusters.values()), reverse=True) + [0, 0]
+        remaining = n - len(candidates)
+        if sizes[0] - sizes[1] > remaining:
+            break
+        waves += 1
+        for output, sql in sample(len(candidates), min(remaining, max(1, majority - sizes[0]))):
+            # Identical SQL text is only executed once
+            if sql not in executed:
+                executed[sql] = execute(db_path, sql)
+            outcome, digest = executed[sql]
+            candidates.append({"output": output, "sql": sql, "outcome": outcome, "digest": digest})
+            if digest is not None:
+                clusters.setdefault(_cluster_key(digest), []).append(len(candidates) - 1)
+
+    # Largest cluster wins, ties go to the cluster sampled first; if nothing ran, keep the first sample
+    if clusters:
+        winner = min(clusters.values(), key=lambda members: (-len(members), members[0]))
+        chosen = candidates[winner[0]]
+    else:
+        chosen = candidates[0]
+    return {
+        **chosen,
+        "samples": len(candidates),
+        "waves": waves,
+        "clusters": sorted((len(members) for members in clusters.values()), reverse=True),
+        "outputs": [c["output"] for c in candidates],
+    }
+
+
+def tradeoff(version_names):
+    """Accuracy / latency / cost per run, from the runs' JSONL logs."""
+    rows = []
+    for version_name in version_names:
+        records = list(run_log.iter_records(run_log.results_path(version_name)))
+        if not records:
+            continue
+        latencies = sorted(r.get("generation_time", 0) for r in records)
+        rows.append({
+            "version_name": version_name,
+            "examples": len(records),
+            "accuracy": 100 * sum(1 for r in records if r.get("check")) / len(records),
+            "p50_s": statistics.median(latencies),
+            "p95_s": percentile(latencies, 0.95),
+            "samples": statistics.mean(r.get("samples", 1) for r in records),
+            "requests": statistics.mean(r.get("requests", 1) for r in records),
+            "tokens": statistics.mean(r.get("prompt_tokens", 0) + r.get("completion_tokens", 0) for r in records),
+        })
+    return rows
+
+
+if __name__ == "__main__":
+    import prompts
+    import utils
+
+    parser = argparse.ArgumentParser(description="Accuracy / latency / cost of self-consistency voting per N.")
+    parser.add_argument("--provider", default="gemini")
+    parser.add_argument("--data_set", default="bird", choices=["spider", "bird"])
+    parser.add_argument("--strategy", default="fewshot", choices=["simple", "structured", "fewshot"])
+    parser.add_argument("--n", nargs="+", type=int, default=[1, 3, 5, 7])
+    parser.add_argument("--max_workers", type=int, default=4)
+    parser.add_argument("--resume", action="store_true")
+    args = parser.parse_args()
+
+    utils.init_provider(args.provider)
+    with open(prompts.data_path(args.strategy, args.data_set), "r") as f:
+        data = json.load(f)
+
+    version_names = []
+    for n in args.n:
+        version_name = f"{args.provider}_{args.data_set}_{args.strategy}{version_suffix(n)}"
+        utils.evaluate(data, prompts.STRATEGIES[args.strategy], args.data_set, version_name, args.provider,
+                       args.max_workers, args.resume, samples=n)
+        version_names.append(version_name)
+
+    print(f"\n{'Run':<40} {'Acc':>7} {'p50 s':>7} {'p95 s':>7} {'samples':>8} {'requests':>9} {'tokens':>8}")
+    for r in tradeoff(version_names):
+        print(f"{r['version_name']:<40} {r['accuracy']:>6.2f}% {r['p50_s']:>7.2f} {r['p95_s']:>7.2f} "
+              f"{r['samples']:>8.2f} {r['requests']:>9.2f} {r['tokens']:>8.0f}")
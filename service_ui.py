@@ -0,0 +1,34 @@
+"""Streamlit front end for sql_service.py: streamlit run service_ui.py"""
+import json
+import os
+import urllib.request
+
+import streamlit as st
+
+SERVICE_URL = os.getenv("SQL_SERVICE_URL", "http://127.0.0.1:8000")
+
+
+def post(path, payload):
+    request = urllib.request.Request(
+        SERVICE_URL + path, data=json.dumps(payload).encode("utf-8"), headers={"Content-Type": "application/json"}
+    )
+    with urllib.request.urlopen(request) as response:
+        return json.load(response)
+
+
+st.title("NLP-to-SQL")
+db_id = st.text_input("Database (db_id)", "california_schools")
+question = st.text_input("Question")
+if st.button("Ask") and question:
+    answer = post("/query", {"question": question, "db_id": db_id})
+    st.code(answer["sql"] or "", language="sql")
+    st.caption(f"{answer['cache']} · {answer['latency_ms']:.0f} ms · {answer['status']}")
+    if answer["error"]:
+        st.error(answer["error"])
+    st.dataframe(answer["rows"])
+    if answer["truncated"]:
+        st.caption(f"First {len(answer['rows'])} rows only")
+
+with st.sidebar:
+    with urllib.request.urlopen(SERVICE_URL + "/metrics") as response:
+        st.json(json.load(response))
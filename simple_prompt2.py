@@ -1,15 +1,11 @@
 import json
 import os
-from utils import *
+from utils import evaluate, preprocessing, run_options
+from prompts import SIMPLE_PROMPT
 
 
 def main():
-    good_prompt="""
-        Below is an instruction that describes a task, paired with an input that provides further context.
-        Write a response that appropriately completes the request.
-
-        ### db_info:\n{db_schema}\n\n### Input:\n{user_question}\n\n### Response:
-        """
+    good_prompt = SIMPLE_PROMPT
 
 
     sub_path = (
@@ -21,7 +17,7 @@ def main():
         dev_data = json.load(f)
 
     data_to_evaluate = dev_data
-    evaluate(data_to_evaluate, good_prompt, data_set, version_name, provider)
+    evaluate(data_to_evaluate, good_prompt, data_set, version_name, provider, resume=run_options().resume)
 
 
 if __name__ == "__main__":
@@ -1,9 +1,7 @@
-from dotenv import load_dotenv
-import streamlit as st
-import os
-import sqlite3
-import google.generativeai as genai
-question=input("enter text query")
+import argparse
+
+import providers
+
 prompt = """
 You are an expert in converting English questions to SQL queries!
 The SQL database name is STUDENT and has the following columns: NAME, CLASS, SECTION.
@@ -17,9 +15,19 @@ A: SELECT * FROM STUDENT WHERE CLASS = "Data Science";
 
 Return only valid SQL code — no ``` or 'sql' tags.
 """
-load_dotenv()
-API_KEY = os.getenv("GOOGLE_API_KEY")
-genai.configure(api_key=API_KEY)
-model=genai.GenerativeModel("gemini-2.5-flash")
-response=model.generate_content([prompt,question])
-print(response.text)
\ No newline at end of file
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ask one question against the STUDENT example table.")
+    parser.add_argument("question", nargs="?")
+    parser.add_argument("--provider", default="gemini")
+    args = parser.parse_args()
+
+    question = args.question or input("enter text query")
+    # The provider SDK is only imported here, when its backend is created
+    model = providers.get_provider(args.provider)
+    print(model.generate(prompt + "\n" + question))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+
+
+DEFAULT_TIMEOUT = 30.0          # wall-clock seconds per query
+DEFAULT_MAX_STEPS = None        # SQLite VM instructions per query (None = unlimited)
+DEFAULT_MAX_ROWS = 1_000_000    # rows fetched before giving up
+FETCH_SIZE = 1000
+PROGRESS_INTERVAL = 1000        # VM instructions between progress-handler calls
+# Gold SQL is trusted and can legitimately be slow or huge on BIRD, so it gets its own, much looser limits
+GOLD_TIMEOUT = 600.0
+GOLD_MAX_ROWS = None
+
+OK, TIMEOUT, ERROR, ROW_LIMIT = "ok", "timeout", "error", "row_limit"
+
+
+@dataclass
+class ExecutionResult:
+    status: str
+    rows: list = field(default=None, repr=False)
+    exec_time: float = None
+    error: str = None
+    truncated: bool = False     # rows were cut at max_rows (run_query(truncate=True))
+
+    @property
+    def ok(self):
+        return self.status == OK
+
+
+class ConnectionPool:
+    """
+    Read-only connections to one database file. Connections are reused
+    across queries and handed to one thread at a time.
+    """
+
+    def __init__(self, path, max_size=8, immutable=True, cache_size_kb=65536, mmap_size=256 * 1024 * 1024):
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        self.path = path
+        self.max_size = max_size
+        self.immutable = immutable
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size
+        self.idle = queue.LifoQueue()
+        self.created = 0
+        self.lock = threading.Lock()
+
+    def _connect(self):
+        # immutable=1 skips locking and change detection; the benchmark databases never change during a run
+        uri = f"file:{os.path.abspath(self.path)}?mode=ro" + ("&immutable=1" if self.immutable else "")
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        conn.execute(f"PRAGMA cache_size=-{self.cache_size_kb}")
+        conn.execute(f"PRAGMA mmap_size={self.mmap_size}")
+        return conn
+
+    def acquire(self):
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            if self.created < self.max_size:
+                self.created += 1
+                return self._connect()
+        return self.idle.get()
+
+    def release(self, conn):
+        self.idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(path):
+    key = os.path.abspath(path)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(path)
+        return _pools[key]
+
+
+def reset_after_fork():
+    """Forget pools inherited from a parent process; SQLite connections must not cross fork()."""
+    global _pools, _pools_lock
+    _pools = {}
+    _pools_lock = threading.Lock()
+
+
+def close_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+
+def run_query(db_path, query, timeout=DEFAULT_TIMEOUT, max_steps=DEFAULT_MAX_STEPS, max_rows=DEFAULT_MAX_ROWS,
+              on_batch=None, truncate=False):
+    """
+    Executes `query` on a pooled read-only connection and returns an
+    ExecutionResult with status ok / timeout / error / row_limit.
+    With on_batch, fetched batches are streamed to it instead of being
+    collected, and the result carries no rows. With truncate, a result over
+    max_rows stops fetching and comes back ok with its first max_rows rows
+    and truncated=True instead of row_limit.
+    """
+    if not query:
+        return ExecutionResult(ERROR, error="empty query")
+    try:
+        pool = get_pool(db_path)
+    except FileNotFoundError as e:
+        return ExecutionResult(ERROR, error=f"database not found: {e}")
+
+    conn = pool.acquire()
+    state = {"steps": 0, "reason": None}
+    deadline = time.perf_counter() + timeout if timeout else None
+
+    def progress():
+        state["steps"] += PROGRESS_INTERVAL
+        if deadline is not None and time.perf_counter() > deadline:
+            state["reason"] = TIMEOUT
+            return 1
+        if max_steps is not None and state["steps"] > max_steps:
+            state["reason"] = TIMEOUT
+            return 1
+        return 0
+
+    conn.set_progress_handler(progress, PROGRESS_INTERVAL)
+    cursor = conn.cursor()
+    try:
+        start = time.perf_counter()
+        cursor.execute(query)
+        rows = [] if on_batch is None else None
+        n_rows = 0
+        while True:
+            batch = cursor.fetchmany(FETCH_SIZE)
+            if not batch:
+                break
+            n_rows += len(batch)
+            if max_rows is not None and n_rows > max_rows:
+                if not truncate:
+                    return ExecutionResult(ROW_LIMIT, exec_time=time.perf_counter() - start,
+                                           error=f"more than {max_rows} rows")
+                batch = batch[:len(batch) - (n_rows - max_rows)]
+                if on_batch is None:
+                    rows.extend(batch)
+                else:
+                    on_batch(batch)
+                return ExecutionResult(OK, rows, time.perf_counter() - start, truncated=True)
+            if on_batch is None:
+                rows.extend(batch)
+            else:
+                on_batch(batch)
+        return ExecutionResult(OK, rows, time.perf_counter() - start)
+    except sqlite3.Error as e:
+        if state["reason"] == TIMEOUT:
+            return ExecutionResult(TIMEOUT, error=f"interrupted after {state['steps']} VM steps")
+        return ExecutionResult(ERROR, error=str(e))
+    except Exception as e:
+        # e.g. MemoryError, whose message is empty
+        return ExecutionResult(ERROR, error=str(e) or type(e).__name__)
+    finally:
+        cursor.close()
+        conn.set_progress_handler(None, 0)
+        pool.release(conn)
@@ -0,0 +1,109 @@
+import difflib
+import re
+
+import schema_catalog
+import sql_executor
+import sql_sandbox
+from common import quote_identifier
+from eval_engine import GenerationFailed
+
+
+MAX_LOCAL_FIXES = 3     # schema-based rewrites tried before (and between) LLM attempts
+EXPLAIN_TIMEOUT = 5.0
+
+_MISSING = re.compile(r"no such (column|table): (\S+)", re.IGNORECASE)
+
+
+def explain_error(db_path, sql):
+    """Compiles `sql` with EXPLAIN (nothing is executed). Returns the error message, None if it compiles."""
+    outcome = sql_executor.run_query(db_path, f"EXPLAIN {sql}", timeout=EXPLAIN_TIMEOUT)
+    return None if outcome.ok else outcome.error
+
+
+def _normalize(name):
+    # "Free Meal Count (K-12)" and free_meal_count_k12 compare equal
+    return re.sub(r"[^a-z0-9]", "", name.lower())
+
+
+def closest_name(name, candidates):
+    """Best schema match for a misspelled table/column name, None if nothing is close."""
+    by_norm = {_normalize(c): c for c in candidates}
+    if _normalize(name) in by_norm:
+        return by_norm[_normalize(name)]
+    match = difflib.get_close_matches(_normalize(name), list(by_norm), n=1, cutoff=0.75)
+    return by_norm[match[0]] if match else None
+
+
+def fuzzy_fix(sql, error, catalog):
+    """
+    Rewrites an unknown table/column name from a SQLite error into the
+    closest name in the catalog. Returns the new SQL, or None when the error
+    isn't of that kind or nothing close enough exists.
+    """
+    match = _MISSING.search(error or "")
+    if not match or not sql:
+        return None
+    kind, bad = match.group(1).lower(), match.group(2).strip("`\"'[]")
+    if kind == "column":
+        bad = bad.split(".")[-1]
+        names = {col["name"] for table in catalog["tables"] for col in table["columns"]}
+    else:
+        names = {table["name"] for table in catalog["tables"]}
+    fixed_name = closest_name(bad, names)
+    if fixed_name is None or fixed_name == bad:
+        return None
+
+    escaped = re.escape(bad)
+    pattern = rf"`{escaped}`|\"{escaped}\"|\[{escaped}\]|(?<![\w'\"`]){escaped}(?![\w'\"`])"
+    fixed = re.sub(pattern, lambda _: quote_identifier(fixed_name), sql, flags=re.IGNORECASE)
+    return fixed if fixed != sql else None
+
+
+def repair(db_path, sql, error, llm_fix, max_attempts=2, execute=sql_sandbox.digest_query):
+    """
+    Execution-feedback repair of a query that failed with `error`. Cheap local
+    fixes (schema-based name correction, checked with EXPLAIN) come first;
+    llm_fix(sql, error) -> new SQL is only called when those run out, at most
+    max_attempts times.
+
+    Returns (sql, outcome, digest, attempts); sql is None when nothing worked.
+    attempts lists {"kind": "local"|"llm", "sql", "error"} in order. When
+    llm_fix raises GenerationFailed the repair stops there, with a final
+    attempt marked "skipped", and the caller keeps its original outcome.
+    """
+    catalog = schema_catalog.get_catalog(db_path)
+    attempts = []
+    local_fixes = llm_calls = 0
+    while True:
+        candidate = None
+        if local_fixes < MAX_LOCAL_FIXES:
+            candidate = fuzzy_fix(sql, error, catalog)
+        if candidate is not None:
+            kind = "local"
+            local_fixes += 1
+        elif llm_calls < max_attempts:
+            kind = "llm"
+            llm_calls += 1
+            try:
+                candidate = llm_fix(sql, error)
+            except GenerationFailed as e:
+                attempts.append({"kind": kind, "sql": None, "error": str(e), "skipped": True})
+                return None, None, None, attempts
+        else:
+            return None, None, None, attempts
+
+        if not candidate:
+            attempts.append({"kind": kind, "sql": None, "error": "no SQL in the answer"})
+            continue
+        outcome = digest = None
+        error = explain_error(db_path, candidate)
+        if error is None:
+            outcome, digest = execute(db_path, candidate)
+            error = None if outcome.ok else outcome.error
+        attempts.append({"kind": kind, "sql": candidate, "error": error})
+        if error is None:
+            return candidate, outcome, digest, attempts
+        if outcome is not None and outcome.status != sql_executor.ERROR:
+            # Timeouts and oversized results aren't something the error text can fix
+            return None, None, None, attempts
+        sql = candidate
@@ -0,0 +1,228 @@
+import multiprocessing
+import os
+import pickle
+import threading
+import zlib
+
+import query_timing
+import result_compare
+import sql_executor
+from sql_executor import ERROR, OK, TIMEOUT, ExecutionResult
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+DEFAULT_WORKERS = os.cpu_count() or 2
+DEFAULT_TIMEOUT = sql_executor.DEFAULT_TIMEOUT
+HARD_TIMEOUT_GRACE = 5.0        # seconds past the in-worker timeout before the worker is killed
+DEFAULT_MEMORY_LIMIT_MB = 2048
+
+
+def _run_job(mode, db_path, args, timeout):
+    """One job in the worker. Returns (status, error, result)."""
+    if mode == "digest":
+        outcome, digest = result_compare.digest_query(db_path, args["sql"], timeout=timeout)
+        return outcome.status, outcome.error, (outcome.exec_time, digest.to_dict() if digest else None)
+    if mode == "rows":
+        outcome = sql_executor.run_query(db_path, args["sql"], timeout=timeout, max_rows=args["max_rows"],
+                                         truncate=args["truncate"])
+        return outcome.status, outcome.error, (outcome.exec_time, outcome.rows, outcome.truncated)
+    if mode == "verify":
+        return OK, None, result_compare.verify(db_path, **args)
+    if mode == "measure":
+        return OK, None, query_timing.measure_samples(db_path, **args)
+    raise ValueError(f"unknown sandbox job: {mode}")
+
+
+def _worker_main(conn, timeout, memory_limit_mb):
+    """Worker loop: keeps warm read-only pools per database and answers one job at a time."""
+    sql_executor.reset_after_fork()
+    if resource is not None and memory_limit_mb:
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    while True:
+        try:
+            message = conn.recv_bytes()
+        except EOFError:
+            break
+        mode, db_path, args = pickle.loads(message)
+        try:
+            payload = _run_job(mode, db_path, args, timeout)
+        except MemoryError:
+            payload = (ERROR, f"memory limit of {memory_limit_mb} MB exceeded", None)
+        except Exception as e:
+            payload = (ERROR, str(e) or type(e).__name__, None)
+        conn.send_bytes(pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+class _Worker:
+    def __init__(self, ctx, timeout, memory_limit_mb):
+        self.ctx = ctx
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.lock = threading.Lock()
+        self.restarts = 0
+        self._start()
+
+    def _start(self):
+        self.conn, child = self.ctx.Pipe()
+        self.process = self.ctx.Process(
+            target=_worker_main, args=(child, self.timeout, self.memory_limit_mb), daemon=True
+        )
+        self.process.start()
+        child.close()
+
+    def respawn(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+        self.restarts += 1
+        self._start()
+
+    def call(self, mode, db_path, args, hard_timeout):
+        """Runs one job; kills and respawns the worker if it hangs past hard_timeout or dies."""
+        try:
+            self.conn.send_bytes(pickle.dumps((mode, db_path, args), protocol=pickle.HIGHEST_PROTOCOL))
+            if not self.conn.poll(hard_timeout):
+                self.respawn()
+                return (TIMEOUT, "worker killed after hard timeout", None)
+            return pickle.loads(self.conn.recv_bytes())
+        except (EOFError, OSError, BrokenPipeError):
+            # Most likely killed by the memory limit
+            self.respawn()
+            return (ERROR, "worker died (memory limit or crash)", None)
+
+    def close(self):
+        self.conn.close()
+        self.process.kill()
+        self.process.join()
+
+
+class ExecutionService:
+    """
+    Pool of SQL worker processes. Jobs go to the worker that owns the
+    database (db affinity, so its connections stay warm) unless that one is
+    busy and another is free. A runaway query only ever blocks one worker.
+    """
+
+    def __init__(self, n_workers=DEFAULT_WORKERS, timeout=DEFAULT_TIMEOUT, memory_limit_mb=DEFAULT_MEMORY_LIMIT_MB):
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        ctx = multiprocessing.get_context(method)
+        self.timeout = timeout
+        self.workers = [_Worker(ctx, timeout, memory_limit_mb) for _ in range(n_workers)]
+
+    def _acquire(self, db_path):
+        preferred = zlib.crc32(os.path.abspath(db_path).encode("utf-8")) % len(self.workers)
+        order = [preferred] + [i for i in range(len(self.workers)) if i != preferred]
+        for i in order:
+            if self.workers[i].lock.acquire(blocking=False):
+                return self.workers[i]
+        worker = self.workers[preferred]
+        worker.lock.acquire()
+        return worker
+
+    def _call(self, mode, db_path, args, hard_timeout=None):
+        worker = self._acquire(db_path)
+        try:
+            hard_timeout = hard_timeout or self.timeout + HARD_TIMEOUT_GRACE
+            return worker.call(mode, os.path.abspath(db_path), args, hard_timeout)
+        finally:
+            worker.lock.release()
+
+    def digest(self, db_path, sql):
+        """Same contract as result_compare.digest_query, executed in a worker process."""
+        if not sql:
+            return ExecutionResult(ERROR, error="empty query"), None
+        status, error, result = self._call("digest", db_path, {"sql": sql})
+        exec_time, digest = result or (None, None)
+        outcome = ExecutionResult(status, exec_time=exec_time, error=error)
+        return outcome, result_compare.ResultDigest.from_dict(digest) if digest else None
+
+    def run_query(self, db_path, sql, max_rows=sql_executor.DEFAULT_MAX_ROWS, truncate=False):
+        """Same contract as sql_executor.run_query, executed in a worker process; only up to max_rows come back."""
+        if not sql:
+            return ExecutionResult(ERROR, error="empty query")
+        status, error, result = self._call("rows", db_path, {"sql": sql, "max_rows": max_rows, "truncate": truncate})
+        exec_time, rows, truncated = result or (None, None, False)
+        return ExecutionResult(status, rows, exec_time, error, truncated)
+
+    def compare(self, db_path, gold_sql, pred_sql, gold_digest, pred_digest, ordered=False, gold_rows=None):
+        """
+        result_compare.compare: the digests are checked here, the row-by-row
+        verification (which executes the predicted SQL) runs in a worker.
+        """
+        verdict = result_compare.digest_verdict(gold_digest, pred_digest, ordered)
+        if verdict is not None:
+            return verdict
+        args = {"gold_sql": gold_sql, "pred_sql": pred_sql, "ordered": ordered, "gold_rows": gold_rows}
+        gold_timeout = sql_executor.GOLD_TIMEOUT if gold_rows is None else 0
+        status, _, matched = self._call("verify", db_path, args, self.timeout + gold_timeout + HARD_TIMEOUT_GRACE)
+        return status == OK and matched
+
+    def measure_samples(self, db_path, queries, warmup=query_timing.DEFAULT_WARMUP,
+                        repetitions=query_timing.DEFAULT_REPETITIONS, timeout=query_timing.DEFAULT_TIMEOUT,
+                        budget=query_timing.DEFAULT_BUDGET):
+        """
+        query_timing.measure_samples in a worker process (usable as a
+        query_timing.measure runner). If the worker hangs or dies, every
+        query is reported as having taken `timeout`.
+        """
+        args = {"queries": list(queries), "warmup": warmup, "repetitions": repetitions, "timeout": timeout,
+                "budget": budget}
+        # Worst case per query: warm-up and one repetition at the timeout, plus the repetition budget
+        hard_timeout = len(args["queries"]) * ((warmup + 1) * timeout + budget) + HARD_TIMEOUT_GRACE
+        status, _, samples = self._call("measure", db_path, args, hard_timeout)
+        return samples if status == OK else [[timeout] for _ in args["queries"]]
+
+    def stats(self):
+        return {"workers": len(self.workers), "restarts": sum(w.restarts for w in self.workers)}
+
+    def close(self):
+        for worker in self.workers:
+            worker.close()
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_service():
+    """
+    The process-wide ExecutionService when SQL_SANDBOX_WORKERS > 0, else None.
+    SQL_SANDBOX_MEMORY_MB sets the per-worker memory limit.
+    """
+    global _service
+    workers = int(os.getenv("SQL_SANDBOX_WORKERS", "0"))
+    if workers <= 0:
+        return None
+    with _service_lock:
+        if _service is None:
+            _service = ExecutionService(
+                workers, memory_limit_mb=int(os.getenv("SQL_SANDBOX_MEMORY_MB", DEFAULT_MEMORY_LIMIT_MB))
+            )
+        return _service
+
+
+def digest_query(db_path, sql):
+    """result_compare.digest_query, in the sandbox when one is configured."""
+    service = get_service()
+    if service is not None:
+        return service.digest(db_path, sql)
+    return result_compare.digest_query(db_path, sql)
+
+
+def compare(db_path, gold_sql, pred_sql, gold_digest, pred_digest, ordered=False, gold_rows=None):
+    """result_compare.compare, verifying matches in the sandbox when one is configured."""
+    service = get_service()
+    if service is not None:
+        return service.compare(db_path, gold_sql, pred_sql, gold_digest, pred_digest, ordered, gold_rows)
+    return result_compare.compare(db_path, gold_sql, pred_sql, gold_digest, pred_digest, ordered, gold_rows)
+
+
+def timing_runner():
+    """query_timing.measure runner for the sandbox when one is configured, else None (time in-process)."""
+    service = get_service()
+    return service.measure_samples if service is not None else None
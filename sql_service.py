@@ -0,0 +1,226 @@
+import argparse
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+
+import numpy as np
+
+import prompts
+import retrieval
+import sql_executor
+import sql_sandbox
+import sql_validator
+import utils
+from query_timing import percentile
+
+
+SIMILARITY_THRESHOLD = 0.92     # cosine similarity for a paraphrase to count as the same question
+MAX_ENTRIES_PER_DB = 2048
+MAX_RESULT_ROWS = 1000         # rows returned (and cached) per answer; bigger results are truncated
+
+
+def _normalize_question(question):
+    return re.sub(r"\s+", " ", question.strip().lower()).rstrip("?. ")
+
+
+class SemanticCache:
+    """
+    Answered questions per db_id: exact (normalized text) lookups first, then
+    the nearest stored question embedding above the similarity threshold.
+    Entries are evicted least recently used first.
+    """
+
+    def __init__(self, threshold=SIMILARITY_THRESHOLD, max_entries=MAX_ENTRIES_PER_DB):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.dbs = {}
+        self.lock = threading.Lock()
+
+    def _db(self, db_id):
+        return self.dbs.setdefault(db_id, OrderedDict())
+
+    def exact(self, db_id, question):
+        with self.lock:
+            entries = self._db(db_id)
+            entry = entries.get(_normalize_question(question))
+            if entry is not None:
+                entries.move_to_end(_normalize_question(question))
+            return entry
+
+    def nearest(self, db_id, vector):
+        """(entry, similarity) of the closest stored question, entry None below the threshold."""
+        with self.lock:
+            entries = self._db(db_id)
+            keyed = [(key, e) for key, e in entries.items() if e["vector"] is not None]
+            if not keyed:
+                return None, 0.0
+            sims = np.stack([e["vector"] for _, e in keyed]) @ vector
+            best = int(np.argmax(sims))
+            if sims[best] < self.threshold:
+                return None, float(sims[best])
+            entries.move_to_end(keyed[best][0])
+            return keyed[best][1], float(sims[best])
+
+    def put(self, db_id, question, vector, answer):
+        with self.lock:
+            entries = self._db(db_id)
+            key = _normalize_question(question)
+            entries[key] = {**answer, "question": question, "vector": vector}
+            entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+
+class Metrics:
+    """Request counters and recent latencies per outcome (exact / semantic / miss / error)."""
+
+    def __init__(self, window=2048):
+        self.counts = {"exact": 0, "semantic": 0, "miss": 0, "error": 0}
+        self.latencies = {kind: deque(maxlen=window) for kind in self.counts}
+        self.lock = threading.Lock()
+
+    def record(self, kind, seconds):
+        with self.lock:
+            self.counts[kind] += 1
+            self.latencies[kind].append(seconds)
+
+    def snapshot(self):
+        with self.lock:
+            total = sum(self.counts.values())
+            hits = self.counts["exact"] + self.counts["semantic"]
+            report = {"requests": total, "hit_rate": hits / total if total else 0.0, "counts": dict(self.counts)}
+            for kind, values in self.latencies.items():
+                if values:
+                    ordered = sorted(values)
+                    report[f"{kind}_p50_ms"] = 1000 * percentile(ordered, 0.5)
+                    report[f"{kind}_p95_ms"] = 1000 * percentile(ordered, 0.95)
+            return report
+
+
+class QueryService:
+    """
+    Long-lived NL-to-SQL service: provider clients, schema catalogs and the
+    embedding model are loaded once and stay warm across requests.
+    """
+
+    def __init__(self, provider="gemini", data_set="bird", strategy="fewshot", top_k=3,
+                 threshold=SIMILARITY_THRESHOLD):
+        self.provider = provider
+        self.data_set = data_set
+        self.strategy = strategy
+        self.top_k = top_k
+        self.cache = SemanticCache(threshold)
+        self.metrics = Metrics()
+        utils.init_provider(provider)
+        try:
+            retrieval.get_model()
+            self.semantic = True
+        except Exception as e:
+            # Missing package, failed model download, broken CUDA setup, ...: serve without paraphrase matching
+            print(f"Embedding model unavailable ({type(e).__name__}: {e}), only exact repeats are cached")
+            self.semantic = False
+
+    def _embed(self, question):
+        return retrieval.embed([question])[0] if self.semantic else None
+
+    def _generate(self, question, path):
+        template = prompts.STRATEGIES[self.strategy]
+        topk = None
+        if self.strategy == "dynamic_fewshot":
+            retriever = retrieval.get_retriever(retrieval.DEFAULT_KNOWLEDGE[self.data_set])
+            topk = retriever.retrieve([question], k=self.top_k)[0]
+        schema = utils.get_schema(path)
+        return utils.extract_sql(utils.complete(utils.format_prompt(schema, template, question, topk), self.provider))
+
+    def answer(self, question, db_id):
+        """
+        Returns {"sql", "status", "error", "rows", "truncated", "cache",
+        "similarity", "latency_ms"}; "cache" is exact / semantic / miss, and
+        "truncated" means rows holds only the first MAX_RESULT_ROWS.
+        """
+        start = time.perf_counter()
+        entry, similarity, vector = self.cache.exact(db_id, question), 1.0, None
+        kind = "exact"
+        if entry is None and self.semantic:
+            vector = self._embed(question)
+            entry, similarity = self.cache.nearest(db_id, vector)
+            kind = "semantic"
+        if entry is not None:
+            latency = time.perf_counter() - start
+            self.metrics.record(kind, latency)
+            return {"sql": entry["sql"], "status": entry["status"], "error": None, "rows": entry["rows"],
+                    "truncated": entry.get("truncated", False), "cache": kind, "similarity": similarity,
+                    "latency_ms": 1000 * latency}
+
+        path = utils.db_path_for(db_id, self.data_set)
+        sql = self._generate(question, path)
+        validation = sql_validator.validate(path, sql)
+        if not validation.ok:
+            outcome = sql_executor.ExecutionResult(sql_executor.ERROR, error=validation.error)
+        else:
+            sandbox = sql_sandbox.get_service()
+            if sandbox is not None:
+                outcome = sandbox.run_query(path, sql, max_rows=MAX_RESULT_ROWS, truncate=True)
+            else:
+                outcome = sql_executor.run_query(path, sql, max_rows=MAX_RESULT_ROWS, truncate=True)
+        rows = [list(row) for row in outcome.rows or []]
+        if outcome.ok:
+            if vector is None and self.semantic:
+                vector = self._embed(question)
+            self.cache.put(db_id, question, vector,
+                           {"sql": sql, "status": outcome.status, "rows": rows, "truncated": outcome.truncated})
+        latency = time.perf_counter() - start
+        self.metrics.record("miss" if outcome.ok else "error", latency)
+        return {"sql": sql, "status": outcome.status, "error": outcome.error, "rows": rows,
+                "truncated": outcome.truncated, "cache": "miss",
+                "similarity": similarity if vector is not None else 0.0, "latency_ms": 1000 * latency}
+
+
+def create_app(service):
+    """FastAPI app around a QueryService: POST /query, GET /metrics, GET /health."""
+    from fastapi import FastAPI, HTTPException
+    from pydantic import BaseModel
+
+    class QueryRequest(BaseModel):
+        question: str
+        db_id: str
+
+    app = FastAPI(title="NLP-to-SQL")
+
+    @app.post("/query")
+    def query(request: QueryRequest):
+        # Plain def: FastAPI runs it on its thread pool, so blocking LLM/SQLite calls don't stall the loop
+        try:
+            return service.answer(request.question, request.db_id)
+        except FileNotFoundError as e:
+            raise HTTPException(status_code=404, detail=f"unknown db_id: {e}")
+        except utils.GenerationFailed as e:
+            raise HTTPException(status_code=503, detail=f"model unavailable: {e}")
+
+    @app.get("/metrics")
+    def metrics():
+        return service.metrics.snapshot()
+
+    @app.get("/health")
+    def health():
+        return {"status": "ok", "provider": service.provider, "data_set": service.data_set}
+
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve NL-to-SQL over HTTP with warm clients and a semantic cache.")
+    parser.add_argument("--provider", default=os.getenv("PROVIDER", "gemini"))
+    parser.add_argument("--data_set", default="bird", choices=["spider", "bird"])
+    parser.add_argument("--strategy", default="fewshot", choices=sorted(prompts.STRATEGIES))
+    parser.add_argument("--threshold", type=float, default=SIMILARITY_THRESHOLD)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    service = QueryService(args.provider, args.data_set, args.strategy, threshold=args.threshold)
+    uvicorn.run(create_app(service), host=args.host, port=args.port)
@@ -0,0 +1,47 @@
+import re
+
+
+_MARKER = re.compile(r"--\s*SQL\s*Query", re.IGNORECASE)
+_SELECT = re.compile(r"SELECT", re.IGNORECASE)
+
+
+class SqlStreamParser:
+    """
+    Incremental counterpart of utils.extract_sql: fed the completion chunk by
+    chunk, it reports completion as soon as the statement after the
+    "-- SQL Query" marker has reached its terminating ";" (semicolons inside
+    quotes don't count), so the rest of the stream can be cancelled.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.sql = None
+        self._start = None
+        self._scan = 0
+        self._quote = None
+
+    def feed(self, chunk):
+        """Adds a chunk; returns True once the SQL is complete."""
+        if self.sql is not None:
+            return True
+        self.text += chunk
+        if self._start is None:
+            marker = _MARKER.search(self.text)
+            select = _SELECT.search(self.text, marker.end()) if marker else None
+            if select is None:
+                return False
+            self._start = self._scan = select.start()
+
+        text = self.text
+        while self._scan < len(text):
+            ch = text[self._scan]
+            if self._quote is not None:
+                if ch == self._quote:
+                    self._quote = None
+            elif ch in "'\"`":
+                self._quote = ch
+            elif ch == ";":
+                self.sql = text[self._start:self._scan + 1]
+                return True
+            self._scan += 1
+        return False
@@ -0,0 +1,150 @@
+import functools
+import re
+import threading
+from dataclasses import dataclass, field
+
+import schema_catalog
+import sql_executor
+
+
+LARGE_TABLE_ROWS = 100_000
+PLAN_TIMEOUT = 5.0
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|`[^`]*`|\[[^\]]*\]|--[^\n]*|/\*.*?\*/", re.DOTALL)
+# Statements must start with SELECT/WITH/VALUES; these catch a CTE in front of a write
+_WRITES = re.compile(r"\b(INSERT|UPDATE|DELETE|REPLACE\s+INTO)\b", re.IGNORECASE)
+_SCAN = re.compile(r"^SCAN (?:TABLE )?(.+?)(?: USING .*)?$", re.IGNORECASE)
+_ALIAS = re.compile(
+    r"\b(?:FROM|JOIN)\s+(`[^`]+`|\"[^\"]+\"|\[[^\]]+\]|\w+)\s+(?:AS\s+)?"
+    r"(?!(?:ON|USING|WHERE|JOIN|INNER|LEFT|RIGHT|FULL|CROSS|NATURAL|OUTER|GROUP|ORDER|LIMIT|HAVING|WINDOW"
+    r"|UNION|EXCEPT|INTERSECT)\b)(\w+)",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class Validation:
+    ok: bool
+    error: str = None
+    warnings: list = field(default_factory=list)
+    plan: list = field(default_factory=list, repr=False)
+    scanned_rows: int = 0       # estimated rows read by full table scans
+
+    def to_dict(self):
+        return {"ok": self.ok, "error": self.error, "warnings": self.warnings, "scanned_rows": self.scanned_rows}
+
+
+_row_estimates = {}
+_row_estimates_lock = threading.Lock()
+
+
+def estimated_rows(db_path, table):
+    """MAX(rowid) of a table: an O(log n) stand-in for COUNT(*), memoized per database."""
+    key = (db_path, table)
+    with _row_estimates_lock:
+        if key in _row_estimates:
+            return _row_estimates[key]
+    outcome = sql_executor.run_query(db_path, f'SELECT MAX(rowid) FROM "{table}"', timeout=PLAN_TIMEOUT)
+    rows = outcome.rows[0][0] if outcome.ok and outcome.rows and outcome.rows[0][0] else 0
+    with _row_estimates_lock:
+        _row_estimates[key] = rows
+    return rows
+
+
+def _check_statement(sql):
+    """Text-only checks: a single read-only statement."""
+    body = _LITERALS.sub(" ", sql).strip().rstrip(";").strip()
+    if not body:
+        return "empty query"
+    if ";" in body:
+        return "multiple statements"
+    if not re.match(r"(SELECT|WITH|VALUES)\b", body, re.IGNORECASE):
+        return f"not a query: {body.split()[0]}"
+    match = _WRITES.search(body)
+    if match:
+        return f"write statement ({match.group(1).upper()}) not allowed"
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def _sqlglot():
+    """sqlglot, imported on first validation; None when not installed."""
+    try:
+        import sqlglot
+        import sqlglot.expressions
+    except ImportError:  # optional; EXPLAIN QUERY PLAN decides validity on its own
+        return None
+    return sqlglot
+
+
+def _check_names(sql, catalog, sqlglot):
+    """
+    Unknown tables/columns as sqlglot sees them. sqlglot can be wrong about
+    SQLite (table-valued functions, dialect quirks), so this is only a
+    finding; EXPLAIN decides. Anything sqlglot can't parse is left to EXPLAIN.
+    """
+    exp = sqlglot.expressions
+    try:
+        tree = sqlglot.parse_one(sql, read="sqlite")
+    except sqlglot.errors.ParseError:
+        return None
+    tables = {t["name"].lower() for t in catalog["tables"]}
+    columns = {c["name"].lower() for t in catalog["tables"] for c in t["columns"]}
+    ctes = {cte.alias_or_name.lower() for cte in tree.find_all(exp.CTE)}
+    for table in tree.find_all(exp.Table):
+        if table.name.lower() not in tables | ctes:
+            return f"no such table: {table.name}"
+    if ctes:
+        return None
+    known = columns | {a.alias.lower() for a in tree.find_all(exp.Alias)} | {"rowid", "oid", "_rowid_"}
+    for column in tree.find_all(exp.Column):
+        # SQLite reads an unknown "double-quoted" name as a string literal, so quoted names are skipped
+        if isinstance(column.this, exp.Star) or column.this.args.get("quoted"):
+            continue
+        if column.name.lower() not in known:
+            return f"no such column: {column.sql(dialect='sqlite')}"
+    return None
+
+
+def validate(db_path, sql):
+    """
+    Checks a predicted query before it is executed: one read-only statement
+    and a plan SQLite can compile, so a query is only invalid when SQLite
+    itself rejects it. Names sqlglot doesn't know, full scans of large tables
+    without LIMIT and temp B-trees go in `warnings` without failing
+    validation.
+    """
+    if not sql:
+        return Validation(False, "no SQL query found")
+    error = _check_statement(sql)
+    if error is not None:
+        return Validation(False, error)
+
+    # EXPLAIN QUERY PLAN compiles the statement without running it
+    outcome = sql_executor.run_query(db_path, f"EXPLAIN QUERY PLAN {sql}", timeout=PLAN_TIMEOUT)
+    if not outcome.ok:
+        return Validation(False, outcome.error)
+
+    result = Validation(True, plan=[row[-1] for row in outcome.rows])
+    catalog = schema_catalog.get_catalog(db_path)
+    sqlglot = _sqlglot()
+    finding = _check_names(sql, catalog, sqlglot) if sqlglot is not None else None
+    if finding is not None:
+        result.warnings.append(f"sqlglot: {finding}")
+    has_limit = re.search(r"\bLIMIT\b", _LITERALS.sub(" ", sql), re.IGNORECASE) is not None
+    # The plan names tables by their alias (SCAN T1), possibly schema-qualified (SCAN main.emp); CONSTANT ROW,
+    # subquery and CTE scans aren't tables
+    tables = {t["name"].lower(): t["name"] for t in catalog["tables"]}
+    aliases = {alias.lower(): table.strip("`\"[]") for table, alias in _ALIAS.findall(sql)}
+    for detail in result.plan:
+        match = _SCAN.match(detail)
+        name = match.group(1).split(".")[-1] if match else None
+        table = tables.get(aliases.get(name.lower(), name).lower()) if name else None
+        if table is not None:
+            rows = estimated_rows(db_path, table)
+            result.scanned_rows += rows
+            if rows >= LARGE_TABLE_ROWS and not has_limit:
+                result.warnings.append(f"full scan of {table} (~{rows} rows) without LIMIT")
+        elif "TEMP B-TREE" in detail:
+            result.warnings.append(detail.lower())
+    return result
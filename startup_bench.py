@@ -0,0 +1,108 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+
+# Entry points of short jobs (scoring a cached run, one question) and their import-time budget in ms
+BUDGETS_MS = {
+    "utils": 300,
+    "run_experiments": 300,
+    "results_store": 200,
+    "tracing": 100,
+    "Fewshot": 300,
+    "Dynamic_fewshot": 300,
+    "simple_prompt2": 300,
+    "structured_prompt2": 300,
+    "sql": 200,
+}
+# Must only load once a backend / feature that needs them is used
+LAZY_MODULES = [
+    "google.generativeai",
+    "google.genai",
+    "groq",
+    "llama_cpp",
+    "transformers",
+    "torch",
+    "sentence_transformers",
+    "numpy",
+    "sqlglot",
+    "streamlit",
+    "fastapi",
+    "uvicorn",
+    "dotenv",
+    "asyncio",
+]
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _python(code, *flags):
+    return subprocess.run([sys.executable, *flags, "-c", code], cwd=HERE, capture_output=True, text=True)
+
+
+def import_times(module):
+    """{imported module: (self us, cumulative us)} from python -X importtime."""
+    result = _python(f"import {module}", "-X", "importtime")
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr.strip().splitlines()[-1]}")
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if self_us.strip().isdigit():
+            times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def loaded_lazy_modules(module):
+    code = (f"import sys, json, {module}; "
+            f"print(json.dumps([m for m in {LAZY_MODULES!r} if m in sys.modules]))")
+    return json.loads(_python(code).stdout.strip().splitlines()[-1])
+
+
+def wall_ms(module, repeat):
+    """Median wall time of a fresh interpreter importing `module`, minus a bare interpreter's."""
+    def median(code):
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            _python(code)
+            samples.append(time.perf_counter() - start)
+        return statistics.median(samples)
+
+    return 1000 * max(0.0, median(f"import {module}") - median("pass"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import-time budget check for the entry points.")
+    parser.add_argument("modules", nargs="*", default=list(BUDGETS_MS))
+    parser.add_argument("--budget_ms", type=float, help="one budget for all modules instead of BUDGETS_MS")
+    parser.add_argument("--repeat", type=int, default=5, help="interpreter launches per wall-time measurement")
+    parser.add_argument("--top", type=int, default=8, help="slowest imports listed per module")
+    args = parser.parse_args()
+
+    failures = []
+    for module in args.modules:
+        budget = args.budget_ms or BUDGETS_MS.get(module, 300)
+        times = import_times(module)
+        cumulative_ms = times[module][1] / 1000
+        wall = wall_ms(module, args.repeat)
+        eager = loaded_lazy_modules(module)
+        ok = cumulative_ms <= budget and not eager
+        print(f"{module:<20} import {cumulative_ms:7.1f} ms  wall {wall:7.1f} ms  budget {budget:.0f} ms  "
+              f"{'OK' if ok else 'OVER BUDGET' if not eager else 'EAGER IMPORTS'}")
+        for name, (_, cumulative) in sorted(times.items(), key=lambda item: -item[1][1])[1:args.top + 1]:
+            print(f"    {cumulative / 1000:7.1f} ms  {name}")
+        if eager:
+            print(f"    loaded at import time: {', '.join(eager)}")
+        if not ok:
+            failures.append(module)
+
+    if failures:
+        print(f"\nStartup regression in: {', '.join(failures)}")
+        sys.exit(1)
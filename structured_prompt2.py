@@ -1,34 +1,11 @@
 import json
 import os
-from utils import *
+from utils import evaluate, preprocessing, run_options
+from prompts import STRUCTURED_PROMPT
 
 
 def main():
-    good_prompt="""You are an expert data scientist and SQL engineer.
-      You are given a database schema and a natural language question.
-        Your task is to carefully analyze the schema, reason about table relationships,
-          and generate a correct and efficient SQLite query that fully answers the question.
-
-        Database Engine:
-        SQLite
-
-
-        Now, for the following schema and question, follow the same reasoning process and output format:
-
-        Database Schema:
-        {db_schema}
-
-        Question:
-        {user_question}
-
-        -- Reasoning
-        (Concise 2–6 line logical explanation describing how you derived the query)
-
-        -- SQL Query
-        Write only the SQL query (starting with SELECT and ending with ;
-
-        Return output in the required format and nothing else.
-        """
+    good_prompt = STRUCTURED_PROMPT
 
 
     sub_path = os.path.join("spider", "dev_subset.json") if data_set=="spider" else os.path.join("data","bird","dev_subset.json")
@@ -37,7 +14,7 @@ def main():
         dev_data = json.load(f)
 
     data_to_evaluate = dev_data # Let's test on 5 examples
-    evaluate(data_to_evaluate, good_prompt, data_set, version_name, provider)
+    evaluate(data_to_evaluate, good_prompt, data_set, version_name, provider, resume=run_options().resume)
 
 
 
@@ -0,0 +1,50 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """An empty working directory: caches, run logs and databases live relative to the cwd."""
+    monkeypatch.chdir(tmp_path)
+    for var in ("LLM_CACHE_MODE", "SQL_SANDBOX_WORKERS", "SQL_REPAIR_ATTEMPTS", "SQL_VALIDATE", "LLM_STREAM",
+                "TRACE", "TRACE_EXPORT", "SCHEMA_TOKEN_BUDGET", "PROFILE_EXAMPLE"):
+        monkeypatch.delenv(var, raising=False)
+    monkeypatch.setenv("LLM_CACHE_MODE", "off")
+    monkeypatch.setenv("VES_REPETITIONS", "2")
+    return tmp_path
+
+
+@pytest.fixture
+def toy_db(workdir):
+    """data/bird/dev_databases/toy/toy.sqlite with a dept and an emp table."""
+    path = workdir / "data" / "bird" / "dev_databases" / "toy" / "toy.sqlite"
+    path.parent.mkdir(parents=True)
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        """
+        CREATE TABLE dept (id INTEGER PRIMARY KEY, name TEXT);
+        CREATE TABLE emp (id INTEGER PRIMARY KEY, name TEXT, salary REAL, dept_id INTEGER REFERENCES dept(id));
+        INSERT INTO dept VALUES (1, 'Eng'), (2, 'Sales');
+        INSERT INTO emp VALUES (1, 'Ada', 120.0, 1), (2, 'Bob', 90.5, 2), (3, 'Cy', 100.0, 1);
+        """
+    )
+    conn.commit()
+    conn.close()
+    return str(path)
+
+
+@pytest.fixture
+def toy_items():
+    return [
+        {"question_id": 1, "db_id": "toy", "question": "How many employees?", "evidence": "",
+         "SQL": "SELECT COUNT(*) FROM emp", "difficulty": "simple"},
+        {"question_id": 2, "db_id": "toy", "question": "Names of departments", "evidence": "",
+         "SQL": "SELECT name FROM dept", "difficulty": "simple"},
+        {"question_id": 3, "db_id": "toy", "question": "Top salary employee", "evidence": "",
+         "SQL": "SELECT name FROM emp ORDER BY salary DESC LIMIT 1", "difficulty": "moderate"},
+    ]
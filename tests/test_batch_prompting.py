@@ -0,0 +1,127 @@
+import re
+
+import pytest
+
+import batch_prompting
+import prompt_templates
+import prompts
+import providers
+import run_log
+import utils
+
+
+TEMPLATE = """
+    Schema:
+    {db_schema}
+
+    Question:
+    {user_question}
+"""
+
+
+def test_group_by_db_keeps_batches_on_one_database():
+    items = [{"db_id": db} for db in ["a", "b", "a", "a", "b"]]
+    assert batch_prompting.group_by_db(items, range(5), 2) == [[0, 2], [3], [1, 4]]
+
+
+def test_render_uses_the_compiled_template():
+    prompt = batch_prompting.render(TEMPLATE, "CREATE TABLE t (x)", ["First?", "Second?"])
+    assert prompt.startswith("Schema:\nCREATE TABLE t (x)\n\nQuestion:\n1. First?\n2. Second?\n\n")
+    assert "\n    " not in prompt
+    raw = batch_prompting.render(TEMPLATE, "CREATE TABLE t (x)", ["First?"], raw=True)
+    assert raw.startswith(TEMPLATE.format(db_schema="CREATE TABLE t (x)", user_question="1. First?"))
+
+
+def test_token_usage_split_adds_up():
+    usage = prompt_templates.TokenUsage()
+    usage.prompt_tokens, usage.completion_tokens, usage.requests = 100, 7, 1
+    parts = usage.split(3)
+    assert [p.prompt_tokens for p in parts] == [34, 33, 33]
+    assert [p.completion_tokens for p in parts] == [3, 2, 2]
+    assert [p.requests for p in parts] == [1, 0, 0]
+
+
+@pytest.fixture
+def batch_answerer(workdir, toy_items, monkeypatch):
+    gold = {item["question"]: item["SQL"] for item in toy_items}
+
+    class BatchAnswerer(providers.Provider):
+        name = "batcher"
+        default_model = "batcher"
+
+        def _generate(self, prompt):
+            self._record_usage(50, 10)
+            questions = re.findall(r"^(\d+)\. (.+)$", prompt, re.MULTILINE)
+            return "\n".join(f"-- Question {n}\n-- SQL Query\n{gold[q]};" for n, q in questions)
+
+    monkeypatch.setitem(providers.PROVIDERS, "batcher", BatchAnswerer)
+    monkeypatch.setattr(providers, "_instances", {})
+
+
+def test_batched_requests_record_their_tokens(toy_db, toy_items, batch_answerer):
+    accuracy, _ = utils.evaluate_batched(toy_items, TEMPLATE, "bird", "b", "batcher", batch_size=2, max_workers=1)
+    records = list(run_log.iter_records(run_log.results_path("b")))
+    assert accuracy == 100 and all(r["batched"] for r in records)
+    assert sum(r["api_requests"] for r in records) == 2
+    assert sum(r["prompt_tokens"] for r in records) == 100
+    assert sum(r["completion_tokens"] for r in records) == 20
+
+
+@pytest.mark.parametrize("name", ["simple", "structured", "fewshot"])
+def test_batch_prompt_has_one_answer_layout(name):
+    prompt = batch_prompting.render(prompts.STRATEGIES[name], "CREATE TABLE t (x)", ["First?", "Second?"])
+    assert prompt.count("-- Question <number>") == 1
+    assert "nothing else" not in prompt and "### Response" not in prompt
+    assert prompt.index("2. Second?") < prompt.index("-- Question <number>")
+
+
+def test_extract_sql_batch_splits_numbered_answers():
+    text = """Sure.
+-- Question 2
+-- Reasoning
+Names.
+-- SQL Query
+SELECT name FROM dept;
+-- Question 1
+-- SQL Query
+SELECT COUNT(*) FROM emp;
+-- Question 1
+-- SQL Query
+SELECT 1;
+-- Question 3
+-- Reasoning
+I am not sure.
+-- Question 9
+SELECT 9;
+"""
+    sections = utils.extract_sql_batch(text, 3)
+    assert utils.extract_sql(sections[0]) == "SELECT COUNT(*) FROM emp;"     # first answer wins
+    assert utils.extract_sql(sections[1]) == "SELECT name FROM dept;"         # order doesn't matter
+    assert sections[2] is None                                               # no SQL, out-of-range number ignored
+    assert utils.extract_sql_batch("", 2) == [None, None]
+
+
+def test_unparsed_questions_fall_back_to_single_requests(toy_db, toy_items, workdir, monkeypatch):
+    gold = {item["question"]: item["SQL"] for item in toy_items}
+    prompts_seen = []
+
+    class Forgetful(providers.Provider):
+        name = "forgetful"
+        default_model = "forgetful"
+
+        def _generate(self, prompt):
+            prompts_seen.append(prompt)
+            questions = re.findall(r"^(\d+)\. (.+)$", prompt, re.MULTILINE)
+            if questions:
+                # Answers only the first question of each batch
+                n, q = questions[0]
+                return f"-- Question {n}\n-- SQL Query\n{gold[q]};"
+            question = next(q for q in gold if q in prompt)
+            return f"-- Reasoning\nSingle.\n-- SQL Query\n{gold[question]};"
+
+    monkeypatch.setitem(providers.PROVIDERS, "forgetful", Forgetful)
+    monkeypatch.setattr(providers, "_instances", {})
+    accuracy, _ = utils.evaluate_batched(toy_items, TEMPLATE, "bird", "f", "forgetful", batch_size=3, max_workers=1)
+    records = {r["question"]: r for r in run_log.iter_records(run_log.results_path("f"))}
+    assert accuracy == 100 and len(prompts_seen) == 3
+    assert [records[item["question"]].get("batched", False) for item in toy_items] == [True, False, False]
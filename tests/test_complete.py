@@ -0,0 +1,90 @@
+import threading
+
+import pytest
+
+import prompt_templates
+import providers
+import utils
+
+
+class Slow(providers.Provider):
+    """Answers after `release` is set; raises instead when `fail` is."""
+
+    name = "slow"
+    default_model = "slow"
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.release = threading.Event()
+        self.fail = False
+        self.calls = 0
+
+    def generate(self, prompt):
+        self.calls += 1
+        self.release.wait(5)
+        if self.fail:
+            raise ConnectionError("upstream down")
+        return "-- SQL Query\nSELECT 1;"
+
+
+@pytest.fixture
+def slow(workdir, monkeypatch):
+    monkeypatch.setitem(providers.PROVIDERS, "slow", Slow)
+    monkeypatch.setattr(providers, "_instances", {})
+    return utils.init_provider("slow")
+
+
+def concurrent_completes(n):
+    usages = [prompt_templates.TokenUsage() for _ in range(n)]
+    results = [None] * n
+
+    def call(j):
+        try:
+            results[j] = utils.complete("same prompt", "slow", usages[j])
+        except Exception as e:
+            results[j] = e
+
+    threads = [threading.Thread(target=call, args=(j,)) for j in range(n)]
+    for t in threads:
+        t.start()
+    return threads, usages, results
+
+
+def wait_for_waiters(n):
+    key = ("slow", "slow", "same prompt")
+    for _ in range(500):
+        if key in utils._inflight:
+            break
+        threading.Event().wait(0.01)
+    threading.Event().wait(0.05 * n)
+
+
+def test_concurrent_identical_prompts_share_one_call(slow):
+    threads, usages, results = concurrent_completes(3)
+    wait_for_waiters(3)
+    slow.release.set()
+    for t in threads:
+        t.join()
+    assert slow.calls == 1
+    assert results == ["-- SQL Query\nSELECT 1;"] * 3
+    assert sorted(u.requests for u in usages) == [0, 0, 1]
+    assert sorted(u.cached for u in usages) == [0, 1, 1]
+
+
+def test_waiters_see_the_owners_failure(slow):
+    slow.fail = True
+    threads, usages, results = concurrent_completes(3)
+    wait_for_waiters(3)
+    slow.release.set()
+    for t in threads:
+        t.join()
+    assert slow.calls == 1
+    assert all(isinstance(r, ConnectionError) for r in results)
+
+
+def test_run_options():
+    options = utils.run_options(["--provider", "fake", "--resume", "--top_k", "3"])
+    assert options.resume and options.top_k == 3 and options.provider == "fake"
+    assert utils.run_options([]).top_k == 1 and not utils.run_options([]).resume
+    with pytest.raises(SystemExit):
+        utils.run_options(["--top_k"])
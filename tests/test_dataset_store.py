@@ -0,0 +1,73 @@
+import json
+import os
+from collections import Counter
+
+import pytest
+
+import dataset_store
+
+
+@pytest.fixture
+def bird_file(workdir, monkeypatch):
+    monkeypatch.setattr(dataset_store, "_memo", {})
+    items = [
+        {"question_id": 100 + n, "db_id": db, "question": f"q{n}", "SQL": "SELECT 1", "difficulty": level}
+        for n, (db, level) in enumerate(
+            [("a", "simple")] * 10 + [("a", "moderate")] * 6 + [("b", "simple")] * 8 + [("b", "challenging")] * 4
+        )
+    ]
+    path = workdir / "bird.json"
+    path.write_text(json.dumps(items))
+    return str(path), items
+
+
+def test_records_are_read_by_offset(bird_file):
+    path, items = bird_file
+    dataset = dataset_store.open_dataset(path)
+    assert len(dataset) == 28
+    assert dataset.get(105) == items[5]
+    assert dataset.take([127, 100]) == [items[27], items[0]]
+    assert dataset.select(db_id="b", difficulty=["challenging"]) == [124, 125, 126, 127]
+    assert dataset_store.load(path, db_id="a", limit=2) == items[:2]
+
+
+def test_conversion_is_reused_until_the_file_changes(bird_file):
+    path, items = bird_file
+    dataset_store.open_dataset(path)
+    prefix = dataset_store._disk_prefix(path)
+    assert not [f for f in os.listdir(os.path.dirname(prefix)) if f.endswith(".tmp")]
+    dataset_store._memo.clear()
+    mtime = os.path.getmtime(prefix + ".jsonl")
+    dataset_store.open_dataset(path)
+    assert os.path.getmtime(prefix + ".jsonl") == mtime
+
+    with open(path, "w") as f:
+        json.dump(items[:3], f)
+    assert len(dataset_store.open_dataset(path)) == 3
+
+
+def test_truncated_index_is_rebuilt(bird_file):
+    path, _ = bird_file
+    dataset_store.open_dataset(path)
+    with open(dataset_store._disk_prefix(path) + ".index.json", "w") as f:
+        f.write('{"offsets": [0, ')
+    dataset_store._memo.clear()
+    assert len(dataset_store.open_dataset(path)) == 28
+
+
+def test_allocate_is_proportional_and_exact():
+    quotas = dataset_store.allocate({"x": 10, "y": 6, "z": 4}, 10)
+    assert quotas == {"x": 5, "y": 3, "z": 2}
+    assert sum(dataset_store.allocate({"x": 1, "y": 1, "z": 1}, 2).values()) == 2
+    assert dataset_store.allocate({"x": 2}, 5) == {"x": 2}
+
+
+def test_stratified_split_is_seeded_and_keeps_strata_shares(bird_file):
+    path, items = bird_file
+    dataset = dataset_store.open_dataset(path)
+    eval_ids, knowledge_ids = dataset_store.stratified_split(dataset, 14, seed=3)
+    assert len(eval_ids) == 14 and sorted(eval_ids + knowledge_ids) == dataset.question_ids
+    strata = Counter((item["db_id"], item["difficulty"]) for item in dataset.take(eval_ids))
+    assert strata == {("a", "simple"): 5, ("a", "moderate"): 3, ("b", "simple"): 4, ("b", "challenging"): 2}
+    assert dataset_store.stratified_split(dataset, 14, seed=3) == (eval_ids, knowledge_ids)
+    assert dataset_store.stratified_split(dataset, 14, seed=4)[0] != eval_ids
@@ -0,0 +1,52 @@
+import time
+
+import pytest
+
+import eval_engine
+from rate_limiter import RateLimitError, TokenBucket, get_limiter
+
+
+def test_token_bucket_blocks_until_refilled():
+    bucket = TokenBucket(rate_per_min=600, capacity=2)   # 10 tokens per second
+    start = time.monotonic()
+    for _ in range(3):
+        bucket.acquire()
+    assert time.monotonic() - start >= 0.08
+
+
+def test_token_bucket_caps_oversized_requests():
+    bucket = TokenBucket(rate_per_min=60, capacity=5)
+    start = time.monotonic()
+    bucket.acquire(1000)
+    assert time.monotonic() - start < 0.05
+
+
+def test_call_with_limits_retries_rate_limits():
+    get_limiter("test-retry", rpm=10**6, tpm=10**9)
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise RateLimitError("429")
+        return "ok"
+
+    assert eval_engine.call_with_limits(flaky, "test-retry", "prompt", backoff=0.0) == "ok"
+    assert len(calls) == 3
+
+
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_run_concurrent_keeps_input_order(max_workers):
+    items = list(range(20))
+    results = eval_engine.run_concurrent(items, lambda i, x: (time.sleep(0.001 * (x % 3)), x * x)[1], max_workers)
+    assert results == [x * x for x in items]
+
+
+def test_call_with_limits_gives_up_with_generation_failed():
+    get_limiter("test-giveup", rpm=10**6, tpm=10**9)
+
+    def always_limited():
+        raise RateLimitError("429")
+
+    with pytest.raises(eval_engine.GenerationFailed):
+        eval_engine.call_with_limits(always_limited, "test-giveup", "prompt", max_retries=1, backoff=0.0)
@@ -0,0 +1,89 @@
+import sqlite3
+
+import pytest
+
+import fake_provider
+import gold_store
+import providers
+import result_compare
+import run_log
+import sql_executor
+import utils
+
+
+SLOW_SQL = ("WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 100000000) "
+            "SELECT COUNT(*) FROM c")
+
+
+@pytest.fixture(autouse=True)
+def fresh_stores(monkeypatch):
+    monkeypatch.setattr(gold_store, "_stores", {})
+
+
+def test_build_stores_digest_rows_and_times(toy_db, toy_items):
+    gold_store.build(toy_items + toy_items[:1], "bird", repetitions=3)
+    store = gold_store.get_gold_store("bird")
+    gold = store.get(toy_db, "  SELECT COUNT(*)\n FROM emp ;")
+    _, digest = result_compare.digest_query(toy_db, "SELECT COUNT(*) FROM emp")
+    assert gold["status"] == "ok"
+    assert gold["digest"].matches(digest)
+    assert gold["rows"] == [(3,)]
+    assert len(gold["times"]) == 3 and gold["median_time"] > 0
+
+
+def test_failing_gold_query_is_stored_without_digest(toy_db):
+    gold_store.build([{"db_id": "toy", "SQL": "SELECT nope FROM emp"}], "bird")
+    gold = gold_store.get_gold_store("bird").get(toy_db, "SELECT nope FROM emp")
+    assert gold["status"] == "error" and gold["digest"] is None and gold["times"] == []
+
+
+def test_changed_database_misses(toy_db, toy_items):
+    gold_store.build(toy_items, "bird", repetitions=1)
+    store = gold_store.get_gold_store("bird")
+    conn = sqlite3.connect(toy_db)
+    conn.execute("INSERT INTO emp VALUES (4, 'Di', 80.0, 2)")
+    conn.commit()
+    conn.close()
+    assert store.get(toy_db, "SELECT COUNT(*) FROM emp") is None
+
+
+def test_gold_result_uses_the_store(toy_db, toy_items, monkeypatch):
+    gold_store.build(toy_items, "bird", repetitions=2)
+    monkeypatch.setattr(result_compare, "digest_query", lambda *a, **k: pytest.fail("gold SQL re-executed"))
+    digest, rows, median_time, times, error = utils.gold_result(toy_db, "SELECT name FROM dept", "bird")
+    assert sorted(rows) == [("Eng",), ("Sales",)]
+    assert len(times) == 2 and median_time > 0
+
+
+def test_gold_result_without_store_executes(toy_db):
+    digest, rows, exec_time, times, error = utils.gold_result(toy_db, "SELECT name FROM dept", "bird")
+    assert digest.row_count == 2 and rows is None and times is None and error is None
+
+
+def test_gold_sql_has_its_own_limits(toy_db, monkeypatch):
+    assert sql_executor.GOLD_MAX_ROWS is None and sql_executor.GOLD_TIMEOUT > sql_executor.DEFAULT_TIMEOUT
+    outcome, digest = result_compare.digest_gold(toy_db, "SELECT * FROM emp")
+    assert outcome.ok and digest.row_count == 3
+    monkeypatch.setattr(sql_executor, "GOLD_MAX_ROWS", 2)
+    assert result_compare.digest_gold(toy_db, "SELECT * FROM emp")[0].status == sql_executor.ROW_LIMIT
+    assert not result_compare.verify(toy_db, "SELECT * FROM emp", "SELECT * FROM emp")
+
+
+def test_gold_timeout_is_reported_as_a_gold_failure(toy_db, toy_items, monkeypatch):
+    monkeypatch.setattr(sql_executor, "GOLD_TIMEOUT", 0.2)
+    digest, _, _, _, error = utils.gold_result(toy_db, SLOW_SQL, "bird")
+    assert digest is None and error.startswith("timeout")
+
+    item = dict(toy_items[0], SQL=SLOW_SQL)
+    monkeypatch.setattr(providers, "_instances", {})
+    monkeypatch.setattr(fake_provider, "_default", fake_provider.from_dataset(toy_items, "bird", latency=0, jitter=0))
+    utils.evaluate([item], "{db_schema} {user_question}", "bird", "g", "fake", max_workers=1)
+    (record,) = run_log.iter_records(run_log.results_path("g"))
+    assert record["pred_status"] == sql_executor.OK and not record["check"]
+    assert record["gold_error"].startswith("timeout")
+
+
+def test_stored_gold_failures_are_not_re_executed(toy_db, monkeypatch):
+    gold_store.build([{"db_id": "toy", "SQL": "SELECT nope FROM emp"}], "bird")
+    monkeypatch.setattr(result_compare, "digest_gold", lambda *a, **k: pytest.fail("gold SQL re-executed"))
+    assert utils.gold_result(toy_db, "SELECT nope FROM emp", "bird")[4] == sql_executor.ERROR
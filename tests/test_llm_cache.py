@@ -0,0 +1,55 @@
+import time
+
+import pytest
+
+import llm_cache
+
+
+@pytest.fixture
+def cache_path(workdir):
+    return str(workdir / "responses.sqlite")
+
+
+def test_hit_after_put_is_keyed_on_provider_model_and_prompt(cache_path):
+    cache = llm_cache.ResponseCache(cache_path)
+    cache.put("gemini", "m1", "prompt", "SELECT 1;")
+    assert cache.get("gemini", "m1", "prompt") == "SELECT 1;"
+    assert cache.get("gemini", "m2", "prompt") is None
+    assert cache.get("groq", "m1", "prompt") is None
+    assert cache.get("gemini", "m1", "prompt ") is None
+    assert cache.stats() == {"entries": 1, "hits": 1, "misses": 3}
+
+
+def test_responses_survive_reopening(cache_path):
+    llm_cache.ResponseCache(cache_path).put("gemini", "m", "p", "answer")
+    assert llm_cache.ResponseCache(cache_path).get("gemini", "m", "p") == "answer"
+
+
+def test_empty_responses_are_not_stored(cache_path):
+    cache = llm_cache.ResponseCache(cache_path)
+    cache.put("gemini", "m", "p", "")
+    assert cache.get("gemini", "m", "p") is None
+
+
+def test_replay_mode_never_writes(cache_path):
+    llm_cache.ResponseCache(cache_path).put("gemini", "m", "old", "kept")
+    replay = llm_cache.ResponseCache(cache_path, mode="replay")
+    replay.put("gemini", "m", "new", "dropped")
+    assert replay.get("gemini", "m", "old") == "kept"
+    assert replay.get("gemini", "m", "new") is None
+
+
+def test_evict_keeps_most_recently_used(cache_path):
+    cache = llm_cache.ResponseCache(cache_path, max_entries=2)
+    for prompt in ("a", "b", "c"):
+        cache.put("gemini", "m", prompt, prompt.upper())
+        time.sleep(0.01)
+    cache.get("gemini", "m", "a")
+    assert cache.evict() == 1
+    assert cache.get("gemini", "m", "b") is None
+    assert cache.get("gemini", "m", "a") == "A"
+
+
+def test_invalid_mode_is_rejected(cache_path):
+    with pytest.raises(ValueError):
+        llm_cache.ResponseCache(cache_path, mode="sometimes")
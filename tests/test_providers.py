@@ -0,0 +1,58 @@
+import pytest
+
+import fake_provider
+import providers
+from rate_limiter import RateLimitError
+
+
+@pytest.fixture(autouse=True)
+def fresh_instances(workdir, monkeypatch):
+    monkeypatch.setattr(providers, "_instances", {})
+
+
+class Flaky(providers.Provider):
+    name = "flaky"
+
+    def __init__(self, error=None, **config):
+        super().__init__(**config)
+        self.error = error
+
+    def _generate(self, prompt):
+        if self.error:
+            raise self.error
+        return "  SELECT 2;  "
+
+
+def test_unknown_provider_is_rejected():
+    with pytest.raises(ValueError, match="Invalid provider 'nope'"):
+        providers.get_provider("nope")
+
+
+def test_instances_are_reused_until_configured_again():
+    first = providers.get_provider("mock")
+    assert providers.get_provider("mock") is first
+    assert providers.get_provider("mock", rpm=5) is not first
+    assert providers.get_provider("mock").rpm == 5
+
+
+def test_register_provider(monkeypatch):
+    monkeypatch.setitem(providers.PROVIDERS, "flaky", Flaky)
+    backend = providers.get_provider("flaky", model_name="m")
+    assert isinstance(backend, Flaky) and backend.model_name == "m"
+    assert backend.generate("q") == "SELECT 2;" and backend.last_error() is None
+
+
+def test_errors_are_recorded_and_rate_limits_propagate():
+    error = RuntimeError("boom")
+    backend = Flaky(error=error)
+    assert backend.generate("q") == "" and backend.last_error() is error
+    assert backend.sample("q", 0.7, n=2) == ["", ""]
+    with pytest.raises(RateLimitError):
+        Flaky(error=RuntimeError("429 quota exceeded")).generate("q")
+
+
+def test_mock_and_fake_backends(toy_items, monkeypatch):
+    assert providers.get_provider("mock").generate("anything").endswith("SELECT 1;")
+    monkeypatch.setattr(fake_provider, "_default", fake_provider.from_dataset(toy_items, "bird", latency=0, jitter=0))
+    text = providers.get_provider("fake").generate("Question: How many employees?")
+    assert "SELECT COUNT(*) FROM emp" in text
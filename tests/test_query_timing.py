@@ -0,0 +1,84 @@
+import gc
+import statistics
+import threading
+
+import query_timing
+
+
+SLOW_SQL = ("WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 100000000) "
+            "SELECT COUNT(*) FROM c")
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))
+    assert query_timing.percentile(values, 0.0) == 1
+    assert query_timing.percentile(values, 0.5) == 50
+    assert query_timing.percentile(values, 0.95) == 95
+    assert query_timing.percentile(values, 1.0) == 100
+    assert query_timing.percentile([7], 0.99) == 7
+
+
+def test_bootstrap_ci_brackets_the_statistic():
+    lo, hi = query_timing.bootstrap_ci([1.0, 2.0, 3.0, 4.0, 5.0], statistics.median, n_boot=200)
+    assert lo <= 3.0 <= hi
+
+
+def test_measure_returns_one_stats_per_query(toy_db):
+    gold, pred = query_timing.measure(toy_db, ["SELECT COUNT(*) FROM emp", "SELECT 1"], warmup=1, repetitions=3)
+    assert len(gold.samples) == 3 and len(pred.samples) == 3
+    assert all(t > 0 for t in gold.samples)
+
+
+def test_slow_query_is_cut_off_by_timeout(toy_db):
+    (stats,) = query_timing.measure(toy_db, [SLOW_SQL], warmup=0, repetitions=5, timeout=0.2)
+    assert stats.samples == [0.2]
+
+
+def test_budget_limits_repetitions_of_slow_queries(toy_db):
+    (stats,) = query_timing.measure(toy_db, ["SELECT COUNT(*) FROM emp"], warmup=1, repetitions=50, budget=0.0)
+    assert len(stats.samples) == 1
+
+
+def test_time_ratio_reuses_stored_gold_samples(toy_db, monkeypatch):
+    measured = []
+    real = query_timing.measure_samples
+
+    def spy(db_path, queries, **kwargs):
+        measured.append(list(queries))
+        return real(db_path, queries, **kwargs)
+
+    monkeypatch.setattr(query_timing, "measure_samples", spy)
+    ratio, (lo, hi), gold, pred = query_timing.time_ratio(
+        toy_db, "SELECT COUNT(*) FROM emp", "SELECT 1", gold_samples=[1.0, 1.0, 1.0], repetitions=3,
+    )
+    assert measured == [["SELECT 1"]]
+    assert gold.samples == [1.0, 1.0, 1.0]
+    assert ratio > 1 and lo <= ratio <= hi
+
+
+def test_measurements_leave_gc_on_and_run_concurrently(toy_db, monkeypatch):
+    gc_states = []
+    real = query_timing._time_once
+
+    def spy(conn, sql, timeout):
+        gc_states.append(gc.isenabled())
+        return real(conn, sql, timeout)
+
+    monkeypatch.setattr(query_timing, "_time_once", spy)
+    query_timing.measure(toy_db, ["SELECT 1"], warmup=1, repetitions=2)
+    assert gc_states and all(gc_states)
+
+    # Two evaluator threads timing at once must not wait on each other
+    barrier = threading.Barrier(2, timeout=5)
+
+    def runner(db_path, queries, **kwargs):
+        barrier.wait()
+        return [[0.001] for _ in queries]
+
+    threads = [threading.Thread(target=query_timing.measure, args=(toy_db, ["SELECT 1"]), kwargs={"runner": runner})
+               for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not barrier.broken
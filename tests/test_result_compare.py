@@ -0,0 +1,55 @@
+import result_compare
+from result_compare import ResultDigest
+
+
+def digest(rows):
+    d = ResultDigest()
+    d.update(rows)
+    return d
+
+
+def test_multiset_hash_ignores_order_but_not_multiplicity():
+    a = digest([(1, "x"), (2, "y"), (2, "y")])
+    assert a.matches(digest([(2, "y"), (1, "x"), (2, "y")]))
+    assert not a.matches(digest([(1, "x"), (1, "x"), (2, "y")]))
+    assert not a.matches(digest([(1, "x"), (2, "y")]))
+
+
+def test_ordered_hash_respects_order():
+    a = digest([(1,), (2,)])
+    assert a.matches(digest([(1,), (2,)]), ordered=True)
+    assert not a.matches(digest([(2,), (1,)]), ordered=True)
+
+
+def test_values_are_normalized():
+    assert digest([(3, 0.1 + 0.2)]).matches(digest([(3.0, 0.3)]))
+
+
+def test_streaming_equals_one_shot_and_round_trips():
+    rows = [(i, f"r{i}") for i in range(10)]
+    streamed = ResultDigest()
+    streamed.update(rows[:4])
+    streamed.update(rows[4:])
+    assert streamed.matches(digest(rows), ordered=True)
+    restored = ResultDigest.from_dict(streamed.to_dict())
+    assert restored.matches(streamed, ordered=True) and restored.matches(streamed)
+
+
+def test_has_order_by_only_counts_the_outer_query():
+    assert result_compare.has_order_by("SELECT a FROM t ORDER BY a")
+    assert not result_compare.has_order_by("SELECT * FROM (SELECT a FROM t ORDER BY a)")
+    assert not result_compare.has_order_by("SELECT 'order by' FROM t")
+
+
+def test_compare_verifies_rows_on_a_digest_match(toy_db):
+    gold_sql, pred_sql = "SELECT name FROM dept", "SELECT name FROM dept ORDER BY name DESC"
+    _, gold = result_compare.digest_query(toy_db, gold_sql)
+    _, pred = result_compare.digest_query(toy_db, pred_sql)
+    assert result_compare.compare(toy_db, gold_sql, pred_sql, gold, pred)
+    assert not result_compare.compare(toy_db, gold_sql, pred_sql, gold, pred, ordered=True)
+
+
+def test_compare_rejects_a_hash_collision(toy_db):
+    _, gold = result_compare.digest_query(toy_db, "SELECT name FROM dept")
+    forged = ResultDigest(gold.row_count, gold.multiset, gold.ordered)
+    assert not result_compare.compare(toy_db, "SELECT name FROM dept", "SELECT name FROM emp LIMIT 2", gold, forged)
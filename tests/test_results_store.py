@@ -0,0 +1,89 @@
+import json
+
+import pytest
+
+import results_store
+import run_log
+
+
+def write_run(path, records):
+    with run_log.RunWriter(str(path), truncate=True) as writer:
+        for r in records:
+            writer.write(r)
+
+
+def rec(question, check, pred_time=0.1, ratio=1.0):
+    return {"id": "toy", "question": question, "check": check, "pred_time": pred_time, "time_ratio": ratio}
+
+
+@pytest.fixture
+def store(workdir):
+    (workdir / "spider").mkdir()
+    write_run(workdir / "spider" / "results_gemini_bird_fewshot.jsonl",
+              [rec("q1", True, 0.1), rec("q2", False, 0.2), rec("q3", True, 0.3, 4.0)])
+    write_run(workdir / "spider" / "results_groq_bird_dynamic_fewshot_top3.jsonl",
+              [rec("q1", False), rec("q2", True), rec("q3", True)])
+    (workdir / "gemini_bird_fewshot.txt").write_text("Execution Accuracy: 66.67%\nValid Efficiency Score (VES): 80.00\n")
+    path = str(workdir / "results.sqlite")
+    patterns = ["spider/results_*.jsonl", "*.txt"]
+    assert results_store.ingest(patterns, path) == (3, 6)
+    conn = results_store.connect(path)
+    yield conn, path, patterns
+    conn.close()
+
+
+def test_parse_run_name():
+    assert results_store.parse_run_name("gemini_bird_dynamic_fewshot_top3") == ("gemini", "bird", "dynamic_fewshot", 3)
+    assert results_store.parse_run_name("gorq_spider_simple") == ("groq", "spider", "simple", None)
+    assert results_store.parse_run_name("adhoc") == (None, None, "adhoc", None)
+
+
+def test_unchanged_files_are_not_reingested(store):
+    _, path, patterns = store
+    assert results_store.ingest(patterns, path) == (0, 0)
+    assert results_store.ingest(patterns, path, force=True) == (3, 6)
+
+
+def test_summary_by_strategy(store):
+    conn, _, _ = store
+    rows = {row[1]: row[2:] for row in results_store.summary(conn, "strategy")}
+    n, accuracy, ves = rows["fewshot"]
+    assert n == 3 and accuracy == pytest.approx(200 / 3) and ves == pytest.approx(100.0)
+    reported = conn.execute("SELECT reported_accuracy, reported_ves FROM runs WHERE run = 'gemini_bird_fewshot'")
+    assert reported.fetchone() == (66.67, 80.0)
+
+
+def test_diff_counts_wins_and_losses(store):
+    conn, _, _ = store
+    report = results_store.diff(conn, "gemini_bird_fewshot", "groq_bird_dynamic_fewshot_top3")
+    assert (report["shared"], report["wins"], report["losses"], report["both_correct"]) == (3, 1, 1, 1)
+    assert report["win_examples"] == [("toy", "q1")]
+
+
+def test_latency_percentiles(store):
+    conn, _, _ = store
+    stats = results_store.latency(conn)["gemini_bird_fewshot"]
+    assert stats == {"n": 3, "p50": 0.2, "p90": 0.3, "p99": 0.3, "max": 0.3}
+    with pytest.raises(ValueError):
+        results_store.latency(conn, column="question")
+
+
+def test_json_results_files_are_ingested(workdir):
+    with open("results_gemini_spider_simple.json", "w") as f:
+        json.dump([{"db_id": "toy", "question": "q1", "check": "True", "time_ratio": "1.0"}], f)
+    path = str(workdir / "results.sqlite")
+    assert results_store.ingest(["results_*.json"], path) == (1, 1)
+    conn = results_store.connect(path)
+    assert conn.execute("SELECT run, correct FROM results").fetchall() == [("gemini_spider_simple", 1)]
+    conn.close()
+
+
+def test_rewritten_run_file_replaces_the_old_rows(store, workdir):
+    conn, path, patterns = store
+    write_run(workdir / "spider" / "results_gemini_bird_fewshot.jsonl", [rec("q1", False), rec("q4", True)])
+    assert results_store.ingest(patterns, path) == (1, 2)
+    questions = conn.execute("SELECT question FROM results WHERE run = 'gemini_bird_fewshot' ORDER BY question")
+    assert [q for (q,) in questions] == ["q1", "q4"]
+    assert results_store.diff(conn, "gemini_bird_fewshot", "groq_bird_dynamic_fewshot_top3")["shared"] == 1
+    # The other run is untouched
+    assert conn.execute("SELECT COUNT(*) FROM results WHERE run = 'groq_bird_dynamic_fewshot_top3'").fetchone() == (3,)
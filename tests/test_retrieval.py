@@ -0,0 +1,161 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+import fake_provider
+import providers
+import retrieval
+import utils
+
+KNOWLEDGE = [
+    {"db_id": "toy", "question": "How many employees are there?", "SQL": "SELECT COUNT(*) FROM emp"},
+    {"db_id": "toy", "question": "List department names", "SQL": "SELECT name FROM dept"},
+    {"db_id": "toy", "question": "Who earns the most?", "SQL": "SELECT name FROM emp ORDER BY salary DESC LIMIT 1"},
+]
+
+
+def fake_embed(calls):
+    # Deterministic unit vectors: one dimension per distinct word
+    vocabulary = {}
+
+    def embed(texts, model_id=retrieval.MODEL_ID, batch_size=256):
+        calls.append(list(texts))
+        rows = []
+        for text in texts:
+            v = np.zeros(64, dtype=np.float32)
+            for word in text.lower().strip("?").split():
+                v[vocabulary.setdefault(word, len(vocabulary) % 64)] += 1
+            rows.append(v / np.linalg.norm(v))
+        return np.stack(rows)
+    return embed
+
+
+def test_index_builds_for_namespaced_model_ids_and_is_reused(workdir, monkeypatch):
+    calls = []
+    monkeypatch.setattr(retrieval, "embed", fake_embed(calls))
+    path = workdir / "knowledge.json"
+    path.write_text(json.dumps(KNOWLEDGE))
+
+    model_id = "sentence-transformers/all-MiniLM-L6-v2"
+    index = retrieval.KnowledgeIndex.build(str(path), model_id)
+    assert index.matrix.shape == (3, 64)
+    assert sorted(os.listdir(retrieval.INDEX_DIR)) == [
+        "knowledge_sentence-transformers_all-MiniLM-L6-v2.json",
+        "knowledge_sentence-transformers_all-MiniLM-L6-v2.npy",
+    ]
+
+    retrieval.KnowledgeIndex.build(str(path), model_id)
+    assert len(calls) == 1      # second build loads the persisted matrix
+
+
+def test_top_k_returns_best_matches_first(workdir, monkeypatch):
+    monkeypatch.setattr(retrieval, "embed", fake_embed([]))
+    path = workdir / "knowledge.json"
+    path.write_text(json.dumps(KNOWLEDGE))
+    index = retrieval.KnowledgeIndex.build(str(path))
+
+    indices, scores = index.top_k(retrieval.embed(["How many employees?"]), k=2)
+    assert index.records[indices[0][0]]["query"] == "SELECT COUNT(*) FROM emp"
+    assert scores[0][0] >= scores[0][1]
+
+
+def retriever_for(records, monkeypatch, calls=None, cache_size=4096):
+    monkeypatch.setattr(retrieval, "embed", fake_embed(calls if calls is not None else []))
+    matrix = retrieval.embed([r["question"] for r in records])
+    return retrieval.Retriever(retrieval.KnowledgeIndex(records, matrix), cache_size=cache_size)
+
+
+def test_retrieve_can_stay_on_the_same_database(monkeypatch):
+    records = [
+        {"db_id": "other", "question": "How many employees are there", "query": "SELECT COUNT(*) FROM staff"},
+        {"db_id": "toy", "question": "How many departments", "query": "SELECT COUNT(*) FROM dept"},
+        {"db_id": "toy", "question": "List employees names", "query": "SELECT name FROM emp"},
+    ]
+    retriever = retriever_for(records, monkeypatch)
+    question = ["How many employees are there"]
+
+    assert retriever.retrieve(question, k=1)[0][0]["query"] == "SELECT COUNT(*) FROM staff"
+    (examples,) = retriever.retrieve(question, k=2, db_ids=["toy"])
+    assert {e["query"] for e in examples} == {"SELECT COUNT(*) FROM dept", "SELECT name FROM emp"}
+    # Fewer than k examples on the database: fall back to the whole pool
+    (examples,) = retriever.retrieve(question, k=3, db_ids=["toy"])
+    assert examples[0]["query"] == "SELECT COUNT(*) FROM staff" and len(examples) == 3
+
+
+def test_mmr_skips_near_duplicates(monkeypatch):
+    records = [
+        {"db_id": "toy", "question": "employees salary", "query": "A"},
+        {"db_id": "toy", "question": "employees salary", "query": "A2"},
+        {"db_id": "toy", "question": "employees names", "query": "B"},
+    ]
+    retriever = retriever_for(records, monkeypatch)
+    question = ["employees salary salary names"]
+
+    assert [e["query"] for e in retriever.retrieve(question, k=2)[0]] in (["A", "A2"], ["A2", "A"])
+    (examples,) = retriever.retrieve(question, k=2, mmr_lambda=0.5)
+    assert examples[0]["query"] in ("A", "A2") and examples[1]["query"] == "B"
+
+
+def test_question_embeddings_are_cached_lru(monkeypatch):
+    calls = []
+    retriever = retriever_for(KNOWLEDGE, monkeypatch, calls, cache_size=2)
+    calls.clear()
+
+    retriever.embed_queries(["a", "b", "a"])
+    assert calls == [["a", "b"]]
+    retriever.embed_queries(["a"])
+    assert calls == [["a", "b"]]
+    retriever.embed_queries(["c"])        # evicts b, the least recently used
+    retriever.embed_queries(["a", "b"])
+    assert calls == [["a", "b"], ["c"], ["b"]]
+
+
+def test_fewshot_examples_prefers_precomputed_top_5(toy_items, monkeypatch):
+    items = [dict(item, top_5=[{"question": f"q{n}", "query": f"SELECT {n}"} for n in range(5)]) for item in toy_items]
+    monkeypatch.setattr(retrieval, "get_retriever", lambda *a, **k: pytest.fail("retrieved online"))
+    examples = utils.fewshot_examples(items, 2, "bird")
+    assert examples == [item["top_5"][:2] for item in items]
+
+
+def test_fewshot_examples_retrieves_online_from_a_knowledge_file(workdir, toy_items, monkeypatch):
+    calls = []
+    monkeypatch.setattr(retrieval, "embed", fake_embed(calls))
+    monkeypatch.setattr(retrieval, "_retrievers", {})
+    path = workdir / "knowledge.json"
+    path.write_text(json.dumps(KNOWLEDGE))
+
+    examples = utils.fewshot_examples(toy_items, 1, "bird", knowledge_path=str(path))
+    assert [e[0]["query"] for e in examples[:2]] == ["SELECT COUNT(*) FROM emp", "SELECT name FROM dept"]
+    assert calls[-1] == [item["question"] for item in toy_items]    # one batched pass over the eval questions
+
+
+def test_sweep_retrieves_once_for_all_top_ks(toy_db, toy_items, monkeypatch):
+    calls, seen = [], []
+    monkeypatch.setattr(retrieval, "embed", fake_embed(calls))
+    monkeypatch.setattr(retrieval, "_retrievers", {})
+    monkeypatch.setattr(providers, "_instances", {})
+    monkeypatch.setattr(fake_provider, "_default", fake_provider.from_dataset(toy_items, "bird", latency=0, jitter=0))
+    real = utils.evaluate_example
+
+    def spy(*args, **kwargs):
+        seen.append(len(kwargs["topk"]))
+        return real(*args, **kwargs)
+
+    monkeypatch.setattr(utils, "evaluate_example", spy)
+    path = toy_db.rsplit("data", 1)[0] + "knowledge.json"
+    with open(path, "w") as f:
+        json.dump(KNOWLEDGE, f)
+
+    results = utils.evaluate_dynamic_fewshot_sweep(toy_items, "{top_k} {db_schema} {user_question}", [1, 2], "bird",
+                                                   "sweep", "fake", max_workers=1, knowledge_path=path)
+    assert sorted(results) == [1, 2] and all(accuracy == 100 for accuracy, _ in results.values())
+    assert sorted(seen) == [1, 1, 1, 2, 2, 2]
+    assert len(calls) == 2      # the knowledge pool and the eval questions, each embedded once
+
+
+def test_entry_scripts_accept_retrieval_flags():
+    options = utils.run_options(["--top_k", "3", "--knowledge_path", "k.json", "--same_db", "--mmr_lambda", "0.5"])
+    assert (options.top_k, options.knowledge_path, options.same_db, options.mmr_lambda) == (3, "k.json", True, 0.5)
+    assert utils.run_options([]).mmr_lambda is None
@@ -0,0 +1,94 @@
+import functools
+import json
+
+import pytest
+
+import eval_engine
+import fake_provider
+import llm_cache
+import run_log
+import utils
+
+
+def record(db_id, question, **extra):
+    return {"id": db_id, "question": question, "check": True, "time_ratio": 1.0, **extra}
+
+
+def lines(path):
+    with open(path) as f:
+        return f.read().splitlines()
+
+
+def test_resume_after_a_torn_last_line(workdir):
+    path = run_log.results_path("v")
+    with run_log.RunWriter(path, truncate=True) as writer:
+        writer.write(record("db", "q1"))
+    with open(path, "a") as f:
+        f.write('{"id": "db", "question": "q2", "che')
+
+    assert run_log.completed_keys(path, "v") == {("db", "q1", "v")}
+    with run_log.RunWriter(path) as writer:
+        writer.write(record("db", "q3"))
+    assert [r["question"] for r in run_log.iter_records(path)] == ["q1", "q3"]
+    assert len(lines(path)) == 2
+
+
+def test_unterminated_complete_record_is_kept(workdir):
+    path = run_log.results_path("v")
+    (workdir / "spider").mkdir()
+    with open(path, "w") as f:
+        f.write(json.dumps(record("db", "q1")))
+    with run_log.RunWriter(path) as writer:
+        writer.write(record("db", "q2"))
+    assert [r["question"] for r in run_log.iter_records(path)] == ["q1", "q2"]
+
+
+def test_generation_failures_are_not_completed(workdir):
+    path = run_log.results_path("v")
+    with run_log.RunWriter(path, truncate=True) as writer:
+        writer.write(record("db", "q1"))
+        writer.write(record("db", "q2", pred_status=run_log.FAILED, check=False))
+    assert run_log.completed_keys(path, "v") == {("db", "q1", "v")}
+    assert run_log.compact(path) == 1
+    assert [r["question"] for r in run_log.iter_records(path)] == ["q1"]
+    assert run_log.compact(path) == 0
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(utils, "call_with_limits",
+                        functools.partial(eval_engine.call_with_limits, max_retries=0, backoff=0.0))
+
+
+def test_resume_redoes_rate_limited_examples(toy_db, toy_items, no_backoff, monkeypatch):
+    monkeypatch.setattr(fake_provider, "_default",
+                        fake_provider.from_dataset(toy_items, "bird", latency=0, jitter=0, error_rate=1.0))
+    utils.evaluate(toy_items, "{db_schema} {user_question}", "bird", "v", "fake", max_workers=1)
+    records = list(run_log.iter_records(run_log.results_path("v")))
+    assert [r["pred_status"] for r in records] == [run_log.FAILED] * 3
+
+    monkeypatch.setattr(fake_provider, "_default",
+                        fake_provider.from_dataset(toy_items, "bird", latency=0, jitter=0))
+    accuracy, _ = utils.evaluate(toy_items, "{db_schema} {user_question}", "bird", "v", "fake",
+                                 max_workers=1, resume=True)
+    assert accuracy == 100
+    records = list(run_log.iter_records(run_log.results_path("v")))
+    assert len(records) == 3 and all(r["check"] for r in records)
+
+
+def test_provider_error_is_not_cached_as_an_answer(workdir, monkeypatch):
+    import providers
+
+    class Broken(providers.Provider):
+        name = "broken"
+        default_model = "broken"
+
+        def _generate(self, prompt):
+            raise ConnectionError("connection reset")
+
+    monkeypatch.setitem(providers.PROVIDERS, "broken", Broken)
+    monkeypatch.setattr(llm_cache, "_cache", None)
+    monkeypatch.setenv("LLM_CACHE_MODE", "readwrite")
+    with pytest.raises(utils.GenerationFailed, match="connection reset"):
+        utils.complete("prompt", "broken")
+    assert llm_cache.get_cache().get("broken", "broken", "prompt") is None
@@ -0,0 +1,50 @@
+import json
+import os
+import sqlite3
+
+import schema_catalog
+
+
+def test_catalog_reads_tables_columns_and_keys(toy_db):
+    catalog = schema_catalog.get_catalog(toy_db)
+    tables = {t["name"]: t for t in catalog["tables"]}
+    assert set(tables) == {"dept", "emp"}
+    assert [c["name"] for c in tables["emp"]["columns"]] == ["id", "name", "salary", "dept_id"]
+    assert tables["emp"]["fks"][0]["ref_table"] == "dept"
+
+
+def test_catalog_is_rebuilt_when_the_database_changes(toy_db):
+    first = schema_catalog.get_catalog(toy_db)
+    assert schema_catalog.get_catalog(toy_db) is first
+
+    conn = sqlite3.connect(toy_db)
+    conn.execute("CREATE TABLE project (id INTEGER PRIMARY KEY, title TEXT)")
+    conn.commit()
+    conn.close()
+    os.utime(toy_db, (first["mtime"] + 10, first["mtime"] + 10))
+
+    names = {t["name"] for t in schema_catalog.get_catalog(toy_db)["tables"]}
+    assert "project" in names
+
+
+def test_disk_cache_is_written_atomically_and_survives_truncation(toy_db):
+    schema_catalog.get_catalog(toy_db)
+    disk_path = schema_catalog._disk_path(toy_db)
+    assert json.load(open(disk_path))["tables"]
+    assert not [p for p in os.listdir(os.path.dirname(disk_path)) if p.endswith(".tmp")]
+
+    # A torn file (e.g. from a crash mid-write) is treated as a miss, not an error
+    with open(disk_path, "w") as f:
+        f.write('{"tables": [')
+    schema_catalog._memo.clear()
+    assert {t["name"] for t in schema_catalog.get_catalog(toy_db)["tables"]} == {"dept", "emp"}
+
+
+def test_compact_format_quotes_unusual_names(workdir):
+    path = workdir / "odd.sqlite"
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE "school info" ("Free Meal Count (K-12)" REAL, cds TEXT PRIMARY KEY)')
+    conn.commit()
+    conn.close()
+    text = schema_catalog.serialize(schema_catalog.get_catalog(str(path)), "compact")
+    assert "`school info`(`Free Meal Count (K-12)`:real, cds*:text)" in text
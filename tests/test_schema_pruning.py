@@ -0,0 +1,55 @@
+import sqlite3
+
+import pytest
+
+import schema_catalog
+import schema_pruning
+import utils
+from rate_limiter import estimate_tokens
+
+
+@pytest.fixture
+def wide_catalog(toy_db):
+    conn = sqlite3.connect(toy_db)
+    for name in ("weather", "inventory", "shipments", "audit_log"):
+        cols = ", ".join(f"{name}_field_{n} TEXT" for n in range(12))
+        conn.execute(f"CREATE TABLE {name} (id INTEGER PRIMARY KEY, {cols})")
+    conn.commit()
+    conn.close()
+    return schema_catalog.get_catalog(toy_db)
+
+
+def test_small_schema_is_kept_whole(toy_db):
+    catalog = schema_catalog.get_catalog(toy_db)
+    assert schema_pruning.select_schema(catalog, "How many employees?", token_budget=10_000) == (None, None)
+
+
+def test_relevant_tables_and_fk_neighbours_are_kept(wide_catalog):
+    tables, _ = schema_pruning.select_schema(wide_catalog, "Average salary of employees per dept name",
+                                             token_budget=200)
+    assert tables == {"emp", "dept"}
+    text = schema_pruning.prune_schema(wide_catalog, "Average salary per dept", token_budget=200)
+    assert "weather" not in text and estimate_tokens(text) <= 200
+
+
+def test_evidence_mentions_count(wide_catalog):
+    table_scores, column_scores = schema_pruning.score_schema(wide_catalog, "What was it?", "uses weather_field_3")
+    assert max(table_scores, key=table_scores.get) == "weather"
+    assert column_scores["weather"]["weather_field_3"] > 0
+
+
+def test_nothing_matching_keeps_the_full_schema(wide_catalog):
+    assert schema_pruning.select_schema(wide_catalog, "zzz qqq", token_budget=50) == (None, None)
+
+
+def test_schema_token_budget_prunes_prompts(wide_catalog, toy_db, monkeypatch):
+    item = {"question": "Average salary per dept", "evidence": ""}
+    assert "weather" in utils.schema_for_item(toy_db, item)
+    monkeypatch.setenv("SCHEMA_TOKEN_BUDGET", "200")
+    pruned = utils.schema_for_item(toy_db, item)
+    assert "weather" not in pruned and "emp" in pruned
+
+
+def test_gold_tables():
+    catalog = {"tables": [{"name": "emp"}, {"name": "Dept Info"}]}
+    assert schema_pruning.gold_tables(catalog, "SELECT * FROM emp JOIN `Dept Info` ON 1") == {"emp", "Dept Info"}
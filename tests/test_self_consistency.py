@@ -0,0 +1,57 @@
+import run_experiments
+import self_consistency
+from result_compare import ResultDigest
+
+
+def fake_execute(answers):
+    """execute(db_path, sql) whose digest is determined by answers[sql] (None = failed)."""
+    def execute(db_path, sql):
+        if answers[sql] is None:
+            return "error", None
+        digest = ResultDigest()
+        digest.update([(answers[sql],)])
+        return "ok", digest
+    return execute
+
+
+def sampler(sqls):
+    drawn = []
+
+    def sample(start, count):
+        drawn.append((start, count))
+        return [(f"out {sql}", sql) for sql in sqls[start:start + count]]
+    return sample, drawn
+
+
+def test_vote_picks_the_largest_cluster():
+    sample, _ = sampler(["a", "b", "c", "b", "c", "b"])
+    voted = self_consistency.vote(sample, "db", 5, fake_execute({"a": 1, "b": 2, "c": 3}))
+    assert voted["sql"] == "b" and voted["clusters"] == [2, 2, 1]
+
+
+def test_vote_stops_once_the_leader_cannot_be_caught():
+    sample, drawn = sampler(["a"] * 7)
+    voted = self_consistency.vote(sample, "db", 7, fake_execute({"a": 1}))
+    assert voted["samples"] == 4 and drawn == [(0, 4)]
+
+
+def test_vote_falls_back_to_first_sample_when_nothing_runs():
+    sample, _ = sampler(["x", "y", "z"])
+    voted = self_consistency.vote(sample, "db", 3, fake_execute({"x": None, "y": None, "z": None}))
+    assert voted["sql"] == "x" and voted["clusters"] == []
+
+
+def test_version_suffix_has_samples_and_temperature(monkeypatch):
+    assert self_consistency.version_suffix(1) == ""
+    assert self_consistency.version_suffix(5, 0.7) == "_sc5_t0.7"
+    monkeypatch.setenv("SC_TEMPERATURE", "1.0")
+    assert self_consistency.version_suffix(3) == "_sc3_t1"
+
+
+def test_experiment_runs_with_different_voting_get_different_logs():
+    spec = {**run_experiments.DEFAULTS, "strategies": ["fewshot", "dynamic_fewshot"], "providers": ["fake"],
+            "datasets": ["bird"], "top_k": [3]}
+    names = lambda **kw: [job["version_name"] for job in run_experiments.expand({**spec, **kw})]
+    assert names() == ["fake_bird_fewshot", "fake_bird_dynamic_fewshot_top3"]
+    assert names(samples=5) == ["fake_bird_fewshot_sc5_t0.7", "fake_bird_dynamic_fewshot_sc5_t0.7_top3"]
+    assert names(samples=5) != names(samples=7)
@@ -0,0 +1,39 @@
+import sql_executor
+
+RECURSIVE = "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n) SELECT COUNT(*) FROM n"
+
+
+def test_rows_and_timing(toy_db):
+    outcome = sql_executor.run_query(toy_db, "SELECT name FROM dept ORDER BY id")
+    assert outcome.ok
+    assert outcome.rows == [("Eng",), ("Sales",)]
+    assert outcome.exec_time >= 0
+
+
+def test_runaway_query_is_interrupted(toy_db):
+    outcome = sql_executor.run_query(toy_db, RECURSIVE, timeout=0.2)
+    assert outcome.status == sql_executor.TIMEOUT
+
+    outcome = sql_executor.run_query(toy_db, RECURSIVE, timeout=None, max_steps=100_000)
+    assert outcome.status == sql_executor.TIMEOUT
+
+
+def test_row_limit(toy_db):
+    outcome = sql_executor.run_query(toy_db, "SELECT * FROM emp", max_rows=2)
+    assert outcome.status == sql_executor.ROW_LIMIT
+    assert outcome.rows is None
+
+
+def test_errors_and_writes_are_reported_not_raised(toy_db):
+    assert sql_executor.run_query(toy_db, "SELECT nope FROM emp").status == sql_executor.ERROR
+    assert sql_executor.run_query(toy_db, "DELETE FROM emp").status == sql_executor.ERROR
+    assert sql_executor.run_query(toy_db, "SELECT COUNT(*) FROM emp").rows == [(3,)]
+    assert sql_executor.run_query(toy_db, "").status == sql_executor.ERROR
+    assert "not found" in sql_executor.run_query("missing.sqlite", "SELECT 1").error
+
+
+def test_streaming_batches(toy_db):
+    seen = []
+    outcome = sql_executor.run_query(toy_db, "SELECT id FROM emp", on_batch=seen.extend)
+    assert outcome.ok and outcome.rows is None
+    assert sorted(seen) == [(1,), (2,), (3,)]
@@ -0,0 +1,98 @@
+import common
+import providers
+import run_log
+import schema_catalog
+import sql_executor
+import sql_repair
+import utils
+from eval_engine import GenerationFailed
+
+
+def test_closest_name_ignores_case_and_punctuation():
+    names = {"Free Meal Count (K-12)", "salary", "name"}
+    assert sql_repair.closest_name("free_meal_count_k12", names) == "Free Meal Count (K-12)"
+    assert sql_repair.closest_name("salery", names) == "salary"
+    assert sql_repair.closest_name("zzz", names) is None
+
+
+def test_fuzzy_fix_rewrites_misspelled_names(toy_db):
+    catalog = schema_catalog.get_catalog(toy_db)
+    fixed = sql_repair.fuzzy_fix("SELECT salery FROM emp", "no such column: salery", catalog)
+    assert fixed == "SELECT salary FROM emp"
+    fixed = sql_repair.fuzzy_fix("SELECT name FROM emps", "no such table: emps", catalog)
+    assert fixed == "SELECT name FROM emp"
+    assert sql_repair.fuzzy_fix("SELECT 1", "syntax error", catalog) is None
+
+
+def test_quoting_is_shared_with_the_catalog():
+    assert common.quote_identifier("salary") == "salary"
+    assert common.quote_identifier("Free Meal Count (K-12)") == "`Free Meal Count (K-12)`"
+    assert "`Free Meal Count (K-12)`" in schema_catalog.serialize(
+        {"tables": [{"name": "t", "columns": [{"name": "Free Meal Count (K-12)", "type": "", "pk": 0}], "fks": []}]},
+        fmt="compact",
+    )
+
+
+def test_repair_tries_local_fixes_before_the_llm(toy_db):
+    calls = []
+    fixed, outcome, digest, attempts = sql_repair.repair(
+        toy_db, "SELECT salery FROM emp", "no such column: salery", lambda sql, error: calls.append(sql),
+    )
+    assert fixed == "SELECT salary FROM emp" and outcome.ok and digest.row_count == 3
+    assert [a["kind"] for a in attempts] == ["local"] and calls == []
+
+
+def test_repair_falls_back_to_the_llm(toy_db):
+    seen = []
+
+    def llm_fix(sql, error):
+        seen.append(error)
+        return "SELECT COUNT(*) FROM emp"
+
+    fixed, outcome, _, attempts = sql_repair.repair(toy_db, "SELECT FROM", "syntax error", llm_fix)
+    assert fixed == "SELECT COUNT(*) FROM emp" and outcome.ok
+    assert [a["kind"] for a in attempts] == ["llm"] and seen == ["syntax error"]
+
+
+def test_repair_gives_up_after_max_attempts(toy_db):
+    fixed, outcome, _, attempts = sql_repair.repair(
+        toy_db, "SELECT FROM", "syntax error", lambda sql, error: "SELECT nope FROM emp", max_attempts=2,
+    )
+    assert fixed is None and outcome is None
+    assert len(attempts) == 2 and all(a["error"] for a in attempts)
+
+
+def test_explain_error_compiles_without_running(toy_db):
+    assert sql_repair.explain_error(toy_db, "SELECT name FROM emp") is None
+    assert "no such table" in sql_repair.explain_error(toy_db, "SELECT * FROM nope")
+    assert sql_executor.run_query(toy_db, "SELECT COUNT(*) FROM emp").rows == [(3,)]
+
+
+def test_repair_stops_when_the_model_gives_no_answer(toy_db):
+    def llm_fix(sql, error):
+        raise GenerationFailed("rate limited after 6 attempts")
+
+    fixed, outcome, _, attempts = sql_repair.repair(toy_db, "SELECT FROM", "syntax error", llm_fix)
+    assert fixed is None and outcome is None
+    assert attempts == [{"kind": "llm", "sql": None, "error": "rate limited after 6 attempts", "skipped": True}]
+
+
+def test_failed_repair_call_keeps_the_original_prediction(toy_db, toy_items, monkeypatch):
+    monkeypatch.setenv("SQL_REPAIR_ATTEMPTS", "2")
+
+    class RepairUnavailable(providers.Provider):
+        name = "no_repair"
+        default_model = "no_repair"
+
+        def _generate(self, prompt):
+            if "was written for the question" in prompt:
+                raise RuntimeError("service unavailable")
+            return "-- SQL Query\nSELECT FROM emp;"
+
+    monkeypatch.setitem(providers.PROVIDERS, "no_repair", RepairUnavailable)
+    monkeypatch.setattr(providers, "_instances", {})
+    utils.evaluate(toy_items[:1], "{db_schema} {user_question}", "bird", "r", "no_repair", max_workers=1)
+    (record,) = run_log.iter_records(run_log.results_path("r"))
+    assert record["pred_status"] == sql_executor.ERROR and record["pred_query"] == "SELECT FROM emp;"
+    assert "service unavailable" in record["repair_skipped"]
+    assert record["repair_attempts"][-1]["skipped"]
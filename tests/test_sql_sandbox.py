@@ -0,0 +1,62 @@
+import pytest
+
+import query_timing
+import result_compare
+import sql_executor
+import sql_sandbox
+
+
+@pytest.fixture
+def service(workdir):
+    service = sql_sandbox.ExecutionService(n_workers=1, timeout=2.0)
+    yield service
+    service.close()
+
+
+@pytest.fixture
+def no_local_execution(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("SQL executed in the evaluator process")
+
+    monkeypatch.setattr(sql_executor, "run_query", fail)
+
+
+def test_digest_and_rows(service, toy_db):
+    outcome, digest = service.digest(toy_db, "SELECT name FROM dept")
+    assert outcome.ok and digest.row_count == 2
+    outcome = service.run_query(toy_db, "SELECT name FROM dept ORDER BY id")
+    assert outcome.ok and outcome.rows == [("Eng",), ("Sales",)]
+    assert service.digest(toy_db, "")[0].status == sql_executor.ERROR
+
+
+def test_run_query_caps_rows_in_the_worker(service, toy_db):
+    outcome = service.run_query(toy_db, "SELECT * FROM emp", max_rows=2)
+    assert outcome.status == sql_executor.ROW_LIMIT and outcome.rows is None
+    outcome = service.run_query(toy_db, "SELECT id FROM emp ORDER BY id", max_rows=2, truncate=True)
+    assert outcome.ok and outcome.truncated and outcome.rows == [(1,), (2,)]
+
+
+def test_compare_verifies_in_the_worker(service, toy_db, no_local_execution):
+    gold_sql, pred_sql = "SELECT name FROM dept", "SELECT name FROM dept ORDER BY name DESC"
+    _, gold = service.digest(toy_db, gold_sql)
+    _, pred = service.digest(toy_db, pred_sql)
+    assert service.compare(toy_db, gold_sql, pred_sql, gold, pred)
+    assert not service.compare(toy_db, gold_sql, pred_sql, gold, pred, ordered=True)
+    forged = result_compare.ResultDigest(gold.row_count, gold.multiset, gold.ordered)
+    assert not service.compare(toy_db, gold_sql, "SELECT name FROM emp LIMIT 2", gold, forged)
+
+
+def test_timing_runs_in_the_worker(service, toy_db, no_local_execution, monkeypatch):
+    monkeypatch.setattr(query_timing, "measure_samples", lambda *a, **k: pytest.fail("timed in-process"))
+    ratio, _, gold, pred = query_timing.time_ratio(
+        toy_db, "SELECT COUNT(*) FROM emp", "SELECT COUNT(*) FROM emp", repetitions=3,
+        runner=service.measure_samples,
+    )
+    assert len(gold.samples) == 3 and len(pred.samples) == 3 and ratio > 0
+
+
+def test_slow_query_times_out_in_the_worker(service, toy_db):
+    slow = ("WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 100000000) "
+            "SELECT COUNT(*) FROM c")
+    samples = service.measure_samples(toy_db, [slow], warmup=0, repetitions=1, timeout=0.2, budget=0.0)
+    assert samples == [[0.2]]
@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+import fake_provider
+import providers
+import result_compare
+import retrieval
+import sql_executor
+import sql_service
+
+
+def unit(*values):
+    v = np.array(values, dtype=np.float32)
+    return v / np.linalg.norm(v)
+
+
+def test_exact_lookup_normalizes_the_question():
+    cache = sql_service.SemanticCache()
+    cache.put("db", "How many employees?", None, {"sql": "SELECT 1"})
+    assert cache.exact("db", "  how many   EMPLOYEES ")["sql"] == "SELECT 1"
+    assert cache.exact("other", "How many employees?") is None
+
+
+def test_nearest_respects_the_threshold():
+    cache = sql_service.SemanticCache(threshold=0.9)
+    cache.put("db", "q1", unit(1, 0), {"sql": "A"})
+    cache.put("db", "q2", unit(0, 1), {"sql": "B"})
+    entry, similarity = cache.nearest("db", unit(1, 0.1))
+    assert entry["sql"] == "A" and similarity > 0.9
+    entry, similarity = cache.nearest("db", unit(1, 1))
+    assert entry is None and similarity < 0.9
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = sql_service.SemanticCache(max_entries=2)
+    for q in ("a", "b"):
+        cache.put("db", q, None, {"sql": q})
+    cache.exact("db", "a")
+    cache.put("db", "c", None, {"sql": "c"})
+    assert cache.exact("db", "b") is None and cache.exact("db", "a") is not None
+
+
+@pytest.fixture
+def fake_service(toy_db, toy_items, monkeypatch):
+    monkeypatch.setattr(fake_provider, "_default", fake_provider.from_dataset(toy_items, "bird", latency=0, jitter=0))
+    monkeypatch.setattr(providers, "_instances", {})
+
+    def service(model_error=None):
+        def get_model(model_id=retrieval.MODEL_ID):
+            if model_error is not None:
+                raise model_error
+        monkeypatch.setattr(retrieval, "get_model", get_model)
+        return sql_service.QueryService("fake", "bird", "simple")
+    return service
+
+
+@pytest.mark.parametrize("error", [ImportError("no sentence_transformers"), OSError("model download failed")])
+def test_service_runs_without_the_embedding_model(fake_service, error):
+    service = fake_service(error)
+    assert not service.semantic
+    first = service.answer("How many employees?", "toy")
+    assert first["cache"] == "miss" and first["rows"] == [[3]]
+    assert service.answer("how many employees", "toy")["cache"] == "exact"
+
+
+def test_paraphrases_hit_the_semantic_cache(fake_service, monkeypatch):
+    vectors = {"How many employees?": unit(1, 0), "Count the staff": unit(1, 0.05)}
+    monkeypatch.setattr(retrieval, "embed", lambda texts, *a, **k: np.stack([vectors[t] for t in texts]))
+    service = fake_service()
+    assert service.semantic
+    service.answer("How many employees?", "toy")
+    hit = service.answer("Count the staff", "toy")
+    assert hit["cache"] == "semantic" and hit["rows"] == [[3]]
+
+
+def test_large_results_are_truncated_and_cached(fake_service, monkeypatch):
+    # 3^7 = 2187 rows
+    many = "SELECT e1.id FROM emp e1, emp e2, emp e3, emp e4, emp e5, emp e6, emp e7"
+    canned = fake_provider.FakeProvider({"All numbers": many}, latency=0, jitter=0)
+    monkeypatch.setattr(fake_provider, "_default", canned)
+    service = fake_service(ImportError("no sentence_transformers"))
+    first = service.answer("All numbers", "toy")
+    assert first["status"] == "ok" and first["error"] is None and first["truncated"]
+    assert len(first["rows"]) == sql_service.MAX_RESULT_ROWS
+    cached = service.answer("All numbers", "toy")
+    assert cached["cache"] == "exact" and cached["truncated"] and len(cached["rows"]) == sql_service.MAX_RESULT_ROWS
+    assert not service.answer("How many employees?", "toy")["truncated"]
+
+
+def test_run_query_can_truncate_instead_of_failing(toy_db):
+    outcome = sql_executor.run_query(toy_db, "SELECT id FROM emp ORDER BY id", max_rows=2, truncate=True)
+    assert outcome.ok and outcome.truncated and outcome.rows == [(1,), (2,)]
+    digest = result_compare.ResultDigest()
+    outcome = sql_executor.run_query(toy_db, "SELECT id FROM emp", max_rows=1, truncate=True, on_batch=digest.update)
+    assert outcome.truncated and digest.row_count == 1
+    assert not sql_executor.run_query(toy_db, "SELECT id FROM emp", max_rows=3, truncate=True).truncated
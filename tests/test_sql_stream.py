@@ -0,0 +1,41 @@
+import pytest
+
+import fake_provider
+import providers
+import sql_stream
+import utils
+
+
+ANSWER = "-- Reasoning\nCount rows; simple.\n\n-- SQL Query\nSELECT COUNT(*) FROM emp WHERE name = 'a;b';\n\nExtra text"
+
+
+@pytest.mark.parametrize("size", [1, 3, 8, len(ANSWER)])
+def test_parser_stops_at_the_statement_end(size):
+    parser = sql_stream.SqlStreamParser()
+    chunks = [ANSWER[i:i + size] for i in range(0, len(ANSWER), size)]
+    fed = 0
+    for chunk in chunks:
+        fed += 1
+        if parser.feed(chunk):
+            break
+    # The ";" inside the string literal doesn't end the statement
+    assert parser.sql == "SELECT COUNT(*) FROM emp WHERE name = 'a;b';"
+    assert fed < len(chunks) or size == len(ANSWER)
+
+
+def test_parser_waits_for_the_marker():
+    parser = sql_stream.SqlStreamParser()
+    assert not parser.feed("SELECT is how we start; then -- SQL")
+    assert not parser.feed(" Query\nSELECT 1")
+    assert parser.feed(";")
+    assert parser.sql == "SELECT 1;"
+
+
+def test_streamed_completion_is_cancelled_after_the_sql(workdir, toy_items, monkeypatch):
+    monkeypatch.setenv("LLM_STREAM", "1")
+    monkeypatch.setattr(fake_provider, "_default", fake_provider.from_dataset(toy_items, "bird", latency=0, jitter=0))
+    monkeypatch.setattr(providers, "_instances", {})
+    timings = {}
+    text = utils.complete(f"question: {toy_items[0]['question']}", "fake", timings=timings)
+    assert utils.extract_sql(text) == "SELECT COUNT(*) FROM emp;"
+    assert "time_to_sql" in timings and "stream_cancelled" in timings
@@ -0,0 +1,97 @@
+import sqlite3
+
+import pytest
+
+import fake_provider
+import providers
+import run_log
+import sql_validator
+import utils
+
+
+@pytest.fixture(params=["sqlglot", "explain"])
+def checker(request, monkeypatch):
+    """Runs each test with the sqlglot name check (when installed) and with EXPLAIN alone."""
+    if request.param == "sqlglot":
+        if sql_validator._sqlglot() is None:
+            pytest.skip("sqlglot not installed")
+    else:
+        monkeypatch.setattr(sql_validator, "_sqlglot", lambda: None)
+    return request.param
+
+
+@pytest.mark.parametrize("sql, error", [
+    (None, "no SQL query found"),
+    ("  ; ", "empty query"),
+    ("SELECT 1; SELECT 2", "multiple statements"),
+    ("DROP TABLE emp", "not a query: DROP"),
+    ("WITH x AS (SELECT 1) DELETE FROM emp", "write statement (DELETE) not allowed"),
+])
+def test_statement_checks(toy_db, checker, sql, error):
+    result = sql_validator.validate(toy_db, sql)
+    assert not result.ok and result.error == error
+
+
+def test_literals_and_comments_are_not_statements(toy_db, checker):
+    result = sql_validator.validate(toy_db, "SELECT name FROM emp WHERE name = 'a; DELETE' -- ; UPDATE\n")
+    assert result.ok, result.error
+
+
+@pytest.mark.parametrize("sql, error", [
+    ("SELECT name FROM emps", "no such table: emps"),
+    ("SELECT salery FROM emp", "no such column: salery"),
+])
+def test_unknown_names_are_rejected(toy_db, checker, sql, error):
+    result = sql_validator.validate(toy_db, sql)
+    assert not result.ok and result.error == error
+
+
+def test_valid_query_with_aliases_and_cte(toy_db, checker):
+    assert sql_validator.validate(
+        toy_db, "SELECT T1.name AS n FROM emp AS T1 JOIN dept T2 ON T1.dept_id = T2.id ORDER BY n").ok
+    assert sql_validator.validate(toy_db, "WITH top AS (SELECT MAX(salary) AS s FROM emp) SELECT s FROM top").ok
+
+
+def test_full_scan_of_a_large_table_is_a_warning(toy_db, monkeypatch):
+    monkeypatch.setattr(sql_validator, "LARGE_TABLE_ROWS", 3)
+    monkeypatch.setattr(sql_validator, "_row_estimates", {})
+    result = sql_validator.validate(toy_db, "SELECT T1.name FROM emp AS T1 WHERE T1.salary > 100")
+    assert result.ok and result.scanned_rows == 3
+    assert result.warnings == ["full scan of emp (~3 rows) without LIMIT"]
+    limited = sql_validator.validate(toy_db, "SELECT name FROM emp WHERE salary > 100 LIMIT 1")
+    assert limited.ok and limited.warnings == []
+
+
+def test_validation_never_writes(toy_db):
+    sql_validator.validate(toy_db, "SELECT name FROM emp")
+    assert sqlite3.connect(toy_db).execute("SELECT COUNT(*) FROM emp").fetchone() == (3,)
+
+
+def test_sqlglot_findings_do_not_override_sqlite(toy_db, checker):
+    # sqlglot doesn't know table-valued functions; SQLite runs this fine
+    result = sql_validator.validate(toy_db, "SELECT value FROM json_each('[1, 2]')")
+    assert result.ok, result.error
+    if checker == "sqlglot":
+        assert result.warnings[0].startswith("sqlglot: no such table")
+
+
+def test_only_real_table_scans_are_estimated(toy_db, monkeypatch):
+    looked_up = []
+    monkeypatch.setattr(sql_validator, "estimated_rows", lambda db_path, table: looked_up.append(table) or 3)
+    for sql in ("SELECT 1",
+                "WITH c AS MATERIALIZED (SELECT * FROM emp) SELECT * FROM c",
+                "SELECT name FROM main.emp",
+                "SELECT s.name FROM (SELECT name FROM dept ORDER BY name LIMIT 5) AS s"):
+        assert sql_validator.validate(toy_db, sql).ok
+    assert looked_up == ["emp", "emp", "dept"]
+
+
+def test_validation_is_opt_in(toy_db, toy_items, monkeypatch):
+    monkeypatch.setattr(providers, "_instances", {})
+    monkeypatch.setattr(fake_provider, "_default", fake_provider.from_dataset(toy_items, "bird", latency=0, jitter=0))
+    utils.evaluate(toy_items[:1], "{db_schema} {user_question}", "bird", "off", "fake", max_workers=1)
+    monkeypatch.setenv("SQL_VALIDATE", "1")
+    utils.evaluate(toy_items[:1], "{db_schema} {user_question}", "bird", "on", "fake", max_workers=1)
+    (off,) = run_log.iter_records(run_log.results_path("off"))
+    (on,) = run_log.iter_records(run_log.results_path("on"))
+    assert "validation" not in off and on["validation"]["ok"]
@@ -0,0 +1,78 @@
+import json
+import random
+
+import pytest
+
+import fake_provider
+import providers
+import run_log
+import tracing
+import utils
+
+
+@pytest.fixture
+def tracer(monkeypatch):
+    monkeypatch.delenv("TRACE", raising=False)
+    monkeypatch.setattr(tracing, "_tracer", tracing.Tracer())
+    return tracing._tracer
+
+
+def test_histogram_percentiles_are_close():
+    h = tracing.Histogram()
+    values = [random.Random(0).uniform(0.001, 2.0) for _ in range(5000)]
+    for v in values:
+        h.record(v)
+    values.sort()
+    for q in (0.5, 0.9, 0.99):
+        assert h.percentile(q) == pytest.approx(values[int(q * len(values)) - 1], rel=0.02)
+    assert h.max == values[-1] and h.count == 5000
+
+
+def test_histograms_merge_and_round_trip():
+    a, b = tracing.Histogram(), tracing.Histogram()
+    for v in (0.1, 0.2):
+        a.record(v)
+    b.record(0.3)
+    a.merge(b)
+    restored = tracing.Histogram.from_dict(json.loads(json.dumps(a.to_dict())))
+    assert restored.count == 3 and restored.max == 0.3 and restored.percentile(1.0) == a.percentile(1.0)
+
+
+def test_spans_nest_and_inherit_tags(tracer):
+    with tracing.tagged(run="r", provider="p"):
+        with tracing.span("example") as root:
+            with tracing.span("generate"):
+                pass
+            root.set(outcome="correct")
+        tracing.count("api_requests", 2)
+    snapshot = tracer.snapshot(run="r")
+    stages = {(s["stage"], s["outcome"]) for s in snapshot["stages"]}
+    assert stages == {("example", "correct"), ("generate", "ok")}
+    assert snapshot["counters"] == [{"name": "api_requests", "tags": {"provider": "p", "run": "r"}, "value": 2}]
+
+
+def test_failing_span_is_an_error(tracer):
+    with pytest.raises(ValueError):
+        with tracing.span("compare"):
+            raise ValueError("boom")
+    assert tracer.snapshot()["stages"][0]["outcome"] == "error"
+
+
+def test_prometheus_export(tracer):
+    with tracing.tagged(run="r"):
+        with tracing.span("generate"):
+            pass
+    text = tracing.to_prometheus(tracer.snapshot())
+    assert 'nl2sql_stage_seconds_count{stage="generate",run="r",outcome="ok"} 1' in text
+
+
+def test_repaired_example_counts_its_repair_attempts(toy_db, toy_items, tracer, monkeypatch):
+    monkeypatch.setenv("SQL_REPAIR_ATTEMPTS", "1")
+    canned = {toy_items[0]["question"]: "SELECT COUNT(*) FROM emps"}
+    monkeypatch.setattr(fake_provider, "_default", fake_provider.FakeProvider(canned, latency=0, jitter=0))
+    monkeypatch.setattr(providers, "_instances", {})
+    accuracy, _ = utils.evaluate(toy_items[:1], "{db_schema} {user_question}", "bird", "t", "fake", max_workers=1)
+    (record,) = run_log.iter_records(run_log.results_path("t"))
+    assert accuracy == 100 and record["unrepaired_query"] == "SELECT COUNT(*) FROM emps;"
+    counters = {c["name"]: c["value"] for c in tracer.snapshot(run="t")["counters"]}
+    assert counters["repair_attempts"] == len(record["repair_attempts"]) == 1
@@ -0,0 +1,375 @@
+import argparse
+import contextlib
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+
+
+# Span tags that become histogram/counter labels; everything else (db_id, ...) only goes on exported spans
+LABELS = ("run", "provider", "outcome")
+
+_current = contextvars.ContextVar("trace_span", default=None)
+_context_tags = contextvars.ContextVar("trace_tags", default={})
+
+
+class Histogram:
+    """
+    Log-linear (HDR style) latency histogram: microsecond values keep
+    SUB_BITS bits of precision in buckets, so percentiles are within ~1.5%
+    at any magnitude and histograms merge by adding bucket counts.
+    """
+
+    SUB_BITS = 7
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        micros = max(0, int(seconds * 1e6))
+        shift = max(0, micros.bit_length() - self.SUB_BITS)
+        lower = (micros >> shift) << shift
+        self.buckets[lower] = self.buckets.get(lower, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def merge(self, other):
+        for lower, n in other.buckets.items():
+            self.buckets[lower] = self.buckets.get(lower, 0) + n
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, q):
+        if not self.count:
+            return 0.0
+        target = max(1, int(q * self.count + 0.5))
+        seen = 0
+        for lower in sorted(self.buckets):
+            seen += self.buckets[lower]
+            if seen >= target:
+                width = 1 << max(0, lower.bit_length() - self.SUB_BITS)
+                return min(self.max, (lower + width / 2) / 1e6)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(0.5),
+            "p90": self.percentile(0.9),
+            "p99": self.percentile(0.99),
+            "max": self.max,
+            "buckets": sorted(self.buckets.items()),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls()
+        histogram.buckets = {int(lower): n for lower, n in data["buckets"]}
+        histogram.count, histogram.total, histogram.max = data["count"], data["sum"], data["max"]
+        return histogram
+
+
+class Span:
+    __slots__ = ("name", "tags", "parent", "trace_id", "span_id", "start", "end", "wall_start")
+
+    def __init__(self, name, tags, parent):
+        self.name = name
+        self.tags = tags
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.wall_start = time.time_ns()
+        self.start = time.perf_counter()
+        self.end = None
+
+    def set(self, **tags):
+        self.tags.update(tags)
+
+    @property
+    def duration(self):
+        return (self.end or time.perf_counter()) - self.start
+
+
+class _NoSpan:
+    def set(self, **tags):
+        pass
+
+
+class Tracer:
+    """
+    Aggregates finished spans into one histogram per (stage, labels) and
+    keeps named counters. Raw spans are only kept when keep_spans is set,
+    for the OpenTelemetry file export.
+    """
+
+    def __init__(self, keep_spans=False):
+        self.histograms = {}
+        self.counters = {}
+        self.spans = [] if keep_spans else None
+        self.lock = threading.Lock()
+
+    def record(self, span):
+        key = (span.name,) + tuple(span.tags.get(label, "") for label in LABELS)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.record(span.end - span.start)
+            if self.spans is not None:
+                self.spans.append(span)
+
+    def add(self, name, value, tags):
+        key = (name,) + tuple(sorted(tags.items()))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def snapshot(self, run=None):
+        """JSON-ready stages and counters, optionally only those tagged with one run."""
+        with self.lock:
+            stages = [
+                {"stage": key[0], **dict(zip(LABELS, key[1:])), **h.to_dict()}
+                for key, h in sorted(self.histograms.items())
+                if run is None or key[1 + LABELS.index("run")] == run
+            ]
+            counters = [
+                {"name": key[0], "tags": dict(key[1:]), "value": value}
+                for key, value in sorted(self.counters.items())
+                if run is None or dict(key[1:]).get("run") == run
+            ]
+        return {"stages": stages, "counters": counters}
+
+    def drain_spans(self, run=None):
+        with self.lock:
+            if not self.spans:
+                return []
+            taken = [s for s in self.spans if run is None or s.tags.get("run") == run]
+            self.spans = [s for s in self.spans if not (run is None or s.tags.get("run") == run)]
+        return taken
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def export_paths():
+    """Where finalize_run writes metrics: TRACE_EXPORT, comma separated; "{run}" is the version name."""
+    return [p.strip() for p in os.getenv("TRACE_EXPORT", os.path.join("spider", "metrics_{run}.json")).split(",") if p.strip()]
+
+
+def enabled():
+    return os.getenv("TRACE", "1") != "0"
+
+
+def get_tracer():
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = Tracer(keep_spans=any(p.endswith(".jsonl") for p in export_paths()))
+        return _tracer
+
+
+def current_tags():
+    span = _current.get()
+    return span.tags if span is not None else _context_tags.get()
+
+
+@contextlib.contextmanager
+def tagged(**tags):
+    """Tags (run, provider, ...) added to every span and counter opened inside the block."""
+    token = _context_tags.set({**_context_tags.get(), **tags})
+    try:
+        yield
+    finally:
+        _context_tags.reset(token)
+
+
+@contextlib.contextmanager
+def span(name, **tags):
+    """
+    Times the block as stage `name`. Child spans inherit the tags of the
+    enclosing span; outcome is "ok" unless set on the span or the block raises.
+    """
+    if not enabled():
+        yield _NoSpan()
+        return
+    parent = _current.get()
+    inherited = {k: v for k, v in current_tags().items() if k != "outcome"}
+    s = Span(name, {**inherited, **tags}, parent)
+    token = _current.set(s)
+    try:
+        yield s
+    except BaseException:
+        s.tags["outcome"] = "error"
+        count("exceptions", stage=name)
+        raise
+    finally:
+        _current.reset(token)
+        s.end = time.perf_counter()
+        s.tags.setdefault("outcome", "ok")
+        get_tracer().record(s)
+
+
+def traced(name):
+    """Decorator form of span()."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def count(name, value=1, **tags):
+    """Adds to counter `name`, labelled with the run/provider of the current span plus `tags`."""
+    if not enabled() or not value:
+        return
+    context = current_tags()
+    labels = {k: context[k] for k in ("run", "provider") if k in context}
+    get_tracer().add(name, value, {**labels, **tags})
+
+
+def bind(fn):
+    """fn with the caller's span and tags, for work handed to another thread."""
+    ctx = contextvars.copy_context()
+    return lambda *args, **kwargs: ctx.copy().run(fn, *args, **kwargs)
+
+
+def to_prometheus(snapshot, prefix="nl2sql"):
+    """Prometheus text exposition: stage latencies as summaries, counters as *_total."""
+    def labels(pairs):
+        return "{" + ",".join(f'{k}="{str(v)}"' for k, v in pairs if v != "") + "}"
+
+    lines = [f"# TYPE {prefix}_stage_seconds summary"]
+    for stage in snapshot["stages"]:
+        pairs = [("stage", stage["stage"])] + [(label, stage[label]) for label in LABELS]
+        for q in ("0.5", "0.9", "0.99"):
+            lines.append(f'{prefix}_stage_seconds{labels(pairs + [("quantile", q)])} {stage["p" + q[2:].ljust(2, "0")]}')
+        lines.append(f"{prefix}_stage_seconds_sum{labels(pairs)} {stage['sum']}")
+        lines.append(f"{prefix}_stage_seconds_count{labels(pairs)} {stage['count']}")
+    for name in sorted({c["name"] for c in snapshot["counters"]}):
+        lines.append(f"# TYPE {prefix}_{name}_total counter")
+        for counter in snapshot["counters"]:
+            if counter["name"] == name:
+                lines.append(f"{prefix}_{name}_total{labels(sorted(counter['tags'].items()))} {counter['value']}")
+    return "\n".join(lines) + "\n"
+
+
+def to_otlp(spans, service="nl2sql-eval"):
+    """One OTLP/JSON ExportTraceServiceRequest (the OpenTelemetry file exporter line format)."""
+    def attributes(items):
+        return [{"key": k, "value": {"stringValue": str(v)}} for k, v in items]
+
+    return {"resourceSpans": [{
+        "resource": {"attributes": attributes([("service.name", service)])},
+        "scopeSpans": [{"scope": {"name": "tracing"}, "spans": [{
+            "traceId": s.trace_id,
+            "spanId": s.span_id,
+            "parentSpanId": s.parent.span_id if s.parent else "",
+            "name": s.name,
+            "kind": 1,
+            "startTimeUnixNano": str(s.wall_start),
+            "endTimeUnixNano": str(s.wall_start + int((s.end - s.start) * 1e9)),
+            "attributes": attributes(s.tags.items()),
+            "status": {"code": 2 if s.tags.get("outcome") == "error" else 1},
+        } for s in spans]}],
+    }]}
+
+
+def export(path, run=None):
+    """Writes metrics to path: .prom -> Prometheus text, .jsonl -> OTLP spans (appended), else JSON."""
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    tracer = get_tracer()
+    if path.endswith(".jsonl"):
+        spans = tracer.drain_spans(run)
+        if spans:
+            with open(path, "a") as f:
+                f.write(json.dumps(to_otlp(spans)) + "\n")
+        return
+    snapshot = tracer.snapshot(run)
+    with open(path, "w") as f:
+        if path.endswith(".prom"):
+            f.write(to_prometheus(snapshot))
+        else:
+            json.dump(snapshot, f, indent=2)
+
+
+def breakdown(snapshot, root="example"):
+    """
+    Lines of a per-stage table (all outcomes merged): calls, total seconds,
+    share of the root span's total, p50/p99. Stages nest, so shares overlap.
+    """
+    merged = {}
+    for stage in snapshot["stages"]:
+        merged.setdefault(stage["stage"], Histogram()).merge(Histogram.from_dict(stage))
+    root_total = merged[root].total if root in merged else sum(h.total for h in merged.values())
+    lines = [f"{'Stage':<18} {'calls':>6} {'total s':>9} {'share':>6} {'p50 ms':>9} {'p99 ms':>9}"]
+    for name, h in sorted(merged.items(), key=lambda item: -item[1].total):
+        share = 100 * h.total / root_total if root_total else 0.0
+        lines.append(f"{name:<18} {h.count:>6} {h.total:>9.2f} {share:>5.1f}% "
+                     f"{1000 * h.percentile(0.5):>9.1f} {1000 * h.percentile(0.99):>9.1f}")
+    return lines
+
+
+@contextlib.contextmanager
+def profile(path):
+    """
+    Profiles the block with pyinstrument if installed (path.html), else
+    cProfile (path.prof), and prints the hottest calls. Only the calling
+    thread is profiled.
+    """
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        Profiler = None
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    if Profiler is not None:
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            with open(path + ".html", "w") as f:
+                f.write(profiler.output_html())
+            print(profiler.output_text(unicode=True, color=False))
+        return
+
+    import cProfile
+    import pstats
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path + ".prof")
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-stage breakdown of a metrics JSON written by an evaluation run.")
+    parser.add_argument("metrics", help="e.g. spider/metrics_gemini_bird_fewshot.json")
+    parser.add_argument("--prom", help="also convert it to Prometheus text at this path")
+    args = parser.parse_args()
+
+    with open(args.metrics, "r") as f:
+        snapshot = json.load(f)
+    print("\n".join(breakdown(snapshot)))
+    for counter in snapshot["counters"]:
+        print(f"{counter['name']:<24} {counter['value']:>10} {counter['tags']}")
+    if args.prom:
+        with open(args.prom, "w") as f:
+            f.write(to_prometheus(snapshot))
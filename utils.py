@@ -1,13 +1,58 @@
-import sqlite3
-import google.generativeai as genai
+import argparse
+import threading
 import time
 import re
-import math
 import os
-import json
-from dotenv import load_dotenv
-from groq import Groq
-
+from eval_engine import GenerationFailed, call_with_limits, run_concurrent, print_lock
+import llm_cache
+import providers
+import schema_catalog
+import schema_pruning
+import sql_executor
+import gold_store
+import query_timing
+import result_compare
+import run_log
+import batch_prompting
+import sql_sandbox
+import self_consistency
+import sql_repair
+import sql_validator
+import prompt_templates
+import sql_stream
+import prompts
+import tracing
+from concurrent.futures import ThreadPoolExecutor
+from schema_catalog import db_path_for
+
+# The names entry scripts and other modules use; provider SDKs (google.generativeai,
+# groq, llama_cpp) and ML libraries are imported only when their backend is created.
+__all__ = [
+    "init_provider",
+    "preprocessing",
+    "run_options",
+    "db_path_for",
+    "get_schema",
+    "schema_for_item",
+    "format_prompt",
+    "generate_sql",
+    "complete",
+    "GenerationFailed",
+    "complete_samples",
+    "extract_sql",
+    "extract_sql_batch",
+    "execute_query",
+    "gold_result",
+    "compute_ves",
+    "evaluate_example",
+    "run_and_log",
+    "finalize_run",
+    "evaluate",
+    "evaluate_batched",
+    "fewshot_examples",
+    "evaluate_dynamic_fewshot",
+    "evaluate_dynamic_fewshot_sweep",
+]
 
 
 #Only Gemini (Dont remove this)
@@ -19,40 +64,48 @@ from groq import Groq
 #     return data_set
 
 
-def preprocessing():
-    load_dotenv()
+def init_provider(provider, **config):
+    """Creates the backend for the chosen provider (see providers.PROVIDERS)."""
+    return providers.get_provider(provider, **config)
 
-    provider = input("Choose model (gemini/groq): ").strip().lower()
-    data_set  = input("Enter dataset to start (spider/bird): ").strip()
 
-    if provider == "gemini":
-        API_KEY = os.getenv("GOOGLE_API_KEY")
-        genai.configure(api_key=API_KEY)
+def _entry_parser():
+    # Flags shared by the entry scripts (simple_prompt2.py, Fewshot.py, Dynamic_fewshot.py, ...)
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--provider")
+    parser.add_argument("--data_set")
+    parser.add_argument("--resume", action="store_true", help="skip examples already in the run log")
+    parser.add_argument("--top_k", type=int, default=1, help="few-shot examples per question (dynamic few-shot)")
+    parser.add_argument("--knowledge_path", help="retrieve few-shot examples online from this pool (dynamic few-shot)")
+    parser.add_argument("--same_db", action="store_true", help="only retrieve examples of the question's db_id")
+    parser.add_argument("--mmr_lambda", type=float, help="MMR re-ranking of retrieved examples, in (0, 1]")
+    return parser
 
-    elif provider == "groq":
-        global groq_client
-        groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
 
-    else:
-        raise ValueError("Invalid provider. Choose either 'gemini' or 'groq'.")
+def run_options(argv=None):
+    """--resume / --top_k / retrieval flags (and --provider / --data_set) of an entry script's command line."""
+    args, _ = _entry_parser().parse_known_args(argv)
+    return args
+
+
+def preprocessing(argv=None):
+    """Provider and dataset from --provider / --data_set, asking interactively only for what's missing."""
+    args = run_options(argv)
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+    provider = args.provider or input(f"Choose model ({'/'.join(providers.PROVIDERS)}): ").strip().lower()
+    data_set  = args.data_set or input("Enter dataset to start (spider/bird): ").strip()
+
+    init_provider(provider)
 
     return provider, data_set
 
 
 def execute_query(db_path, query):
     """Executes a query and returns (sorted results, exec_time) or (None, None) on error."""
-    try:
-        start = time.time()
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute(query)
-        results = cursor.fetchall()
-
-        conn.close()
-        exec_time = time.time() - start
-        return sorted(results), exec_time
-    except Exception:
-        return None, None
+    return _sorted_result(sql_executor.run_query(db_path, query))
 
 # def generate_sql(schema, prompt, question, topk=None):
 #     """
@@ -79,141 +132,498 @@ def execute_query(db_path, query):
 
 def generate_sql(schema, prompt, question, topk=None, provider="gemini"):
     """
-    Generates a SQL query using Gemini or Groq depending on provider.
+    Generates a SQL query with the given provider backend (gemini, groq, local, ...).
+    Calls go through the per-provider rate limiter; 429s are retried.
+    Responses are served from / stored in the on-disk LLM cache when enabled.
     """
-    if topk:
-        final_prompt = prompt.format(db_schema=schema, user_question=question, top_k=topk)
-    else:
-        final_prompt = prompt.format(db_schema=schema, user_question=question)
+    return complete(format_prompt(schema, prompt, question, topk), provider)
 
-    # === GEMINI ===
-    if provider == "gemini":
-        try:
-            model = genai.GenerativeModel("gemini-2.5-flash")
-            response = model.generate_content(final_prompt)
-            cleaned = response.text.strip().replace("```sql", "").replace("```", "")
-            return cleaned
-        except Exception as e:
-            print("Gemini Error:", e)
-            return ""
 
-    # === GROQ ===
-    elif provider == "groq":
-        try:
-            response = groq_client.chat.completions.create(
-                model="llama-3.1-8b-instant",
-                messages=[{"role": "user", "content": final_prompt}]
-            )
-            cleaned = response.choices[0].message.content.strip().replace("```sql", "").replace("```", "")
-            return cleaned
-        except Exception as e:
-            print("Groq Error:", e)
+def format_prompt(schema, prompt, question, topk=None):
+    """
+    Renders a strategy template. Templates are compiled once (indentation
+    stripped) and few-shot examples use a compact canonical layout;
+    PROMPT_RAW=1 reproduces the original prompts, e.g. to replay old caches.
+    """
+    if os.getenv("PROMPT_RAW") == "1":
+        if topk is not None:
+            return prompt.format(db_schema=schema, user_question=question, top_k=topk)
+        return prompt.format(db_schema=schema, user_question=question)
+    template = prompt_templates.compile_template(prompt)
+    examples = prompt_templates.render_examples(topk) if topk is not None else None
+    return template.render(db_schema=schema, user_question=question, top_k=examples)
+
+
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+def complete(final_prompt, provider="gemini", usage=None, timings=None):
+    """
+    Sends an already rendered prompt to the provider (cache, rate limits,
+    retries). Identical prompts requested concurrently, e.g. by two
+    strategies of an experiment matrix, share a single API call; the callers
+    that waited count it as a cached response and see its exception if it
+    failed. Token usage is added to `usage` (a prompt_templates.TokenUsage) if given.
+    With LLM_STREAM=1, streaming backends are cut off right after the SQL;
+    time_to_sql / stream_cancelled then go into the `timings` dict.
+    """
+    backend = providers.get_provider(provider)
+    key = (provider, backend.model_name, final_prompt)
+    with _inflight_lock:
+        waiter = _inflight.get(key)
+        if waiter is None:
+            _inflight[key] = waiter = {"event": threading.Event(), "response": "", "error": None}
+            owner = True
+        else:
+            owner = False
+    if not owner:
+        waiter["event"].wait()
+        if waiter["error"] is not None:
+            raise waiter["error"]
+        if usage is not None:
+            usage.add_cached()
+        tracing.count("inflight_shared")
+        return waiter["response"]
+
+    try:
+        waiter["response"] = _complete(final_prompt, provider, backend, usage, timings)
+        return waiter["response"]
+    except Exception as e:
+        waiter["error"] = e
+        raise
+    finally:
+        with _inflight_lock:
+            del _inflight[key]
+        waiter["event"].set()
+
+
+def _stream_sql(backend, final_prompt, timings=None):
+    """Streams the completion and cancels it right after the SQL statement's ";"."""
+    parser = sql_stream.SqlStreamParser()
+    start = time.perf_counter()
+    done_at = []
+
+    def on_chunk(chunk):
+        if parser.feed(chunk):
+            done_at.append(time.perf_counter())
+            return True
+        return False
+
+    text, cancelled = backend.generate_until(final_prompt, on_chunk)
+    if timings is not None:
+        timings["time_to_sql"] = (done_at[0] if done_at else time.perf_counter()) - start
+        timings["stream_cancelled"] = cancelled
+    return text
+
+
+def _complete(final_prompt, provider, backend, usage=None, timings=None):
+    model_name = backend.model_name
+    cache = llm_cache.get_cache()
+    if cache is not None:
+        cached = cache.get(provider, model_name, final_prompt)
+        if cached is not None:
+            if usage is not None:
+                usage.add_cached()
+            tracing.count("llm_cache_hits")
+            return cached
+        if cache.replay:
+            print("  - Cache miss in replay mode, skipping API call")
             return ""
 
+    if os.getenv("LLM_STREAM") == "1" and backend.supports_stream:
+        response = call_with_limits(lambda: _stream_sql(backend, final_prompt, timings), provider, final_prompt)
+    else:
+        response = call_with_limits(lambda: backend.generate(final_prompt), provider, final_prompt)
+    if not response and backend.last_error() is not None:
+        raise GenerationFailed(f"{provider} error: {backend.last_error()}")
+    if usage is not None:
+        usage.add_response(final_prompt, response, backend.last_usage())
+    if cache is not None:
+        cache.put(provider, model_name, final_prompt, response)
+    return response
+
+
+def complete_samples(final_prompt, provider, temperature, start, count, usage=None):
+    """
+    Sampled completions number start .. start+count-1 of a prompt at
+    `temperature`. Each sample is cached under its own number. Backends that
+    take an n parameter get one request for all of them, others one request
+    per sample, sent concurrently.
+    """
+    backend = providers.get_provider(provider)
+    models = [f"{backend.model_name}@t{temperature}#{start + j}" for j in range(count)]
+    outputs = [None] * count
+    cache = llm_cache.get_cache()
+    if cache is not None:
+        outputs = [cache.get(provider, model, final_prompt) for model in models]
+        if cache.replay:
+            return [o or "" for o in outputs]
+
+    missing = [j for j, o in enumerate(outputs) if o is None]
+    if usage is not None and count > len(missing):
+        usage.add_cached(count - len(missing))
+    if not missing:
+        return outputs
+
+    def request(n):
+        # Runs in the calling thread, where the backend keeps the usage of its last call
+        texts = call_with_limits(lambda: backend.sample(final_prompt, temperature, n), provider, final_prompt)
+        if not any(texts) and backend.last_error() is not None:
+            raise GenerationFailed(f"{provider} error: {backend.last_error()}")
+        texts = texts or [""] * n
+        if usage is not None:
+            usage.add_response(final_prompt, texts, backend.last_usage())
+        return texts
+
+    if backend.supports_n:
+        fresh = request(len(missing))
+    else:
+        with ThreadPoolExecutor(max_workers=len(missing)) as pool:
+            fresh = [texts[0] for texts in pool.map(tracing.bind(lambda _: request(1)), missing)]
+    for j, text in zip(missing, fresh):
+        outputs[j] = text
+        if cache is not None:
+            cache.put(provider, models[j], final_prompt, text)
+    return outputs
+
 
 def compute_ves(exec_results):
-    num_queries = len(exec_results)
-    if num_queries == 0:
-        return 0
-    total_ratio = 0
-    for result in exec_results:
-        ratio = result.get("time_ratio", 0)
-        total_ratio += math.sqrt(ratio) * 100 if ratio != 0 else 0
-    return total_ratio / num_queries
-
-def get_schema(path):
-    conn = sqlite3.connect(path)
-    cursor = conn.cursor()
-    cursor.execute("SELECT sql FROM sqlite_master WHERE type='table';")
-    schema = "\n".join([row[0] for row in cursor.fetchall()])
-    conn.close()
-    return schema
-
-def evaluate(data_to_evaluate, good_prompt, data_set, version_name, provider):
-    correct = 0
-    total_len = len(data_to_evaluate)
-    print(f"--- Starting Execution Accuracy evaluation on {total_len} examples ---")
-    data=[]
-    for i, item in enumerate(data_to_evaluate):
-        db_id = item["db_id"]
-        question = item["question"]
-        orig_query = item["query"] if data_set == "spider" else item["SQL"]
-
-
-        # This is the correct path to the DATABASE file
-
-        path = os.path.join("spider", "database", db_id, f"{db_id}.sqlite") if data_set=="spider" else os.path.join("data","bird","dev_databases", db_id, f"{db_id}.sqlite")
-        d = {}
-        d["id"] = db_id
-        d["question"] = question
-        d["original_query"] = orig_query
-
-
-        schema = get_schema(path)
-        # print(schema)
-        # pred_query = generate_sql(schema, good_prompt, question)
-        # d["llm_output"] = pred_query
-        # match =  re.search(r"-- SQL Query\s*(SELECT[\s\S]*?;)", pred_query, re.IGNORECASE)
-        # pred_query = match.group(0).strip() if match else None
-        # d["pred_query"] = pred_query
-
-        pred_query_raw = generate_sql(schema, good_prompt, question, topk=None, provider=provider)
-        d["llm_output"] = pred_query_raw
-        pred_query = extract_sql(pred_query_raw)
-        d["pred_query"] = pred_query
+    return query_timing.ves_score([result.get("time_ratio", 0) for result in exec_results])
 
-        pred_result, pred_time = execute_query(path, pred_query)
-        orig_result, orig_time = execute_query(path, orig_query)
+def get_schema(path, fmt=None):
+    """
+    Schema text for the database at `path`, served from the schema catalog
+    (introspected once per file version). fmt is "ddl" (raw CREATE TABLE,
+    default) or "compact"; the SCHEMA_FORMAT env var sets the default.
+    """
+    catalog = schema_catalog.get_catalog(path)
+    return schema_catalog.serialize(catalog, fmt or os.getenv("SCHEMA_FORMAT", "ddl"))
+
+def schema_for_item(path, item):
+    """
+    Schema text for one example. When SCHEMA_TOKEN_BUDGET is set, the schema is
+    pruned to the tables relevant to the question and BIRD evidence.
+    """
+    budget = os.getenv("SCHEMA_TOKEN_BUDGET")
+    if not budget:
+        return get_schema(path)
+    return schema_pruning.prune_schema(
+        schema_catalog.get_catalog(path),
+        item["question"],
+        item.get("evidence", ""),
+        token_budget=int(budget),
+        fmt=os.getenv("SCHEMA_FORMAT", "ddl"),
+        use_embeddings=os.getenv("SCHEMA_PRUNE_EMBEDDINGS") == "1",
+    )
+
+
+def _sorted_result(outcome):
+    if not outcome.ok:
+        return None, None
+    return sorted(outcome.rows, key=result_compare.sort_key), outcome.exec_time
 
 
-        if pred_time and orig_time and pred_time > 0:
-            time_ratio = orig_time / pred_time
+def gold_result(path, orig_query, data_set):
+    """
+    Gold (digest, rows or None, exec_time, timing samples or None, error or None)
+    from the prebuilt gold store, executing the gold SQL only on a miss, under
+    the gold limits. A failing gold query has no digest and carries its error.
+    """
+    store = gold_store.get_gold_store(data_set)
+    if store is not None:
+        gold = store.get(path, orig_query)
+        if gold is not None and gold["digest"] is not None:
+            return gold["digest"], gold["rows"], gold["median_time"], gold["times"] or None, None
+        if gold is not None:
+            return None, None, None, None, gold["status"]
+    outcome, digest = result_compare.digest_gold(path, orig_query)
+    return digest, None, outcome.exec_time, None, None if outcome.ok else f"{outcome.status}: {outcome.error}"
+
+
+def evaluate_example(i, item, good_prompt, data_set, provider, topk=None, schema=None, llm_output=None, samples=1,
+                     usage=None):
+    """
+    Generates, executes and scores a single example. Returns the per-example dict.
+    A precomputed llm_output (e.g. from a batched request) skips generation;
+    `usage` then carries the example's share of that request's tokens.
+    samples > 1 votes among up to that many sampled candidates (self-consistency).
+    """
+    db_id = item["db_id"]
+    path = db_path_for(db_id, data_set)
+
+    # Every stage below is a tracing span under this example's root span
+    with tracing.tagged(provider=provider):
+        with tracing.span("example", db_id=db_id) as root:
+            try:
+                d = _evaluate_example(i, item, good_prompt, data_set, provider, topk, schema, llm_output, samples, path,
+                                      usage or prompt_templates.TokenUsage())
+            except GenerationFailed as e:
+                d = _generation_failed(i, item, data_set, e)
+            root.set(outcome="correct" if d["check"] else ("incorrect" if d["pred_status"] == sql_executor.OK else "error"))
+        tracing.count("prompt_tokens", d["prompt_tokens"])
+        tracing.count("completion_tokens", d["completion_tokens"])
+        tracing.count("api_requests", d["api_requests"])
+        tracing.count("cached_responses", d["cached_responses"])
+        if d["pred_status"] != sql_executor.OK:
+            tracing.count("pred_errors", status=d["pred_status"])
+        tracing.count("repair_attempts", len(d.get("repair_attempts", [])))
+    return d
+
+
+def _generation_failed(i, item, data_set, error):
+    """Record of an example the model never answered; the run log keeps it, --resume generates it again."""
+    with print_lock:
+        print(f"\n--- Processing Example {i+1} ---")
+        print(f"Question: {item['question']}")
+        print(f"  - Result: ❌ Generation failed ({error})")
+    return {
+        "id": item["db_id"],
+        "question": item["question"],
+        "original_query": item["query"] if data_set == "spider" else item["SQL"],
+        "pred_query": None,
+        "pred_status": run_log.FAILED,
+        "pred_error": str(error),
+        "check": False,
+        "time_ratio": 0,
+        **prompt_templates.TokenUsage().to_dict(),
+    }
+
+
+def _evaluate_example(i, item, good_prompt, data_set, provider, topk, schema, llm_output, samples, path, usage):
+    db_id = item["db_id"]
+    question = item["question"]
+    orig_query = item["query"] if data_set == "spider" else item["SQL"]
+
+    d = {}
+    d["id"] = db_id
+    d["question"] = question
+    d["original_query"] = orig_query
+
+    pred_outcome = None
+    timings = {}
+    start = time.perf_counter()
+    if llm_output is not None:
+        pred_query_raw = llm_output
+        d["batched"] = True
+    else:
+        if schema is None:
+            with tracing.span("schema"):
+                schema = schema_for_item(path, item)
+        with tracing.span("format_prompt"):
+            final_prompt = format_prompt(schema, good_prompt, question, topk)
+        if samples > 1:
+            temperature = self_consistency.sampling_temperature()
+            sample = lambda first, count: [
+                (output, extract_sql(output))
+                for output in complete_samples(final_prompt, provider, temperature, first, count, usage)
+            ]
+            with tracing.span("generate_vote"):
+                voted = self_consistency.vote(sample, path, samples)
+            pred_query_raw, pred_outcome, pred_digest = voted["output"], voted["outcome"], voted["digest"]
+            d["samples"] = voted["samples"]
+            d["clusters"] = voted["clusters"]
+            d["requests"] = voted["waves"] if providers.get_provider(provider).supports_n else voted["samples"]
         else:
-            time_ratio = 0
+            with tracing.span("generate"):
+                pred_query_raw = complete(final_prompt, provider, usage, timings)
+            d["requests"] = 1
+    d["generation_time"] = time.perf_counter() - start
+    d["time_to_sql"] = timings.get("time_to_sql", d["generation_time"])
+    if "stream_cancelled" in timings:
+        d["stream_cancelled"] = timings["stream_cancelled"]
+    d["llm_output"] = pred_query_raw
+    with tracing.span("extract_sql"):
+        pred_query = extract_sql(pred_query_raw)
+    d["pred_query"] = pred_query
+
+    # Rows are streamed into order-insensitive (or, for ORDER BY gold SQL, ordered) hashes.
+    # With SQL_SANDBOX_WORKERS set, model SQL (execution, match verification, VES timing) runs in a separate,
+    # killable process.
+    # Voted candidates were already executed.
+    if pred_outcome is None:
+        # With SQL_VALIDATE=1, garbage (no SQL, writes, SQL SQLite can't compile) is rejected before execution.
+        # Off by default so accuracy stays comparable with earlier runs
+        with tracing.span("validate"):
+            validation = sql_validator.validate(path, pred_query) if os.getenv("SQL_VALIDATE", "0") == "1" else None
+        if validation is not None:
+            d["validation"] = validation.to_dict()
+        if validation is not None and not validation.ok:
+            pred_outcome, pred_digest = sql_executor.ExecutionResult(sql_executor.ERROR, error=validation.error), None
+        else:
+            with tracing.span("execute_pred") as s:
+                pred_outcome, pred_digest = sql_sandbox.digest_query(path, pred_query)
+                s.set(outcome=pred_outcome.status)
+
+    # With SQL_REPAIR_ATTEMPTS set, failed queries get schema fixes, then LLM retries with the error
+    max_repairs = int(os.getenv("SQL_REPAIR_ATTEMPTS", "0"))
+    if max_repairs > 0 and pred_outcome.status == sql_executor.ERROR:
+        start = time.perf_counter()
+        if schema is None:
+            schema = schema_for_item(path, item)
+        llm_fix = lambda sql, error: extract_sql(complete(
+            prompts.REPAIR_PROMPT.format(db_schema=schema, user_question=question, sql=sql, error=error),
+            provider, usage,
+        ))
+        with tracing.span("repair") as s:
+            fixed, outcome, digest, attempts = sql_repair.repair(path, pred_query, pred_outcome.error, llm_fix, max_repairs)
+            skipped = bool(attempts) and attempts[-1].get("skipped", False)
+            s.set(outcome="ok" if fixed is not None else "skipped" if skipped else "failed")
+        d["repair_attempts"] = attempts
+        if skipped:
+            # The model stopped answering mid-repair: the original prediction stands
+            d["repair_skipped"] = attempts[-1]["error"]
+        d["repair_time"] = time.perf_counter() - start
+        if fixed is not None:
+            d["unrepaired_query"] = pred_query
+            pred_query, pred_outcome, pred_digest = fixed, outcome, digest
+            d["pred_query"] = pred_query
+    d["pred_status"] = pred_outcome.status
+    d["pred_error"] = pred_outcome.error
+    pred_time = pred_outcome.exec_time
+    with tracing.span("execute_gold"):
+        orig_digest, orig_rows, orig_time, orig_times, gold_error = gold_result(path, orig_query, data_set)
+    if gold_error is not None:
+        # Not the prediction's fault: reported apart from wrong predictions (still counted as incorrect)
+        d["gold_error"] = gold_error
+
+    # Compare the RESULTS, not the cursor objects
+    with tracing.span("compare"):
+        d["check"] = orig_digest is not None and sql_sandbox.compare(
+            path, orig_query, pred_query, orig_digest, pred_digest,
+            ordered=result_compare.has_order_by(orig_query), gold_rows=orig_rows,
+        )
+
+    # VES only rewards correct queries, so only those go through the timing harness
+    time_ratio = 0
+    if d["check"]:
+        with tracing.span("ves_timing"):
+            time_ratio, ci, orig_stats, pred_stats = query_timing.time_ratio(
+                path, orig_query, pred_query, gold_samples=orig_times,
+                repetitions=int(os.getenv("VES_REPETITIONS", query_timing.DEFAULT_REPETITIONS)),
+                isolated=os.getenv("VES_ISOLATED") == "1",
+                runner=sql_sandbox.timing_runner(),
+            )
+        pred_time, orig_time = pred_stats.median, orig_stats.median
+        d["time_ratio_ci"] = list(ci)
 
-        # Store per-example info
-        d["pred_time"] = pred_time
-        d["orig_time"] = orig_time
-        d["time_ratio"] = time_ratio
+    # Store per-example info
+    d.update(usage.to_dict())
+    d["pred_time"] = pred_time
+    d["orig_time"] = orig_time
+    d["time_ratio"] = time_ratio
 
-        print(f"\n--- Processing Example {i+1}/{total_len} ---")
+    with print_lock:
+        print(f"\n--- Processing Example {i+1} ---")
         print(f"Question: {question}")
         print(f"  - Generated SQL: {pred_query}")
-
-        # Compare the RESULTS, not the cursor objects
-        if pred_result is not None and pred_result == orig_result:
-            correct += 1
-            d["check"] = True
+        if d["check"]:
             print("  - Result: ✅ Correct (Execution Match)")
+        elif gold_error is not None:
+            print(f"  - Result: ⚠️ Gold query failed ({gold_error})")
+        elif pred_outcome.status != sql_executor.OK:
+            print(f"  - Result: ❌ Incorrect ({pred_outcome.status}: {pred_outcome.error})")
         else:
-            d["check"] = False
             print("  - Result: ❌ Incorrect (Execution Mismatch or Error)")
-        data.append(d)
-        accuracy = (correct / (i + 1)) * 100 if total_len > 0 else 0
-        print(f"Accuracy = {accuracy}")
-        time.sleep(10)
+    return d
 
-    file_path_data=os.path.join("spider",f"results_{version_name}.json")
-    with open(file_path_data,'w') as f:
-        json.dump(data,f,indent=4)
-         # Respect API rate limits
 
+def finalize_run(log_path, version_name, elapsed=None):
+    """
+    Computes accuracy and VES by streaming the JSONL run log, writes the
+    per-example json and the summary txt, returns (accuracy, ves).
+    elapsed (seconds of this run) turns token totals into tokens per minute.
+    """
+    file_path_data=os.path.join("spider",f"results_{version_name}.json")
+    run_log.export_json(log_path, file_path_data)
 
-    accuracy = (correct / (i + 1)) * 100 if total_len > 0 else 0
-    ves = compute_ves(data)
+    total_len, accuracy, ratios = run_log.summarize(log_path)
+    ves = query_timing.ves_score(ratios)
+    ves_low, ves_high = query_timing.ves_confidence_interval(ratios)
     print("\n--- Evaluation Complete ---")
-    print(f"Execution Accuracy on {i + 1} examples is: {accuracy:.2f}%")
-    print(f"Valid Efficiency Score (VES): {ves:.2f}")
+    print(f"Execution Accuracy on {total_len} examples is: {accuracy:.2f}%")
+    print(f"Valid Efficiency Score (VES): {ves:.2f} (95% CI {ves_low:.2f}-{ves_high:.2f})")
+    failed = sum(1 for r in run_log.iter_records(log_path) if r.get("pred_status") == run_log.FAILED)
+    if failed:
+        print(f"{failed} examples got no answer from the model (counted as incorrect); --resume retries them")
+    gold_failed = sum(1 for r in run_log.iter_records(log_path) if r.get("gold_error"))
+    if gold_failed:
+        print(f"{gold_failed} examples have a failing gold query (counted as incorrect, not a prediction error)")
+    prompt_tokens, completion_tokens = prompt_templates.token_totals(run_log.iter_records(log_path))
+    rate = f" (~{60 * (prompt_tokens + completion_tokens) / elapsed:.0f} tokens/min)" if elapsed else ""
+    print(f"Tokens: {prompt_tokens} prompt, {completion_tokens} completion{rate}")
+    latencies = sorted(r["time_to_sql"] for r in run_log.iter_records(log_path) if "time_to_sql" in r)
+    if latencies:
+        print(f"Time to SQL: p50 {query_timing.percentile(latencies, 0.5):.2f}s, "
+              f"p95 {query_timing.percentile(latencies, 0.95):.2f}s")
 
     summary_path = f"{version_name}.txt"
     with open(summary_path, "w") as f:
         f.write(f"Execution Accuracy: {accuracy:.2f}%\n")
         f.write(f"Valid Efficiency Score (VES): {ves:.2f}\n")
+        f.write(f"VES 95% CI: {ves_low:.2f}-{ves_high:.2f}\n")
+        f.write(f"Prompt tokens: {prompt_tokens}\n")
+        f.write(f"Completion tokens: {completion_tokens}\n")
+
+    # Where the run's time went, per stage (TRACE_EXPORT picks the metric files)
+    snapshot = tracing.get_tracer().snapshot(run=version_name)
+    if snapshot["stages"]:
+        print("\n".join(tracing.breakdown(snapshot)))
+        for path in tracing.export_paths():
+            tracing.export(path.format(run=version_name), run=version_name)
 
     print(f"Results saved as {summary_path}")
+    cache = llm_cache.get_cache()
+    if cache is not None:
+        cache.evict()
+        print(f"LLM cache: {cache.stats()}")
     return accuracy, ves
 
 
+def run_and_log(data_to_evaluate, example_fn, version_name, max_workers=4, resume=False):
+    """
+    Runs example_fn(i, item) over the data, appending each finished record to
+    the run's JSONL log as it completes. With resume, examples already in the
+    log for this version_name are skipped.
+    """
+    log_path = run_log.results_path(version_name)
+    done = run_log.completed_keys(log_path, version_name) if resume else set()
+    todo = [
+        (i, item) for i, item in enumerate(data_to_evaluate)
+        if run_log.record_key(item["db_id"], item["question"], version_name) not in done
+    ]
+    print(f"--- Starting Execution Accuracy evaluation on {len(data_to_evaluate)} examples ---")
+    if done:
+        print(f"Resuming: {len(data_to_evaluate) - len(todo)} examples already in {log_path}")
+
+    # PROFILE_EXAMPLE=<index> profiles that one example (pyinstrument or cProfile)
+    profile_index = os.getenv("PROFILE_EXAMPLE")
+    start = time.perf_counter()
+    with run_log.RunWriter(log_path, truncate=not resume) as writer:
+        def work(_, pair):
+            i, item = pair
+            with tracing.tagged(run=version_name):
+                if profile_index is not None and int(profile_index) == i:
+                    with tracing.profile(os.path.join("spider", f"profile_{version_name}_{i}")):
+                        d = example_fn(i, item)
+                else:
+                    d = example_fn(i, item)
+            d["version_name"] = version_name
+            writer.write(d)
+
+        # Rate limits are enforced per provider inside generate_sql, no fixed sleep needed
+        run_concurrent(todo, work, max_workers=max_workers)
+    return finalize_run(log_path, version_name, time.perf_counter() - start)
+
+
+def evaluate(data_to_evaluate, good_prompt, data_set, version_name, provider, max_workers=4, resume=False, samples=1):
+    return run_and_log(
+        data_to_evaluate,
+        lambda i, item: evaluate_example(i, item, good_prompt, data_set, provider, samples=samples),
+        version_name, max_workers, resume,
+    )
+
+
 def extract_sql(output_text):
     # 1) Split so explanation part is removed
     parts = re.split(r"--\s*SQL\s*Query", output_text, flags=re.IGNORECASE)
@@ -229,81 +639,104 @@ def extract_sql(output_text):
     return match.group(1).strip() if match else None
 
 
-def evaluate_dynamic_fewshot(data_to_evaluate, good_prompt, top_k, data_set, version_name, provider):
-    correct = 0
-    total_len = len(data_to_evaluate)
-    print(f"--- Starting Execution Accuracy evaluation on {total_len} examples ---")
-    data=[]
-    for i, item in enumerate(data_to_evaluate):
-        db_id = item["db_id"]
-        question = item["question"]
-        orig_query = item["query"] if data_set == "spider" else item["SQL"]
-        topk = item["top_5"][:top_k]
-
-
-        path = os.path.join("spider", "database", db_id, f"{db_id}.sqlite") if data_set=="spider" else os.path.join("data","bird","dev_databases", db_id, f"{db_id}.sqlite")
-
-        d = {}
-        d["id"] = db_id
-        d["question"] = question
-        d["original_query"] = orig_query
-
-        # This is the correct path to the DATABASE file
-        schema = get_schema(path)
-        # print(schema)
-        pred_query_raw = generate_sql(schema, good_prompt, question, topk, provider)
-        d["llm_output"] = pred_query_raw
-        pred_query = extract_sql(pred_query_raw)
-        d["pred_query"] = pred_query
-
-        pred_result, pred_time = execute_query(path, pred_query)
-        orig_result, orig_time = execute_query(path, orig_query)
-
-
-        if pred_time and orig_time and pred_time > 0:
-            time_ratio = orig_time / pred_time
-        else:
-            time_ratio = 0
-
-        # Store per-example info
-        d["pred_time"] = pred_time
-        d["orig_time"] = orig_time
-        d["time_ratio"] = time_ratio
-
-        print(f"\n--- Processing Example {i+1}/{total_len} ---")
-        print(f"Question: {question}")
-        print(f"  - Generated SQL: {pred_query}")
-
-        # Compare the RESULTS, not the cursor objects
-        if pred_result is not None and pred_result == orig_result:
-            correct += 1
-            d["check"] = True
-            print("  - Result: ✅ Correct (Execution Match)")
-        else:
-            d["check"] = False
-            print("  - Result: ❌ Incorrect (Execution Mismatch or Error)")
-        data.append(d)
-        accuracy = (correct / (i + 1)) * 100 if total_len > 0 else 0
-        print(f"Accuracy = {accuracy}")
-        # if i == 5:
-        time.sleep(10)
-
-    file_path_data=os.path.join("spider",f"results_{version_name}.json")
-    with open(file_path_data,'w') as f:
-        json.dump(data,f,indent=4)
-         # Respect API rate limits
+def fewshot_examples(data_to_evaluate, top_k, data_set, knowledge_path=None, same_db=False, mmr_lambda=None):
+    """
+    Few-shot examples per item. Items that already carry a precomputed
+    "top_5" use it (unless a knowledge_path is given); otherwise examples are
+    retrieved online from the knowledge pool in one batched pass.
+    """
+    if knowledge_path is None and not same_db and not mmr_lambda and all("top_5" in item for item in data_to_evaluate):
+        return [item["top_5"][:top_k] for item in data_to_evaluate]
 
+    import retrieval
+    retriever = retrieval.get_retriever(knowledge_path or retrieval.DEFAULT_KNOWLEDGE[data_set])
+    return retriever.retrieve(
+        [item["question"] for item in data_to_evaluate],
+        k=top_k,
+        db_ids=[item["db_id"] for item in data_to_evaluate] if same_db else None,
+        mmr_lambda=mmr_lambda,
+    )
 
-    accuracy = (correct / (i + 1)) * 100 if total_len > 0 else 0
-    ves = compute_ves(data)
-    print("\n--- Evaluation Complete ---")
-    print(f"Execution Accuracy on {i + 1} examples is: {accuracy:.2f}%")
-    print(f"Valid Efficiency Score (VES): {ves:.2f}")
 
-    summary_path = f"{version_name}.txt"
-    with open(summary_path, "w") as f:
-        f.write(f"Execution Accuracy: {accuracy:.2f}%\n")
-        f.write(f"Valid Efficiency Score (VES): {ves:.2f}\n")
-
-    print(f"Results saved as {summary_path}")
-    return accuracy, ves
\ No newline at end of file
+def extract_sql_batch(output_text, n):
+    """
+    Splits a batched answer on its "-- Question <k>" markers. Returns a list of
+    n sections (reasoning + SQL), None where a question's SQL can't be found.
+    """
+    sections = [None] * n
+    parts = re.split(r"--\s*Question\s*(\d+)", output_text or "", flags=re.IGNORECASE)
+    # parts = [preamble, "1", body1, "2", body2, ...]
+    for number, body in zip(parts[1::2], parts[2::2]):
+        k = int(number) - 1
+        if 0 <= k < n and sections[k] is None and extract_sql(body) is not None:
+            sections[k] = body.strip()
+    return sections
+
+
+def evaluate_batched(data_to_evaluate, good_prompt, data_set, version_name, provider, batch_size=5,
+                     max_workers=4, resume=False):
+    """
+    Like evaluate, but questions on the same db_id are sent batch_size at a
+    time in one request. Questions whose answer can't be parsed out of the
+    batch fall back to a single-question request.
+    """
+    log_path = run_log.results_path(version_name)
+    done = run_log.completed_keys(log_path, version_name) if resume else set()
+    todo = [
+        i for i, item in enumerate(data_to_evaluate)
+        if run_log.record_key(item["db_id"], item["question"], version_name) not in done
+    ]
+    batches = batch_prompting.group_by_db(data_to_evaluate, todo, batch_size)
+    outputs, usages = {}, {}
+
+    def generate_batch(_, batch):
+        items = [data_to_evaluate[i] for i in batch]
+        schema = get_schema(db_path_for(items[0]["db_id"], data_set))
+        final_prompt = batch_prompting.render(good_prompt, schema, [item["question"] for item in items],
+                                              raw=os.getenv("PROMPT_RAW") == "1")
+        usage = prompt_templates.TokenUsage()
+        try:
+            sections = extract_sql_batch(complete(final_prompt, provider, usage), len(batch))
+        except GenerationFailed:
+            # Every question of the batch falls back to its own request
+            return
+        # The batch's tokens are shared out over its questions
+        for i, section, share in zip(batch, sections, usage.split(len(batch))):
+            outputs[i] = section
+            usages[i] = share
+
+    print(f"--- Generating {len(todo)} questions in {len(batches)} batched requests ---")
+    run_concurrent(batches, generate_batch, max_workers=max_workers)
+    fallbacks = sum(1 for i in todo if outputs.get(i) is None)
+    print(f"--- {fallbacks} questions fall back to single requests ---")
+
+    return run_and_log(
+        data_to_evaluate,
+        lambda i, item: evaluate_example(i, item, good_prompt, data_set, provider, llm_output=outputs.get(i),
+                                         usage=usages.get(i)),
+        version_name, max_workers, resume,
+    )
+
+
+def evaluate_dynamic_fewshot(data_to_evaluate, good_prompt, top_k, data_set, version_name, provider, max_workers=4,
+                             examples=None, knowledge_path=None, same_db=False, mmr_lambda=None, resume=False,
+                             samples=1):
+    if examples is None:
+        examples = fewshot_examples(data_to_evaluate, top_k, data_set, knowledge_path, same_db, mmr_lambda)
+    return run_and_log(
+        data_to_evaluate,
+        lambda i, item: evaluate_example(i, item, good_prompt, data_set, provider, topk=examples[i][:top_k],
+                                         samples=samples),
+        version_name, max_workers, resume,
+    )
+
+
+def evaluate_dynamic_fewshot_sweep(data_to_evaluate, good_prompt, top_ks, data_set, version_prefix, provider,
+                                   max_workers=4, knowledge_path=None, same_db=False, mmr_lambda=None, resume=False):
+    """Runs several top_k settings off a single retrieval pass. Returns {top_k: (accuracy, ves)}."""
+    examples = fewshot_examples(data_to_evaluate, max(top_ks), data_set, knowledge_path, same_db, mmr_lambda)
+    return {
+        k: evaluate_dynamic_fewshot(data_to_evaluate, good_prompt, k, data_set, f"{version_prefix}_top{k}",
+                                    provider, max_workers, examples=examples, resume=resume)
+        for k in top_ks
+    }